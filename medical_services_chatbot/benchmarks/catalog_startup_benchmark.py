@@ -0,0 +1,74 @@
+"""
+Catalog startup benchmark
+
+Compares the time needed to build `services_db` from a cold parse of the HTML
+tables with loading the pre-parsed snapshot, as the catalog grows.
+
+The catalog is grown synthetically by copying the tables in `phase2_data` under
+new file names. Run from the `medical_services_chatbot` directory:
+
+    python -m benchmarks.catalog_startup_benchmark --sizes 6 60 300 600
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from core.services_catalog import DEFAULT_SERVICES_DIR, SERVICES_FILE_SUFFIX, ServicesCatalogLoader
+
+
+def build_catalog_dir(target_dir: str, n_tables: int) -> None:
+    """Fill target_dir with n_tables service tables copied from phase2_data."""
+    sources = sorted(f for f in os.listdir(DEFAULT_SERVICES_DIR) if f.endswith(SERVICES_FILE_SUFFIX))
+    for i in range(n_tables):
+        source = sources[i % len(sources)]
+        name = source.replace(SERVICES_FILE_SUFFIX, f"_{i:04d}{SERVICES_FILE_SUFFIX}")
+        shutil.copyfile(os.path.join(DEFAULT_SERVICES_DIR, source), os.path.join(target_dir, name))
+
+
+def time_call(func, repeats: int) -> float:
+    """Median wall time of func() in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(sizes, repeats: int) -> None:
+    print(f"{'tables':>8} {'cold parse ms':>15} {'snapshot build ms':>18} {'snapshot load ms':>17} {'speedup':>9} {'snapshot KB':>12}")
+    for n_tables in sizes:
+        with tempfile.TemporaryDirectory() as services_dir:
+            build_catalog_dir(services_dir, n_tables)
+            snapshot_path = os.path.join(services_dir, ".cache", "services_db.snapshot")
+
+            cold = ServicesCatalogLoader(services_dir, use_snapshot=False)
+            cold_ms = time_call(cold.load, repeats)
+
+            # First load with an empty cache parses everything and writes the snapshot
+            build_ms = time_call(ServicesCatalogLoader(services_dir, snapshot_path).load, 1)
+
+            warm = ServicesCatalogLoader(services_dir, snapshot_path)
+            warm_ms = time_call(warm.load, repeats)
+            assert warm.load() == cold.load()
+
+            snapshot_kb = os.path.getsize(snapshot_path) / 1024
+            print(f"{n_tables:>8} {cold_ms:>15.1f} {build_ms:>18.1f} {warm_ms:>17.1f} "
+                  f"{cold_ms / warm_ms:>8.1f}x {snapshot_kb:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 60, 300, 600],
+                        help="Number of service tables in the synthetic catalog")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per measurement")
+    args = parser.parse_args()
+    run(args.sizes, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
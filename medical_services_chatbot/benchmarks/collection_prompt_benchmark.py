@@ -0,0 +1,113 @@
+"""
+Information collection prompt benchmark
+
+Replays a long, messy information collection conversation (invalid answers,
+corrections, side questions) and reports the prompt tokens of every
+process-input turn:
+
+  * full history: the system prompt and the whole conversation
+  * windowed: the system prompt, the collection state (confirmed, pending and
+    invalid fields) and the last `--history-messages` messages
+
+Tokens are counted with `tiktoken` (o200k_base, the GPT-4o encoding) when it
+is installed and estimated at four characters per token otherwise. The prompts
+are built locally; no request is sent. Run from the `medical_services_chatbot`
+directory:
+
+    python -m benchmarks.collection_prompt_benchmark --turns 30 --history-messages 6
+"""
+
+import argparse
+import json
+import os
+from typing import Callable, Dict, List, Tuple
+
+# The collector creates Azure OpenAI clients on construction; they are never used here
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://127.0.0.1:9")
+os.environ.setdefault("AZURE_OPENAI_KEY", "benchmark")
+os.environ.setdefault("AZURE_API_VERSION", "2024-02-01")
+
+from benchmarks.mock_azure_openai import estimate_tokens
+from core.slot_extraction import CollectionState
+from core.user_info_gathering_agent import UserInfoCollector
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# (user message, assistant reply) pairs of a collection conversation with retries and corrections;
+# the welcome message asks for the first name
+SCRIPT: List[Tuple[str, str]] = [
+    ("Dana", "Nice to meet you, Dana! What's your last name?"),
+    ("Cohen", "Thank you. What is your ID number?"),
+    ("12345", "The ID number must have 9 digits. Could you please provide your ID number again?"),
+    ("123456782", "Got it. What is your gender?"),
+    ("female", "How old are you?"),
+    ("I'm twenty eight", "Please provide your age as a number. How old are you?"),
+    ("28", "Which HMO are you a member of?"),
+    ("Which HMOs are there?", "You can choose Maccabi, Meuhedet or Clalit. Which HMO are you a member of?"),
+    ("Maccabi", "What's your HMO card number?"),
+    ("98765432", "The card number must have 9 digits. What's your HMO card number?"),
+    ("987654321", "What is your membership tier?"),
+    ("gold", "Thank you! Anything to correct before I show the summary?"),
+    ("Actually my age is 29", "I've updated your age to 29. Anything else to correct?"),
+    ("My last name is Levi, not Cohen", "I've updated your last name to Levi. Anything else to correct?"),
+]
+# Repeated after the script to make the conversation as long as requested
+FILLER: List[Tuple[str, str]] = [
+    ("Sorry, my age is 30", "I've updated your age to 30. Anything else to correct?"),
+    ("My HMO is Clalit", "I've updated your HMO to Clalit. Anything else to correct?"),
+    ("tier silver", "I've updated your membership tier to Silver. Anything else to correct?"),
+    ("My age is 29 after all", "I've updated your age to 29. Anything else to correct?"),
+]
+
+
+def token_counter() -> Tuple[str, Callable[[str], int]]:
+    if tiktoken is None:
+        return "estimated (chars / 4)", estimate_tokens
+    encoding = tiktoken.get_encoding("o200k_base")
+    return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+
+
+def prompt_tokens(kwargs: Dict, count: Callable[[str], int]) -> int:
+    # Content plus a few tokens of per-message overhead, as the chat format adds
+    return sum(count(str(message["content"])) + 4 for message in kwargs["messages"])
+
+
+def run(args) -> None:
+    label, count = token_counter()
+    full = UserInfoCollector(history_messages=0)
+    windowed = UserInfoCollector(history_messages=args.history_messages)
+    exchanges = SCRIPT + [FILLER[i % len(FILLER)] for i in range(max(0, args.turns - len(SCRIPT)))]
+    welcome = full.get_welcome_message(args.language)
+
+    print(f"Tokens: {label}; windowed prompts keep the last {args.history_messages} messages")
+    print(f"{'turn':>4} {'full':>7} {'windowed':>9} {'saved':>7}")
+    history = [{"role": "assistant", "content": welcome}]
+    state = CollectionState()
+    totals = [0, 0]
+    for turn, (message, reply) in enumerate(exchanges[:args.turns], start=1):
+        full_tokens = prompt_tokens(full._collection_kwargs(message, history, args.language), count)
+        windowed_tokens = prompt_tokens(windowed._collection_kwargs(message, history, args.language, state), count)
+        totals[0] += full_tokens
+        totals[1] += windowed_tokens
+        print(f"{turn:>4} {full_tokens:>7} {windowed_tokens:>9} {1 - windowed_tokens / full_tokens:>7.0%}")
+        state.update(history[-1]["content"], message)
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+    print(f"Total prompt tokens over {args.turns} turns: full {totals[0]}, windowed {totals[1]} "
+          f"({1 - totals[1] / totals[0]:.0%} fewer)")
+    print("Final state: " + json.dumps(state.to_record(), ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30, help="User turns to replay")
+    parser.add_argument("--history-messages", type=int, default=6, help="Messages sent verbatim when windowed")
+    parser.add_argument("--language", default="english", choices=["english", "hebrew"],
+                        help="Language of the system prompt and state message")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+HTTP connection pool benchmark
+
+Measures per-call latency against a local mock Azure OpenAI server for:
+
+  * LLM calls on a new connection each time (a fresh `AzureOpenAI` client per
+    call) vs. the shared pooled client from `core.http_clients`
+  * Streamlit-to-backend calls with bare `requests.post` vs. a persistent
+    `requests.Session`
+
+`--connect-delay-ms` adds a delay to every new connection on the server side,
+emulating the TCP/TLS handshake of a remote endpoint. Run from the
+`medical_services_chatbot` directory:
+
+    python -m benchmarks.http_pool_benchmark --calls 200 --connect-delay-ms 20
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from openai import AzureOpenAI
+
+from benchmarks.mock_azure_openai import MockAzureOpenAIServer
+from core.http_clients import get_http_client, llm_timeout
+
+API_VERSION = "2024-02-01"
+MESSAGES = [{"role": "user", "content": "How much discount do I get on acupuncture?"}]
+
+
+def azure_client(endpoint: str, http_client=None) -> AzureOpenAI:
+    return AzureOpenAI(api_key="mock", api_version=API_VERSION, azure_endpoint=endpoint,
+                       timeout=llm_timeout(), http_client=http_client, max_retries=0)
+
+
+def llm_fresh_call(server: MockAzureOpenAIServer):
+    with azure_client(server.url) as client:
+        client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+
+def llm_pooled_call(server: MockAzureOpenAIServer, client: AzureOpenAI):
+    client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+
+def backend_bare_call(server: MockAzureOpenAIServer):
+    requests.post(f"{server.url}/get-answer", json={"question": MESSAGES[0]["content"]}).json()
+
+
+def backend_session_call(server: MockAzureOpenAIServer, session: requests.Session):
+    session.post(f"{server.url}/get-answer", json={"question": MESSAGES[0]["content"]}).json()
+
+
+def measure(func, calls: int, concurrency: int):
+    """Per-call latencies in milliseconds and total wall time in seconds."""
+    def timed(_):
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    func()  # warm-up, so pooled variants start with an open connection
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, range(calls)))
+    return latencies, time.perf_counter() - start
+
+
+def run(calls: int, concurrency: int, connect_delay_ms: float, response_delay_ms: float) -> None:
+    server = MockAzureOpenAIServer(0, connect_delay_ms, response_delay_ms).start()
+    pooled_client = azure_client(server.url, get_http_client())
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(10, concurrency)))
+
+    scenarios = [
+        ("llm: new connection per call", lambda: llm_fresh_call(server)),
+        ("llm: shared pool", lambda: llm_pooled_call(server, pooled_client)),
+        ("backend: bare requests", lambda: backend_bare_call(server)),
+        ("backend: requests.Session", lambda: backend_session_call(server, session)),
+    ]
+    print(f"{calls} calls, concurrency {concurrency}, connect delay {connect_delay_ms:g} ms, "
+          f"response delay {response_delay_ms:g} ms")
+    print(f"{'scenario':<32} {'median ms':>10} {'p95 ms':>8} {'calls/s':>9} {'connections':>12}")
+    try:
+        for name, func in scenarios:
+            opened = server.connections
+            latencies, wall = measure(func, calls, concurrency)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(f"{name:<32} {statistics.median(latencies):>10.2f} {p95:>8.2f} "
+                  f"{calls / wall:>9.0f} {server.connections - opened:>12}")
+    finally:
+        session.close()
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Timed calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight at once")
+    parser.add_argument("--connect-delay-ms", type=float, default=20.0,
+                        help="Server-side delay per new connection (emulated handshake)")
+    parser.add_argument("--response-delay-ms", type=float, default=0.0,
+                        help="Server-side delay per completion (emulated model latency)")
+    args = parser.parse_args()
+    run(args.calls, args.concurrency, args.connect_delay_ms, args.response_delay_ms)
+
+
+if __name__ == "__main__":
+    main()
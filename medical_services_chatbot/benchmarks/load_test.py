@@ -0,0 +1,206 @@
+"""
+Backend load test
+
+Replays the `test_data` conversations against the backend at a target request
+rate (open loop: requests start on schedule whether or not earlier ones have
+finished, so a slow backend shows up as latency instead of a lower offered
+load):
+
+  * `/process-input`: a question with the conversation before it as history
+  * `/extract-user-info`: a confirmed information collection conversation
+    built from the test case's user info
+  * `/get-answer`: the test case's user info and question
+
+By default it starts the local mock Azure OpenAI server and the backend
+(`python -m core.server`) pointed at it; the answer cache and the fact fast
+path are off, so every request reaches the (mocked) LLM. `--base-url` drives a
+backend that is already running instead.
+
+Reports per endpoint: requests, throughput, p50/p95/p99 latency and the error
+rate with the status codes seen, plus the calls the mock LLM received and the
+faults it injected.
+
+Run from the `medical_services_chatbot` directory:
+
+    python -m benchmarks.load_test --rps 20 --duration 30 --response-delay-ms 800 --latency-sigma 0.4 \\
+        --tokens-per-second 60 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.mock_azure_openai import MockAzureOpenAIServer
+from benchmarks.workers_benchmark import TEST_DATA_DIR, free_port, start_backend, wait_ready
+from core.llm_limiter import parse_budgets
+
+ENDPOINTS = ("process-input", "extract-user-info", "get-answer")
+
+
+def collection_conversation(user_info: Dict[str, Any]) -> List[Dict[str, str]]:
+    """An English information collection conversation ending with the confirmation."""
+    details = (f"My name is {user_info['first_name']} {user_info['last_name']}, ID {user_info['id_number']}, "
+               f"{user_info['gender']}, {user_info['age']} years old. I am a {user_info['hmo_name']} member, "
+               f"card number {user_info['hmo_card_number']}, {user_info['membership_tier']} tier.")
+    return [
+        {"role": "assistant", "content": "Hello! To answer your questions I first need a few details. "
+                                         "What are your first and last name?"},
+        {"role": "user", "content": details},
+        {"role": "assistant", "content": "Are all the details correct?"},
+        {"role": "user", "content": "Yes"},
+        {"role": "assistant", "content": "Thank you for confirming all the details collected successfully"},
+    ]
+
+
+def load_requests() -> Dict[str, List[Dict[str, Any]]]:
+    """Request bodies per endpoint, built from the evaluation test data."""
+    bodies = {endpoint: [] for endpoint in ENDPOINTS}
+    for name in sorted(os.listdir(TEST_DATA_DIR)):
+        if not name.endswith(".json"):
+            continue
+        language = "hebrew" if "hebrew" in name else "english"
+        with open(os.path.join(TEST_DATA_DIR, name), encoding="utf-8") as f:
+            cases = json.load(f)["test_cases"]
+        for case in cases:
+            history = []
+            for conv in case["conversations"]:
+                bodies["process-input"].append({"user_input": conv["question"], "chat_history": list(history),
+                                                "language": language})
+                bodies["get-answer"].append({"user_info": case["user_info"], "question": conv["question"]})
+                history += [{"role": "user", "content": conv["question"]},
+                            {"role": "assistant", "content": conv["answer"]}]
+            bodies["extract-user-info"].append({"chat_history": collection_conversation(case["user_info"]),
+                                                "language": "english"})
+    return bodies
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+async def drive(base_url: str, bodies: Dict[str, List[Dict[str, Any]]], mix: Dict[str, int], rps: float,
+                duration: float, timeout: float, seed: int) -> Tuple[Dict[str, Dict[str, Any]], float]:
+    """Start requests at `rps` (Poisson arrivals) for `duration` seconds and wait for them to finish."""
+    rng = random.Random(seed)
+    endpoints = [endpoint for endpoint in ENDPOINTS if mix.get(endpoint)]
+    weights = [mix[endpoint] for endpoint in endpoints]
+    results = {endpoint: {"latencies": [], "statuses": Counter()} for endpoint in endpoints}
+    cursors = Counter()
+    tasks = []
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def send(endpoint: str, body: Dict[str, Any]):
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"/{endpoint}", json=body)
+                status = response.status_code
+            except httpx.TimeoutException:
+                status = "timeout"
+            except httpx.HTTPError:
+                status = "connection_error"
+            results[endpoint]["statuses"][status] += 1
+            if status == 200:
+                results[endpoint]["latencies"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            endpoint = rng.choices(endpoints, weights)[0]
+            pool = bodies[endpoint]
+            tasks.append(asyncio.create_task(send(endpoint, pool[cursors[endpoint] % len(pool)])))
+            cursors[endpoint] += 1
+            next_at += rng.expovariate(rps)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def report(results: Dict[str, Dict[str, Any]], elapsed: float) -> None:
+    print(f"{'endpoint':<18} {'requests':>8} {'ok/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7}  statuses")
+    for endpoint, result in results.items():
+        statuses = result["statuses"]
+        total = sum(statuses.values())
+        errors = total - statuses.get(200, 0)
+        latencies = result["latencies"]
+        print(f"{endpoint:<18} {total:>8} {len(latencies) / elapsed:>7.1f} {percentile(latencies, 0.50):>8.0f} "
+              f"{percentile(latencies, 0.95):>8.0f} {percentile(latencies, 0.99):>8.0f} "
+              f"{(errors / total if total else 0.0):>7.1%}  "
+              + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+
+
+def run(args) -> None:
+    bodies = load_requests()
+    mix = parse_budgets(args.mix)
+    print(f"Target {args.rps:g} req/s for {args.duration:g}s, mix {mix}")
+
+    mock = process = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            mock = MockAzureOpenAIServer(0, response_delay_ms=args.response_delay_ms, latency_sigma=args.latency_sigma,
+                                         tokens_per_second=args.tokens_per_second,
+                                         completion_tokens=args.completion_tokens, error_rate=args.error_rate,
+                                         throttle_rate=args.throttle_rate, hang_rate=args.hang_rate,
+                                         hang_seconds=args.hang_seconds, seed=args.seed).start()
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_backend(args.workers, port, mock.url)
+            wait_ready(base_url, process)
+            print(f"Backend with {args.workers} worker(s) on {base_url}, mock LLM on {mock.url}")
+
+        results, elapsed = asyncio.run(drive(base_url, bodies, mix, args.rps, args.duration, args.timeout, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if mock is not None:
+            mock.stop()
+
+    total = sum(sum(result["statuses"].values()) for result in results.values())
+    print(f"{total} requests sent in {args.duration:g}s ({total / args.duration:.1f} req/s offered), "
+          f"all finished after {elapsed:.1f}s")
+    report(results, elapsed)
+    if mock is not None:
+        print("Mock LLM: " + ", ".join(f"{name} {count}" for name, count in mock.stats.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--mix", default="process-input=2,extract-user-info=1,get-answer=3",
+                        help="Relative weights of the endpoints")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client timeout per request")
+    parser.add_argument("--base-url", default=None, help="Drive a running backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="Backend workers when starting the backend")
+    parser.add_argument("--response-delay-ms", type=float, default=800.0, help="Mock median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Mock log-normal latency shape")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Mock generation rate")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="Mock completion length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock share of 500 responses")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Mock share of 429 responses")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Mock share of hanging requests")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="How long a hanging request stalls")
+    parser.add_argument("--seed", type=int, default=1)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
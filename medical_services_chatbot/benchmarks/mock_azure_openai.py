@@ -0,0 +1,295 @@
+"""
+Mock Azure OpenAI server
+
+A small local HTTP/1.1 server answering the Azure chat-completions route, so
+the backend can be measured and load-tested without network noise or API cost.
+
+Behaviour:
+  * latency: time to first token drawn from a log-normal distribution with
+    median `--response-delay-ms` and shape `--latency-sigma` (0 = fixed)
+  * token rate: with `--tokens-per-second`, generating the completion takes
+    completion_tokens / rate on top of the first-token latency; streamed
+    responses (`stream: true`) send their chunks at that rate
+  * errors: a share of the requests gets a 500 (`--error-rate`), a 429 with
+    Retry-After (`--throttle-rate`) or hangs for `--hang-seconds` before
+    answering (`--hang-rate`)
+  * JSON mode: requests with `response_format: {"type": "json_object"}` get a
+    user information JSON object, like the extraction call expects, or a
+    structured collection turn (reply, confirmed flag and fields) when the
+    system prompt asks for one; it is confirmed when the last user message
+    starts with "yes"
+  * usage: prompt tokens are estimated from the message sizes
+
+An optional per-connection delay emulates the TCP/TLS handshake of a remote
+endpoint. Any GET answers {"status": "healthy"}.
+
+Run standalone from the `medical_services_chatbot` directory:
+
+    python -m benchmarks.mock_azure_openai --port 8900 --response-delay-ms 800 --latency-sigma 0.4 \\
+        --tokens-per-second 60 --error-rate 0.01 --throttle-rate 0.02
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+COMPLETION_TEXT = "As a Maccabi Gold member, you are entitled to a 70% discount, up to 20 treatments per year."
+
+# Returned in JSON mode, in the format of the user information extraction prompt
+MOCK_USER_INFO = {
+    "first_name": "Dana",
+    "last_name": "Cohen",
+    "id_number": "123456782",
+    "gender": "Female",
+    "age": 28,
+    "hmo_name": "Maccabi",
+    "hmo_card_number": "987654321",
+    "membership_tier": "Gold",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English; close enough for usage figures
+    return max(1, math.ceil(len(text) / 4))
+
+
+def completion_text(tokens: Optional[int]) -> str:
+    """The canned completion, repeated to about `tokens` tokens when given."""
+    if not tokens:
+        return COMPLETION_TEXT
+    repeats = max(1, round(tokens / estimate_tokens(COMPLETION_TEXT + " ")))
+    return " ".join([COMPLETION_TEXT] * repeats)
+
+
+def is_structured_turn(messages: list) -> bool:
+    return bool(messages) and '"reply"' in str(messages[0].get("content", ""))
+
+
+def structured_turn(messages: list) -> dict:
+    """A structured collection turn, confirmed when the user just said yes"""
+    last_user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    confirmed = last_user.strip().lower().startswith("yes")
+    reply = "Thank you for confirming all the details collected successfully." if confirmed \
+        else "Thank you! Is all the information correct?"
+    return {"reply": reply, "confirmed": confirmed, "fields": MOCK_USER_INFO}
+
+
+def completion_body(model: str, content: str = COMPLETION_TEXT, prompt_tokens: int = 900) -> bytes:
+    completion_tokens = estimate_tokens(content)
+    return json.dumps({
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }).encode("utf-8")
+
+
+def chunk_event(model: str, delta: Optional[str] = None, finish_reason: Optional[str] = None,
+                usage: Optional[dict] = None) -> bytes:
+    chunk = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{
+            "index": 0,
+            "delta": {"content": delta} if delta is not None else {},
+            "finish_reason": finish_reason,
+        }],
+    }
+    if usage:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+
+class MockAzureOpenAIHandler(BaseHTTPRequestHandler):
+    # Keep-alive needs HTTP/1.1 and an explicit Content-Length (or chunked encoding) on every response
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, a kept-alive connection
+    # would stall on the client's delayed ACK and hide the pooling gain
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+
+    def do_GET(self):
+        self._send_json(json.dumps({"status": "healthy"}).encode("utf-8"))
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server.count("requests")
+        try:
+            fault = server.draw_fault()
+            if fault == "error":
+                self._send_json(json.dumps({"error": {"code": "InternalServerError",
+                                                      "message": "Injected mock failure"}}).encode("utf-8"), 500)
+                return
+            if fault == "throttle":
+                self._send_json(json.dumps({"error": {"code": "429", "message": "Injected rate limit"}}).encode("utf-8"),
+                                429, {"Retry-After": "1"})
+                return
+            if fault == "hang":
+                time.sleep(server.hang_seconds)
+
+            model = payload.get("model", "gpt-4o")
+            messages = payload.get("messages", [])
+            if (payload.get("response_format") or {}).get("type") == "json_object":
+                content = json.dumps(structured_turn(messages) if is_structured_turn(messages) else MOCK_USER_INFO)
+            else:
+                content = completion_text(server.completion_tokens)
+            prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+
+            time.sleep(server.first_token_delay())
+            if payload.get("stream"):
+                include_usage = (payload.get("stream_options") or {}).get("include_usage", False)
+                self._stream(model, content, prompt_tokens, include_usage)
+            else:
+                time.sleep(server.generation_time(estimate_tokens(content)))
+                self._send_json(completion_body(model, content, prompt_tokens))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (timeout or cancelled hedge)
+            server.count("client_disconnects")
+
+    def _stream(self, model: str, content: str, prompt_tokens: int, include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            self._write_chunk(chunk_event(model, piece))
+            time.sleep(self.server.generation_time(estimate_tokens(piece)))
+        self._write_chunk(chunk_event(model, finish_reason="stop"))
+        if include_usage:
+            completion_tokens = estimate_tokens(content)
+            self._write_chunk(chunk_event(model, usage={
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, body: bytes, status: int = 200, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockAzureOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, connect_delay_ms: float = 0.0, response_delay_ms: float = 0.0,
+                 latency_sigma: float = 0.0, tokens_per_second: float = 0.0, completion_tokens: Optional[int] = None,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang_seconds: float = 30.0, seed: Optional[int] = None):
+        super().__init__(("127.0.0.1", port), MockAzureOpenAIHandler)
+        self.connect_delay = connect_delay_ms / 1000
+        self.response_delay = response_delay_ms / 1000
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        # New TCP connections accepted (to show how many the client opened), requests and injected faults
+        self.stats = {"connections": 0, "requests": 0, "error": 0, "throttle": 0, "hang": 0, "client_disconnects": 0}
+
+    @property
+    def connections(self) -> int:
+        return self.stats["connections"]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def draw_fault(self) -> Optional[str]:
+        """The fault injected into this request, if any."""
+        roll = self.random.random()
+        for fault, rate in (("error", self.error_rate), ("throttle", self.throttle_rate), ("hang", self.hang_rate)):
+            if roll < rate:
+                self.count(fault)
+                return fault
+            roll -= rate
+        return None
+
+    def first_token_delay(self) -> float:
+        if not self.response_delay or not self.latency_sigma:
+            return self.response_delay
+        # Log-normal with the configured median: a long right tail like real model latency
+        return self.random.lognormvariate(math.log(self.response_delay), self.latency_sigma)
+
+    def generation_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def start(self) -> "MockAzureOpenAIServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0, help="Delay added to every new connection")
+    parser.add_argument("--response-delay-ms", type=float, default=0.0, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.0,
+                        help="Log-normal shape of the first-token latency (0 = fixed)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Generation rate (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="Approximate completion length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="How long a hanging request stalls")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = MockAzureOpenAIServer(args.port, args.connect_delay_ms, args.response_delay_ms, args.latency_sigma,
+                                   args.tokens_per_second, args.completion_tokens, args.error_rate,
+                                   args.throttle_rate, args.hang_rate, args.hang_seconds, args.seed)
+    print(f"Mock Azure OpenAI listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
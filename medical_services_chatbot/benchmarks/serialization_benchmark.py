@@ -0,0 +1,127 @@
+"""
+Response serialization benchmark
+
+Compares, for typical backend payloads built from the evaluation test data:
+
+  * encode time of FastAPI's default path (`jsonable_encoder` + `json.dumps`),
+    orjson after `jsonable_encoder` (a `FastJSONResponse` default response
+    class) and orjson on the returned object (endpoints returning a
+    `FastJSONResponse` directly)
+  * bytes on the wire uncompressed, with gzip and with brotli (when the
+    `brotli` package is installed), at the levels configured in `core.responses`
+
+Payloads: a `/process-input` request and response with a conversation of
+`--turns` messages, a `/sessions/{id}/messages` response in Q&A mode and a
+`/get-answers` response with `--questions` answers. Run from the
+`medical_services_chatbot` directory:
+
+    python -m benchmarks.serialization_benchmark --turns 20 --questions 10
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from core.responses import API_BROTLI_QUALITY, API_COMPRESSION_MIN_BYTES, API_GZIP_LEVEL, brotli, orjson
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_data")
+
+
+def load_case(language: str):
+    with open(os.path.join(TEST_DATA_DIR, f"dental_services_{language}_test.json"), encoding="utf-8") as f:
+        return json.load(f)["test_cases"][0]
+
+
+def build_payloads(turns: int, questions: int):
+    case = load_case("hebrew")
+    conversations = case["conversations"]
+    history = []
+    for i in range(turns // 2):
+        conv = conversations[i % len(conversations)]
+        history.append({"role": "user", "content": conv["question"]})
+        history.append({"role": "assistant", "content": conv["answer"]})
+    last = conversations[-1]
+    answer = {"answer": last["answer"], "catalog_version": "a3f9c2e1d4b5", "cache": "miss", "source": "llm"}
+    return {
+        "process-input request": {"user_input": last["question"], "chat_history": history, "language": "he"},
+        "process-input response": {"content": last["answer"], "role": "assistant", "is_validated": "False"},
+        "session message response": {**answer, "role": "assistant", "content": last["answer"],
+                                     "session_id": "5d1f0c7e9a8b4c3d2e1f0a9b8c7d6e5f", "is_qa_mode": True,
+                                     "user_info": case["user_info"]},
+        "get-answers response": {
+            "results": [{"index": i, "question": conversations[i % len(conversations)]["question"],
+                         "elapsed_ms": 812.4, **answer, "answer": conversations[i % len(conversations)]["answer"]}
+                        for i in range(questions)],
+            "failed": 0,
+            "elapsed_ms": 1630.2,
+        },
+    }
+
+
+def default_encode(payload) -> bytes:
+    # What JSONResponse.render does after FastAPI's jsonable_encoder
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_encoded(payload) -> bytes:
+    return orjson.dumps(jsonable_encoder(payload), option=orjson.OPT_NON_STR_KEYS)
+
+
+def orjson_direct(payload) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+
+
+def time_us(encode, payload, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode(payload)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(turns: int, questions: int, iterations: int) -> None:
+    payloads = build_payloads(turns, questions)
+    encoders = [("default", default_encode)]
+    if orjson is not None:
+        encoders += [("orjson+enc", orjson_encoded), ("orjson", orjson_direct)]
+    else:
+        print("orjson is not installed; only the default encoder is measured")
+
+    print(f"Encode time (µs per payload, {iterations} iterations)")
+    print(f"{'payload':<28}" + "".join(f"{name:>12}" for name, _ in encoders))
+    for name, payload in payloads.items():
+        print(f"{name:<28}" + "".join(f"{time_us(encode, payload, iterations):>12.1f}" for _, encode in encoders))
+
+    print(f"\nBytes on the wire (compression threshold {API_COMPRESSION_MIN_BYTES} bytes)")
+    header = f"{'payload':<28}{'raw':>8}{f'gzip-{API_GZIP_LEVEL}':>10}{'gzip µs':>10}"
+    if brotli is not None:
+        header += f"{f'br-{API_BROTLI_QUALITY}':>8}{'br µs':>8}"
+    print(header)
+    for name, payload in payloads.items():
+        body = default_encode(payload)
+        gzipped = gzip.compress(body, compresslevel=API_GZIP_LEVEL)
+        gzip_us = time_us(lambda b: gzip.compress(b, compresslevel=API_GZIP_LEVEL), body, iterations // 10 or 1)
+        line = f"{name:<28}{len(body):>8}{len(gzipped):>10}{gzip_us:>10.1f}"
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=API_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+            br_us = time_us(lambda b: brotli.compress(b, quality=API_BROTLI_QUALITY, mode=brotli.MODE_TEXT),
+                            body, iterations // 10 or 1)
+            line += f"{len(compressed):>8}{br_us:>8.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20, help="Messages in the conversation history")
+    parser.add_argument("--questions", type=int, default=10, help="Answers in the /get-answers response")
+    parser.add_argument("--iterations", type=int, default=2000, help="Encodings per measurement")
+    args = parser.parse_args()
+    run(args.turns, args.questions, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Backend workers benchmark
+
+Starts the backend with `python -m core.server --workers N` for each worker
+count, pointed at the local mock Azure OpenAI server, and drives `/get-answer`
+with concurrent clients for a fixed duration. The answer cache and the fact
+fast path are disabled so every request runs retrieval, prompt assembly and an
+(emulated) LLM call.
+
+Reports requests per second, latency percentiles and the memory of the worker
+processes: RSS counts the shared catalog pages in every worker, USS only the
+pages a worker owns, so their difference shows the copy-on-write sharing.
+
+Run from the `medical_services_chatbot` directory:
+
+    python -m benchmarks.workers_benchmark --workers 1 2 4 --concurrency 64 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+import psutil
+
+from benchmarks.mock_azure_openai import MockAzureOpenAIServer
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_data")
+
+
+def load_questions():
+    """(user_info, question) pairs from the evaluation test data."""
+    pairs = []
+    for name in sorted(os.listdir(TEST_DATA_DIR)):
+        if name.endswith(".json"):
+            with open(os.path.join(TEST_DATA_DIR, name), encoding="utf-8") as f:
+                for case in json.load(f)["test_cases"]:
+                    pairs.extend((case["user_info"], conv["question"]) for conv in case["conversations"])
+    return pairs
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(workers: int, port: int, mock_url: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "AZURE_OPENAI_ENDPOINT": mock_url,
+        "AZURE_OPENAI_KEY": "mock",
+        "AZURE_API_VERSION": "2024-02-01",
+        "QA_CACHE_ENABLED": "false",
+        "QA_FAST_PATH_ENABLED": "false",
+        "QA_CATALOG_POLL_SECONDS": "0",
+        "PYTHONPATH": os.getcwd(),
+    }
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "core.server", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, timeout: float = 120.0) -> float:
+    """Seconds until /ready answers 200."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("backend exited during startup")
+        try:
+            if httpx.get(f"{base_url}/ready", timeout=1.0).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError("backend did not become ready")
+
+
+def worker_memory(process: subprocess.Popen):
+    """Total RSS and USS in MB of the launcher and its workers."""
+    rss = uss = 0
+    for proc in [psutil.Process(process.pid), *psutil.Process(process.pid).children(recursive=True)]:
+        info = proc.memory_full_info()
+        rss += info.rss
+        uss += info.uss
+    return rss / (1024 * 1024), uss / (1024 * 1024)
+
+
+async def drive(base_url: str, pairs, concurrency: int, duration: float):
+    """Run `concurrency` closed-loop clients for `duration` seconds."""
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def client_loop(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                user_info, question = pairs[i % len(pairs)]
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/get-answer", json={"user_info": user_info, "question": question})
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def run(worker_counts, concurrency: int, duration: float, response_delay_ms: float) -> None:
+    pairs = load_questions()
+    mock = MockAzureOpenAIServer(0, response_delay_ms=response_delay_ms).start()
+    print(f"{len(pairs)} questions, concurrency {concurrency}, {duration:g}s per run, "
+          f"mock LLM latency {response_delay_ms:g} ms, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'startup s':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} "
+          f"{'RSS MB':>8} {'USS MB':>8}")
+    try:
+        for workers in worker_counts:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            process = start_backend(workers, port, mock.url)
+            try:
+                startup = wait_ready(base_url, process)
+                # Let every worker finish its lifespan before measuring
+                time.sleep(1.0)
+                latencies, errors, elapsed = asyncio.run(drive(base_url, pairs, concurrency, duration))
+                rss, uss = worker_memory(process)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            p50 = statistics.median(latencies) if latencies else 0.0
+            p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else p50
+            print(f"{workers:>8} {startup:>10.1f} {len(latencies) / elapsed:>8.0f} {p50:>8.1f} {p95:>8.1f} "
+                  f"{errors:>7} {rss:>8.0f} {uss:>8.0f}")
+    finally:
+        mock.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent closed-loop clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per worker count")
+    parser.add_argument("--response-delay-ms", type=float, default=50.0,
+                        help="Emulated LLM latency of the mock server")
+    args = parser.parse_args()
+    run(args.workers, args.concurrency, args.duration, args.response_delay_ms)
+
+
+if __name__ == "__main__":
+    main()
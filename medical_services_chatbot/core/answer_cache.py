@@ -0,0 +1,225 @@
+"""
+Answer Cache Module
+
+A cache in front of the QA service for answers to repeated questions. Entries are
+scoped by (HMO, tier, catalog version, persona) and looked up in two tiers:
+1. Exact match on the normalized question text.
+2. Near-duplicate match: the most similar cached question in the same scope, if
+   its embedding similarity is above a configurable threshold.
+
+Embeddings default to character n-gram vectors, which need no model and catch
+rephrasings such as punctuation, word order and small wording changes. A local
+sentence-transformers model can be plugged in instead. Because questions about
+different services can still look alike ("homeopathy" vs "naturopathy"), a
+near-duplicate only matches when both questions share the same `topic` (the QA
+service passes the services retrieval ranked highest).
+
+Entries are evicted LRU beyond `max_entries` and expire after `ttl_seconds`.
+"""
+
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from core.monitoring import QA_CACHE_EVICTIONS, QA_CACHE_LOOKUPS
+
+NGRAM_SIZE = 3
+NIQQUD_PATTERN = re.compile(r'[֑-ׇ]')
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]", re.UNICODE)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for cache keys: case, Unicode form, niqqud, punctuation, whitespace."""
+    text = unicodedata.normalize('NFKC', question).lower()
+    text = NIQQUD_PATTERN.sub('', text)
+    text = PUNCTUATION_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def ngram_embedding(text: str) -> Dict[str, float]:
+    """Sparse, L2-normalized character n-gram vector of a normalized question."""
+    counts = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for i in range(max(len(padded) - NGRAM_SIZE + 1, 1)):
+            counts[padded[i:i + NGRAM_SIZE]] += 1
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {gram: c / norm for gram, c in counts.items()}
+
+
+def _sparse_cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(gram, 0.0) for gram, weight in a.items())
+
+
+@dataclass
+class _CacheEntry:
+    scope: Tuple[str, str, str, str]
+    question: str
+    answer: str
+    topic: str
+    embedding: Any
+    created_at: float
+
+
+@dataclass(frozen=True)
+class CacheHit:
+    answer: str
+    kind: str  # "exact" or "semantic"
+    similarity: float
+
+
+class SemanticAnswerCache:
+    """Thread-safe LRU/TTL answer cache with exact and near-duplicate lookup."""
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.9,
+        embedding_model: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: "OrderedDict[Tuple, _CacheEntry]" = OrderedDict()
+        # Exact keys per scope, for the near-duplicate scan
+        self._scopes: Dict[Tuple, set] = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+        self._embed: Callable[[str], Any] = ngram_embedding
+        self._similarity: Callable[[Any, Any], float] = _sparse_cosine
+        if embedding_model:
+            self._use_sentence_transformer(embedding_model)
+
+    def _use_sentence_transformer(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            return
+        model = SentenceTransformer(model_name)
+        self._embed = lambda text: model.encode(text, normalize_embeddings=True, convert_to_numpy=True)
+        self._similarity = lambda a, b: float(a @ b)
+
+    @property
+    def uses_model_embeddings(self) -> bool:
+        """True when lookups and stores run an embedding model (slow enough to keep off the event loop)"""
+        return self._embed is not ngram_embedding
+
+    def get(self, hmo: str, tier: str, catalog_version: str, question: str,
+            persona: str = "", topic: str = "") -> Optional[CacheHit]:
+        """
+        Look up a cached answer.
+
+        `persona` is an extra scope component for answers that depend on the user,
+        e.g. the grammatical gender Hebrew answers are written in. Near-duplicate
+        matches are restricted to entries stored with the same `topic`.
+        """
+        scope = (hmo, tier, catalog_version, persona)
+        normalized = normalize_question(question)
+        now = time.monotonic()
+
+        with self._lock:
+            key = (*scope, normalized)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry, now):
+                    self._entries.move_to_end(key)
+                    return self._record_hit(CacheHit(entry.answer, "exact", 1.0))
+                self._remove(key, "ttl")
+            has_candidates = bool(self._scopes.get(scope))
+
+        # Embedded outside the lock, as in put(), so lookups don't wait for each other's embeddings
+        embedding = self._embed(normalized) if has_candidates else None
+
+        with self._lock:
+            best, best_score = None, 0.0
+            if embedding is not None:
+                for key in list(self._scopes.get(scope, ())):
+                    # May have been evicted while the lock was released
+                    candidate = self._entries.get(key)
+                    if candidate is None:
+                        continue
+                    if self._expired(candidate, now):
+                        self._remove(key, "ttl")
+                        continue
+                    if candidate.topic != topic:
+                        continue
+                    score = self._similarity(embedding, candidate.embedding)
+                    if score > best_score:
+                        best, best_score = candidate, score
+
+            if best is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end((*best.scope, best.question))
+                return self._record_hit(CacheHit(best.answer, "semantic", best_score))
+
+            self._stats["misses"] += 1
+            QA_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+
+    def put(self, hmo: str, tier: str, catalog_version: str, question: str, answer: str,
+            persona: str = "", topic: str = "") -> None:
+        """Store an answer, evicting least recently used entries beyond max_entries."""
+        scope = (hmo, tier, catalog_version, persona)
+        normalized = normalize_question(question)
+        key = (*scope, normalized)
+        entry = _CacheEntry(scope, normalized, answer, topic, self._embed(normalized), time.monotonic())
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = entry
+            self._scopes.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest, "lru")
+
+    def invalidate(self, keep_version: Optional[str] = None) -> int:
+        """Drop all entries, or all entries of catalog versions other than keep_version."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.scope[2] != keep_version]
+            for key in stale:
+                self._remove(key, "invalidation")
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["exact_hits"] + self._stats["semantic_hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "exact_hits": self._stats["exact_hits"],
+                "semantic_hits": self._stats["semantic_hits"],
+                "misses": self._stats["misses"],
+                "evictions": self._stats["evictions"],
+                "hit_rate": (lookups - self._stats["misses"]) / lookups if lookups else 0.0,
+            }
+
+    def _expired(self, entry: _CacheEntry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def _record_hit(self, hit: CacheHit) -> CacheHit:
+        self._stats[f"{hit.kind}_hits"] += 1
+        QA_CACHE_LOOKUPS.labels(result=f"{hit.kind}_hit").inc()
+        return hit
+
+    def _remove(self, key: Tuple, reason: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._scopes.get(entry.scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._scopes[entry.scope]
+        self._stats["evictions"] += 1
+        QA_CACHE_EVICTIONS.labels(reason=reason).inc()
@@ -0,0 +1,368 @@
+"""
+Benefit Facts Module
+
+The tier cells of the services tables follow a regular format, for example
+"חינם פעמיים בשנה, תור תוך 48 שעות" or "70% הנחה, עד 20 טיפולים בשנה".
+This module parses those descriptions into typed `BenefitFacts` records and
+answers simple factual questions ("what is the discount on fillings?") from
+them with bilingual templates, without calling the LLM.
+
+`FactAnswerer.answer` returns None whenever the question, the service or the
+needed fact is ambiguous, so the QA service falls back to the model.
+"""
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.retrieval import SERVICE_GLOSSARY
+
+HEBREW_PATTERN = re.compile(r'[֐-׿]')
+
+# Hebrew duration words, in years
+HEBREW_YEARS = {'שנה': 1.0, 'לשנה': 1.0, 'שנתיים': 2.0, 'לשנתיים': 2.0, 'שנה וחצי': 1.5}
+
+# Hebrew frequency phrases, as times per year
+HEBREW_FREQUENCIES = {
+    'פעם בשנה': 1,
+    'פעמיים בשנה': 2,
+    'כל חצי שנה': 2,
+    'כל רבעון': 4,
+    'כל חודש': 12,
+}
+
+# Hebrew appointment wait phrases, as hours
+HEBREW_WAIT_TIMES = {
+    'תור ביום': 24.0,
+    'תור תוך שבוע': 168.0,
+    'תור תוך שבועיים': 336.0,
+}
+
+WAIT_UNITS_IN_HOURS = {'שעות': 1.0, 'ימים': 24.0}
+
+DISCOUNT_PATTERN = re.compile(r'^(\d+)%\s*הנחה(?:\s+על\s+(.+?))?(?:\s+עד\s+(\d+)\s*₪)?$')
+COVERAGE_PATTERN = re.compile(r'^(\d+)%\s*כיסוי$')
+TREATMENTS_PATTERN = re.compile(r'עד\s+(\d+)\s+טיפולים\s+בשנה')
+SESSIONS_PATTERN = re.compile(r'^(\d+|פגישה אחת)\s*(?:פגישות)?\s*חינם')
+AGE_PATTERN = re.compile(r'עד\s+גיל\s+(\d+)')
+WAIT_PATTERN = re.compile(r'תור\s+תוך\s+(\d+)\s+(שעות|ימים)')
+REPLACEMENT_PATTERN = re.compile(r'החלפה\s+(כל\s+.+)$')
+WARRANTY_PATTERN = re.compile(r'אחריות\s+(?:ל-?)?(\d+\s+שנים|שנה|שנתיים|לשנה|לשנתיים)')
+
+
+@dataclass(frozen=True)
+class BenefitFacts:
+    """Typed facts parsed from one benefit description."""
+    raw: str
+    is_free: bool = False
+    no_discount: bool = False
+    discount_percent: Optional[int] = None
+    # What the discount applies to when it is not the whole service ("על ניתוח לייזר")
+    discount_scope: Optional[str] = None
+    coverage_percent: Optional[int] = None
+    price_cap_ils: Optional[int] = None
+    treatments_per_year: Optional[int] = None
+    free_sessions: Optional[int] = None
+    times_per_year: Optional[int] = None
+    frequency_text: Optional[str] = None
+    wait_time_hours: Optional[float] = None
+    wait_time_text: Optional[str] = None
+    replacement_years: Optional[float] = None
+    replacement_text: Optional[str] = None
+    warranty_years: Optional[float] = None
+    free_until_age: Optional[int] = None
+    includes: Tuple[str, ...] = ()
+
+    def to_record(self) -> Dict[str, Any]:
+        """Plain-data form, for the catalog snapshot"""
+        return asdict(self)
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "BenefitFacts":
+        return cls(**{**record, "includes": tuple(record.get("includes", ()))})
+
+
+def _parse_years(text: str) -> Optional[float]:
+    text = text.strip()
+    if text in HEBREW_YEARS:
+        return HEBREW_YEARS[text]
+    match = re.match(r'(\d+)\s+שנים', text)
+    return float(match.group(1)) if match else None
+
+
+def parse_benefit_facts(description: str) -> BenefitFacts:
+    """Parse a benefit description such as "70% הנחה, עד 20 טיפולים בשנה" into facts."""
+    facts: Dict[str, Any] = {"raw": description}
+    includes: List[str] = []
+
+    clauses = [clause.strip() for clause in description.split(',') if clause.strip()]
+    for position, clause in enumerate(clauses):
+        if clause == 'ללא הנחה':
+            facts["no_discount"] = True
+            continue
+
+        discount = DISCOUNT_PATTERN.match(clause)
+        if discount and "discount_percent" not in facts:
+            facts["discount_percent"] = int(discount.group(1))
+            if discount.group(2):
+                facts["discount_scope"] = discount.group(2)
+            if discount.group(3):
+                facts["price_cap_ils"] = int(discount.group(3))
+            continue
+
+        coverage = COVERAGE_PATTERN.match(clause)
+        if coverage:
+            facts["coverage_percent"] = int(coverage.group(1))
+            continue
+
+        sessions = SESSIONS_PATTERN.match(clause)
+        if sessions and position == 0:
+            count = sessions.group(1)
+            facts["free_sessions"] = 1 if count == 'פגישה אחת' else int(count)
+            facts["is_free"] = True
+            continue
+
+        if clause.startswith('חינם') and position == 0:
+            facts["is_free"] = True
+            for phrase, times in HEBREW_FREQUENCIES.items():
+                if phrase in clause:
+                    facts["times_per_year"] = times
+                    facts["frequency_text"] = phrase
+            age = AGE_PATTERN.search(clause)
+            if age:
+                facts["free_until_age"] = int(age.group(1))
+            continue
+
+        treatments = TREATMENTS_PATTERN.search(clause)
+        if treatments:
+            facts["treatments_per_year"] = int(treatments.group(1))
+            continue
+
+        wait = WAIT_PATTERN.search(clause)
+        if wait:
+            facts["wait_time_hours"] = int(wait.group(1)) * WAIT_UNITS_IN_HOURS[wait.group(2)]
+            facts["wait_time_text"] = clause
+            continue
+        if clause in HEBREW_WAIT_TIMES:
+            facts["wait_time_hours"] = HEBREW_WAIT_TIMES[clause]
+            facts["wait_time_text"] = clause
+            continue
+
+        replacement = REPLACEMENT_PATTERN.search(clause)
+        if replacement:
+            facts["replacement_text"] = replacement.group(1)
+            facts["replacement_years"] = _parse_years(replacement.group(1).replace('כל', '', 1))
+            continue
+
+        warranty = WARRANTY_PATTERN.search(clause)
+        if warranty:
+            facts["warranty_years"] = _parse_years(warranty.group(1))
+            continue
+
+        includes.append(clause[len('כולל '):] if clause.startswith('כולל ') else clause)
+
+    return BenefitFacts(includes=tuple(includes), **facts)
+
+
+# Question intents answered from facts, with their English and Hebrew cue patterns.
+# Order matters: more specific intents come first.
+INTENT_PATTERNS = [
+    ("age", re.compile(r'until what age|up to what age|age limit|עד (איזה|אייזה) גיל|עד גיל', re.I)),
+    ("replacement", re.compile(r'\breplace|how often can i (get|change)|להחליף|החלפה', re.I)),
+    ("wait_time", re.compile(r'\bwait|how (long|soon).*appointment|ממתינים|המתנה|זמן.*תור', re.I)),
+    ("times_per_year", re.compile(r'how many times|how often|how many free|כמה פעמים|כל כמה זמן', re.I)),
+    ("treatments", re.compile(r'how many .*treatments?|כמה טיפול', re.I)),
+    ("sessions", re.compile(r'how many .*(sessions?|meetings?)|כמה פגישות|כמה מפגשים', re.I)),
+    ("coverage", re.compile(r'\bcoverage\b|\bcovered\b|כיסוי', re.I)),
+    ("discount", re.compile(r'\bdiscount|% off|\bhow much off|הנחה', re.I)),
+]
+
+# Questions that need reasoning over the description rather than a single fact
+OPEN_QUESTION_PATTERN = re.compile(r'\binclude|\bdoes it\b|\bis there\b|\bcompare|\bdifference|האם|כולל|ההבדל', re.I)
+
+ENGLISH_FREQUENCIES = {1: "once a year", 2: "twice a year", 4: "every quarter", 12: "every month"}
+
+# The fact each intent needs, by BenefitFacts field
+INTENT_FACTS = {
+    "age": "free_until_age",
+    "replacement": "replacement_years",
+    "wait_time": "wait_time_hours",
+    "times_per_year": "times_per_year",
+    "treatments": "treatments_per_year",
+    "sessions": "free_sessions",
+    "coverage": "coverage_percent",
+}
+
+
+def _article(percent: int) -> str:
+    """English indefinite article for a spoken percentage ("an 80%", "a 70%")"""
+    return "an" if str(percent).startswith("8") or percent in (11, 18) else "a"
+
+
+def _english_wait(hours: float) -> str:
+    if hours == 24:
+        return "same day"
+    if hours % 168 == 0:
+        weeks = int(hours // 168)
+        return "within a week" if weeks == 1 else f"within {weeks} weeks"
+    if hours % 24 == 0 and hours > 48:
+        return f"within {int(hours // 24)} days"
+    return f"within {int(hours)} hours"
+
+
+def _english_years(years: float) -> str:
+    if years == 1:
+        return "every year"
+    if years == 1.5:
+        return "every year and a half"
+    return f"every {years:g} years"
+
+
+class FactAnswerer:
+    """Template-based answers to high-confidence factual questions."""
+
+    def __init__(self, min_margin: float = 1.5):
+        # Required ratio between the best and second-best service retrieval scores
+        self.min_margin = min_margin
+
+    @staticmethod
+    def detect_intent(question: str) -> Optional[str]:
+        """Return the single factual intent of a question, or None if it is open-ended"""
+        if OPEN_QUESTION_PATTERN.search(question):
+            return None
+        for intent, pattern in INTENT_PATTERNS:
+            if pattern.search(question):
+                return intent
+        return None
+
+    def confident_service(self, ranked: List[Tuple[str, float]]) -> Optional[str]:
+        """The top-ranked service, if it clearly beats the runner-up"""
+        if not ranked:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < self.min_margin * ranked[1][1]:
+            return None
+        return ranked[0][0]
+
+    def answer(self, question: str, ranked: List[Tuple[str, float]], facts_by_service: Dict[str, BenefitFacts],
+               user_info: Dict[str, Any], hmo: str, tier: str,
+               hmo_english: str, tier_english: str) -> Optional[str]:
+        """Answer the question from facts, or return None to fall back to the LLM"""
+        intent = self.detect_intent(question)
+        service = self.confident_service(ranked)
+        if intent is None or service is None or service not in facts_by_service:
+            return None
+
+        # The answer must contain the fact the question asks about
+        facts = facts_by_service[service]
+        if intent == "discount":
+            if facts.discount_percent is None and not facts.is_free and not facts.no_discount \
+                    and facts.coverage_percent is None:
+                return None
+        elif getattr(facts, INTENT_FACTS[intent]) is None:
+            return None
+        # A benefit that is only free up to an age depends on the user's age; the model sees it
+        if facts.free_until_age is not None and intent != "age" \
+                and not self._within_age(user_info, facts.free_until_age):
+            return None
+
+        if HEBREW_PATTERN.search(question):
+            return self._answer_hebrew(intent, service, facts, user_info, hmo, tier)
+        return self._answer_english(intent, service, facts, hmo_english, tier_english)
+
+    @staticmethod
+    def _within_age(user_info: Dict[str, Any], age_limit: int) -> bool:
+        """True if the user's age is known and at most the limit"""
+        try:
+            return int(str(user_info.get('age')).strip()) <= age_limit
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _answer_english(intent: str, service: str, facts: BenefitFacts, hmo: str, tier: str) -> Optional[str]:
+        name = SERVICE_GLOSSARY.get(service, [None])[0]
+        # Hebrew-only details (what a partial discount applies to, what is included) can't be rendered,
+        # and an answer without them would be less complete than the model's
+        if name is None or facts.discount_scope or facts.includes:
+            return None
+
+        intro = f"As a {hmo} {tier} member"
+        if facts.no_discount:
+            return f"{intro}, there is no discount on {name}."
+
+        if facts.free_sessions is not None:
+            sessions = "session" if facts.free_sessions == 1 else "sessions"
+            entitlement = f"{facts.free_sessions} free {name} {sessions}"
+        elif facts.is_free:
+            entitlement = f"free {name}"
+            if facts.times_per_year in ENGLISH_FREQUENCIES:
+                entitlement += f" {ENGLISH_FREQUENCIES[facts.times_per_year]}"
+            if facts.free_until_age is not None:
+                entitlement += f" until age {facts.free_until_age}"
+        elif facts.discount_percent is not None:
+            entitlement = f"{_article(facts.discount_percent)} {facts.discount_percent}% discount on {name}"
+            if facts.price_cap_ils is not None:
+                entitlement += f" up to {facts.price_cap_ils} ₪"
+        elif facts.coverage_percent is not None:
+            entitlement = f"{facts.coverage_percent}% coverage for {name}"
+        else:
+            return None
+
+        # Wait time and replacement questions get a direct answer before the entitlement
+        lead = None
+        if intent == "wait_time":
+            lead = f"{intro}, the wait time for {name} is {_english_wait(facts.wait_time_hours)}."
+        elif intent == "replacement":
+            lead = f"{intro}, you can replace your {name} {_english_years(facts.replacement_years)}."
+
+        details = []
+        if facts.treatments_per_year is not None:
+            details.append(f"up to {facts.treatments_per_year} treatments per year")
+        if facts.replacement_years is not None and intent != "replacement":
+            details.append(f"with replacement {_english_years(facts.replacement_years)}")
+        if facts.wait_time_hours is not None and intent != "wait_time":
+            wait = _english_wait(facts.wait_time_hours)
+            details.append("with same-day appointments" if wait == "same day" else f"with appointments {wait}")
+        if facts.warranty_years is not None:
+            details.append(f"with a {facts.warranty_years:g}-year warranty")
+
+        if lead is not None:
+            return f"{lead} You are entitled to {', '.join([entitlement] + details)}."
+        return f"{intro}, you are entitled to {', '.join([entitlement] + details)}."
+
+    @staticmethod
+    def _answer_hebrew(intent: str, service: str, facts: BenefitFacts, user_info: Dict[str, Any],
+                       hmo: str, tier: str) -> Optional[str]:
+        female = str(user_info.get('gender') or '').strip().lower() in ('female', 'נקבה', 'אישה')
+        intro = f"{'כמבוטחת' if female else 'כמבוטח'} {hmo} במסלול {tier}"
+        if facts.no_discount:
+            return f"{intro}, אין הנחה על {service}."
+
+        # Rephrase the leading clause around the service name and keep the other clauses as written
+        clauses = [clause.strip() for clause in facts.raw.split(',') if clause.strip()]
+        lead, rest = clauses[0], clauses[1:]
+        if facts.free_sessions is not None:
+            entitlement = "לפגישה אחת חינם" if facts.free_sessions == 1 else f"ל-{facts.free_sessions} פגישות חינם"
+            entitlement += f" של {service}"
+        elif facts.is_free and lead.startswith('חינם'):
+            entitlement = f"ל{service} {lead}"
+        elif facts.discount_percent is not None and DISCOUNT_PATTERN.match(lead):
+            entitlement = f"ל-{facts.discount_percent}% הנחה על {facts.discount_scope or service}"
+            if facts.price_cap_ils is not None:
+                entitlement += f" עד {facts.price_cap_ils} ₪"
+        elif facts.coverage_percent is not None and COVERAGE_PATTERN.match(lead):
+            entitlement = f"ל-{facts.coverage_percent}% כיסוי עבור {service}"
+        else:
+            return None
+
+        entitled = "את זכאית" if female else "אתה זכאי"
+        # Wait time and replacement questions get a direct answer before the entitlement
+        if intent == "wait_time" and facts.wait_time_text in rest:
+            rest.remove(facts.wait_time_text)
+            wait = facts.wait_time_text[len('תור '):]
+            return f"{intro}, התור ל{service} הוא {wait}. {entitled} {', '.join([entitlement] + rest)}."
+        replacement_clause = f"החלפה {facts.replacement_text}"
+        if intent == "replacement" and replacement_clause in rest:
+            rest.remove(replacement_clause)
+            can = "את יכולה" if female else "אתה יכול"
+            return f"{intro}, {can} להחליף {service} {facts.replacement_text}. {entitled} {', '.join([entitlement] + rest)}."
+        return f"{intro}, {entitled} {', '.join([entitlement] + rest)}."
@@ -0,0 +1,25 @@
+"""
+Constants Module
+
+Hebrew-English name mappings shared by the QA service and the user information
+validators. The services catalog keys HMOs and tiers by their Hebrew names;
+each mapping takes an English or Hebrew name to the Hebrew one.
+"""
+
+HMO_MAPPING = {
+    'Maccabi': 'מכבי',
+    'Clalit': 'כללית',
+    'Meuhedet': 'מאוחדת',
+    'מכבי': 'מכבי',
+    'כללית': 'כללית',
+    'מאוחדת': 'מאוחדת'
+}
+
+TIER_MAPPING = {
+    'Gold': 'זהב',
+    'Silver': 'כסף',
+    'Bronze': 'ארד',
+    'זהב': 'זהב',
+    'כסף': 'כסף',
+    'ארד': 'ארד'
+}
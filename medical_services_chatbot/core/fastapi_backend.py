@@ -6,20 +6,34 @@ This is the main FastAPI application that serves as the backend for the
 Medical Services Chatbot. It handles user information collection and Q&A services.
 """
 
+import asyncio
 import os
-from typing import List, Dict, Any
+import json
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Dict, Any, Optional
 import time
-import psutil
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
-from core.qa_service import QAService
+from core.health_sampler import health_sampler
+from core.http_clients import aclose_http_clients
+from core.llm_limiter import LLMOverloadedError, llm_limiter
+from core.model_router import model_router
+from core.qa_service import CatalogVersion, QAService
+from core.resilience import RequestDeadlineMiddleware, llm_caller
+from core.session_store import Session, SessionConflictError, SessionStore, create_session_store
+from core.slot_extraction import CollectionState
 from core.user_info_gathering_agent import UserInfoCollector
 from core.logging_config import get_logger
+from core.monitoring import PrometheusMiddleware, mark_worker_exit, render_metrics
+from core.responses import CompressionMiddleware, FastJSONResponse
 
 # Load environment variables
 load_dotenv()
@@ -27,11 +41,41 @@ load_dotenv()
 # Initialize logger
 logger = get_logger("fastapi_backend")
 
+# Our services, created per worker process in the lifespan
+user_info_collector: Optional[UserInfoCollector] = None
+qa_service: Optional[QAService] = None
+# Conversation state of the sessions API (in memory, or SQLite shared by the workers of a host)
+session_store: Optional[SessionStore] = None
+# Set by the pre-fork launcher (core.server) so every worker shares the catalog it loaded
+preloaded_catalog: Optional[CatalogVersion] = None
+# One lock per session with a turn in progress, so the turns of a session run one at a time in this
+# worker; turns in other workers are caught by the store's revision check
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global user_info_collector, qa_service, session_store
+    # Created here rather than at import, so LLM connection pools and catalog watcher
+    # threads belong to the worker process that serves the requests
+    user_info_collector = UserInfoCollector()
+    qa_service = QAService(catalog=preloaded_catalog)
+    session_store = create_session_store()
+    health_sampler.start()
+    yield
+    await health_sampler.stop()
+    qa_service.stop_catalog_watcher()
+    # Close the shared LLM connection pools on shutdown
+    await aclose_http_clients()
+    mark_worker_exit()
+
 # Initialize the FastAPI app
 app = FastAPI(
     title="Medical Services Chatbot API",
     description="API for the Medical Services Chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson rendering for every endpoint
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware to allow requests from Streamlit
@@ -43,13 +87,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize our services
-user_info_collector = UserInfoCollector()
-qa_service = QAService()
+# Server-side request metrics per route, served by /metrics
+app.add_middleware(PrometheusMiddleware, routes=app.routes)
+
+# End-to-end deadline shared by the LLM calls of each request
+app.add_middleware(RequestDeadlineMiddleware)
+
+# brotli/gzip for complete responses above API_COMPRESSION_MIN_BYTES; event streams are not compressed
+app.add_middleware(CompressionMiddleware)
 
 # Track service start time
 START_TIME = time.time()
 
+# Maximum number of questions in one /get-answers request
+QA_BATCH_MAX_QUESTIONS = int(os.environ.get("QA_BATCH_MAX_QUESTIONS", "50"))
+
 # Define request models
 class ChatMessage(BaseModel):
     role: str
@@ -68,12 +120,40 @@ class GetAnswerRequest(BaseModel):
     user_info: Dict[str, Any]
     question: str
 
+class CreateSessionRequest(BaseModel):
+    language: str
+
+class SessionMessageRequest(BaseModel):
+    message: str
+
+class GetAnswersRequest(BaseModel):
+    user_info: Dict[str, Any]
+    questions: List[str]
+
 class HealthStatus(BaseModel):
     status: str
     version: str
     uptime_seconds: float
     memory_usage_percent: float
     cpu_usage_percent: float
+    ready: bool
+    not_ready_reasons: List[str]
+    # Rolling-window signals of the background health sampler
+    signals: Dict[str, Any]
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    """Tell clients to back off when the limiter rejects a call or the provider is unavailable"""
+    return FastJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(SessionConflictError)
+async def session_conflict_handler(request: Request, exc: SessionConflictError):
+    """A concurrent turn of the same session was saved first; the client can resend the message"""
+    return FastJSONResponse(status_code=409, content={"detail": str(exc)})
 
 # Define endpoints
 @app.get("/")
@@ -82,26 +162,29 @@ async def root():
 
 @app.get("/health")
 async def health_check() -> HealthStatus:
-    """Health check endpoint that returns system status"""
+    """Health check endpoint that returns system status from the latest background sample"""
     try:
-        # Get system metrics
-        memory = psutil.Process().memory_percent()
-        cpu = psutil.Process().cpu_percent()
+        snapshot = health_sampler.snapshot()
+        ready, reasons = health_sampler.readiness()
         uptime = time.time() - START_TIME
 
         status = HealthStatus(
             status="healthy",
             version=app.version,
             uptime_seconds=uptime,
-            memory_usage_percent=memory,
-            cpu_usage_percent=cpu
+            memory_usage_percent=snapshot.get("memory_percent", 0.0),
+            cpu_usage_percent=snapshot.get("cpu_percent", 0.0),
+            ready=ready,
+            not_ready_reasons=reasons,
+            signals=snapshot
         )
 
         logger.info("health_check", 
                    status=status.status,
                    uptime=uptime,
-                   memory=memory,
-                   cpu=cpu)
+                   memory=status.memory_usage_percent,
+                   cpu=status.cpu_usage_percent,
+                   ready=ready)
         
         return status
     except Exception as e:
@@ -111,6 +194,24 @@ async def health_check() -> HealthStatus:
             detail=f"Health check failed: {str(e)}"
         )
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 while the process is saturated, so the load balancer sheds traffic"""
+    ready, reasons = health_sampler.readiness()
+    if not ready:
+        return FastJSONResponse(
+            status_code=503,
+            content={"ready": False, "reasons": reasons},
+            headers={"Retry-After": str(max(1, round(health_sampler.interval * 5)))},
+        )
+    return {"ready": True}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of the backend (aggregated over all workers in multiprocess mode)"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 @app.get("/welcome-message/{language}")
 async def get_welcome_message(language: str):
     """Get the welcome message in the specified language"""
@@ -120,25 +221,80 @@ async def get_welcome_message(language: str):
 async def process_user_input(request: ProcessUserInputRequest):
     """Process user input and return appropriate response"""
     try:
-        response = user_info_collector.process_user_input(
+        response = await user_info_collector.aprocess_user_input(
             request.user_input,
             request.chat_history,
             request.language
         )
-        return response
+        # Returned as a response so FastAPI skips jsonable_encoder on these plain dicts
+        return FastJSONResponse(response)
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         logger.error("process_input_error", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error processing input: {str(e)}")
 
+def _sse_message(event: Dict[str, Any]) -> str:
+    event_type = event.pop("type")
+    return f"event: {event_type}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+def _sse_error(detail: str) -> str:
+    return f"event: error\ndata: {json.dumps({'detail': detail})}\n\n"
+
+async def _event_stream(events: AsyncIterator[Dict[str, Any]], endpoint: str) -> StreamingResponse:
+    """Forward service events to the client as server-sent events"""
+    # Wait for the first event before responding, so limiter rejections and HTTP errors (e.g. an
+    # unknown session) still become error responses.
+    # Any other failure of the first step is sent as the same error event as a mid-stream failure
+    first_event, first_error = None, None
+    try:
+        first_event = await events.__anext__()
+    except (LLMOverloadedError, HTTPException):
+        raise
+    except StopAsyncIteration:
+        logger.error(f"{endpoint}_stream_error", error="empty stream")
+        first_error = "The stream ended without a response"
+    except Exception as e:
+        logger.error(f"{endpoint}_stream_error", error=str(e))
+        first_error = str(e)
+
+    async def sse():
+        if first_error is not None:
+            yield _sse_error(first_error)
+            return
+        try:
+            yield _sse_message(first_event)
+            async for event in events:
+                yield _sse_message(event)
+        except Exception as e:
+            logger.error(f"{endpoint}_stream_error", error=str(e))
+            yield _sse_error(str(e))
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/process-input/stream")
+async def process_user_input_stream(request: ProcessUserInputRequest):
+    """Stream the response to user input as server-sent events (token events, then a done event)"""
+    return await _event_stream(
+        user_info_collector.astream_user_input(request.user_input, request.chat_history, request.language),
+        "process_input",
+    )
+
 @app.post("/extract-user-info")
 async def extract_user_info(request: ExtractUserInfoRequest):
     """Extract structured user information from chat history"""
     try:
-        user_info = user_info_collector.extract_user_info(
+        user_info = await user_info_collector.aextract_user_info(
             request.chat_history,
             request.language
         )
-        return user_info
+        return FastJSONResponse(user_info)
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         logger.error("extract_user_info_error", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error extracting user info: {str(e)}")
@@ -147,15 +303,195 @@ async def extract_user_info(request: ExtractUserInfoRequest):
 async def get_answer(request: GetAnswerRequest):
     """Get an answer to the user's question using the QA service"""
     try:
-        answer = qa_service.get_answer(
+        result = await qa_service.aanswer_question(
             request.user_info,
             request.question
         )
-        return {"answer": answer}
+        logger.info("answer_generated", catalog_version=result["catalog_version"], source=result["source"])
+        return FastJSONResponse(result)
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         logger.error("get_answer_error", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error getting answer: {str(e)}")
 
+@app.post("/get-answers")
+async def get_answers(request: GetAnswersRequest):
+    """Answer a batch of questions for one user concurrently; results keep the input order"""
+    if len(request.questions) > QA_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many questions: {len(request.questions)} (maximum {QA_BATCH_MAX_QUESTIONS})"
+        )
+    start = time.perf_counter()
+    results = await qa_service.aanswer_questions(request.user_info, request.questions)
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+    failed = sum(1 for item in results if "error" in item)
+    logger.info("answers_generated", questions=len(results), failed=failed, elapsed_ms=elapsed_ms)
+    return FastJSONResponse({"results": results, "failed": failed, "elapsed_ms": elapsed_ms})
+
+@app.post("/get-answer/stream")
+async def get_answer_stream(request: GetAnswerRequest):
+    """Stream the answer as server-sent events (token events, then a done event)"""
+    return await _event_stream(qa_service.astream_answer(request.user_info, request.question), "get_answer")
+
+async def _store_call(method, *args):
+    """Call a session store method, in the thread pool when the backend blocks on I/O (SQLite)"""
+    if session_store.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+async def _get_session(session_id: str) -> Session:
+    session = await _store_call(session_store.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+async def _finish_collection_turn(session: Session, message: str, response: Dict[str, Any]) -> Dict[str, Any]:
+    """Record an information collection turn; on confirmation extract the user info and switch to Q&A"""
+    user_turn = {"role": "user", "content": message}
+    if response.get("is_validated") == "True":
+        confirmation = {"role": "assistant", "content": response["content"]}
+        # The session is only changed once the extraction succeeded, so a failed turn can be retried.
+        # A structured turn already carries the validated fields
+        user_info = response.get("user_info") or await user_info_collector.aextract_user_info(
+            session.chat_history + [user_turn, confirmation],
+            session.language
+        )
+        if user_info:
+            session.user_info = user_info
+            session.is_qa_mode = True
+            response = {**response, "content": user_info_collector.get_qa_transition_message(session.language)}
+            logger.info("session_transitioned_to_qa_mode", session_id=session.session_id)
+    previous = session.chat_history[-1] if session.chat_history else None
+    state = CollectionState.from_record(session.collection_state)
+    state.update(previous["content"] if previous and previous["role"] == "assistant" else None, message)
+    session.collection_state = state.to_record()
+    session.chat_history.append(user_turn)
+    session.chat_history.append({"role": "assistant", "content": response["content"]})
+    await _store_call(session_store.save, session)
+    return {**response, "session_id": session.session_id, "is_qa_mode": session.is_qa_mode,
+            "user_info": session.user_info}
+
+async def _finish_qa_turn(session: Session, message: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Record a Q&A turn and build the response in the shape of an information collection turn"""
+    session.chat_history.append({"role": "user", "content": message})
+    session.chat_history.append({"role": "assistant", "content": result["answer"]})
+    await _store_call(session_store.save, session)
+    return {**result, "role": "assistant", "content": result["answer"], "session_id": session.session_id,
+            "is_qa_mode": True, "user_info": session.user_info}
+
+@app.post("/sessions")
+async def create_session(request: CreateSessionRequest):
+    """Start a conversation; the server keeps its history and returns the welcome message"""
+    session = await _store_call(session_store.create, request.language)
+    welcome_message = user_info_collector.get_welcome_message(request.language)
+    session.chat_history.append({"role": "assistant", "content": welcome_message})
+    await _store_call(session_store.save, session)
+    logger.info("session_created", session_id=session.session_id, language=request.language)
+    return {"session_id": session.session_id, "message": welcome_message}
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Conversation state: language, chat history, extracted user info and mode"""
+    return FastJSONResponse((await _get_session(session_id)).to_record())
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not await _store_call(session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": True}
+
+@app.post("/sessions/{session_id}/messages")
+async def post_session_message(session_id: str, request: SessionMessageRequest):
+    """
+    Send the next user message of a session.
+
+    During information collection this is a process-input turn (followed by the
+    user info extraction once the details are confirmed); afterwards it is a
+    get-answer turn with the stored user info. Messages of one session are
+    processed one at a time.
+    """
+    async with _session_lock(session_id):
+        session = await _get_session(session_id)
+        try:
+            if session.is_qa_mode:
+                result = await qa_service.aanswer_question(session.user_info, request.message)
+                logger.info("answer_generated", catalog_version=result["catalog_version"], source=result["source"])
+                return FastJSONResponse(await _finish_qa_turn(session, request.message, result))
+            response = await user_info_collector.aprocess_user_input(
+                request.message,
+                session.chat_history,
+                session.language,
+                CollectionState.from_record(session.collection_state)
+            )
+            return FastJSONResponse(await _finish_collection_turn(session, request.message, response))
+        except (LLMOverloadedError, SessionConflictError):
+            raise
+        except Exception as e:
+            logger.error("session_message_error", session_id=session_id, error=str(e))
+            raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
+
+@app.post("/sessions/{session_id}/messages/stream")
+async def post_session_message_stream(session_id: str, request: SessionMessageRequest):
+    """Streaming variant of the session message endpoint (token events, then a done event)"""
+
+    async def session_events():
+        # Held until the stream ends, so the next message of the session waits for this turn
+        async with _session_lock(session_id):
+            session = await _get_session(session_id)
+            qa_mode = session.is_qa_mode
+            if qa_mode:
+                events = qa_service.astream_answer(session.user_info, request.message)
+            else:
+                events = user_info_collector.astream_user_input(request.message, session.chat_history,
+                                                                session.language,
+                                                                CollectionState.from_record(session.collection_state))
+            async for event in events:
+                if event["type"] != "done":
+                    yield event
+                    continue
+                event.pop("type")
+                if qa_mode:
+                    yield {"type": "done", **await _finish_qa_turn(session, request.message, event)}
+                else:
+                    yield {"type": "done", **await _finish_collection_turn(session, request.message, event)}
+
+    return await _event_stream(session_events(), "session_message")
+
+@app.get("/session-store/stats")
+async def session_store_stats():
+    """Backend and number of stored conversation sessions"""
+    return await _store_call(session_store.stats)
+
+@app.get("/qa-cache/stats")
+async def qa_cache_stats():
+    """Hit/miss counters and size of the QA answer cache"""
+    if qa_service.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "catalog_version": qa_service.catalog.version, **qa_service.answer_cache.stats()}
+
+@app.get("/llm-limiter/stats")
+async def llm_limiter_stats():
+    """Concurrency slots in use and queued LLM calls"""
+    return llm_limiter.stats()
+
+@app.get("/llm-resilience/stats")
+async def llm_resilience_stats():
+    """Retry/hedging settings, call and hedge counts, hedge delays and circuit breaker states"""
+    return llm_caller.stats()
+
+@app.get("/model-router/stats")
+async def model_router_stats():
+    """Model routes and the routed calls and escalation rate per route and model"""
+    return model_router.stats()
+
 # Run the server
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
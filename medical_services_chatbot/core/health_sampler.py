@@ -0,0 +1,192 @@
+"""
+Health Sampler Module
+
+Samples process health in the background and keeps rolling windows of the
+signals, so `/health` and `/ready` read a precomputed snapshot in constant time
+instead of measuring on the request path.
+
+Every `interval` seconds the sampler records:
+- process CPU percent (one long-lived psutil.Process, so the value covers the interval)
+- RSS and memory percent
+- event-loop lag: how late the sampler's own sleep woke up
+- thread-pool saturation: AnyIO worker threads in use and tasks waiting for one
+- LLM calls in flight and queued in the concurrency limiter
+- p95 latency of the LLM calls that finished within the window
+
+Readiness is judged on the last few samples against configurable thresholds, so a
+saturated worker can be taken out of rotation by the load balancer and put back
+once it drains.
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+from anyio import to_thread
+
+from core.llm_limiter import LLMConcurrencyLimiter, llm_limiter
+from core.logging_config import get_logger
+from core.monitoring import RECENT_LLM_LATENCIES
+
+logger = get_logger("health_sampler")
+
+HEALTH_SAMPLE_INTERVAL_SECONDS = float(os.environ.get("HEALTH_SAMPLE_INTERVAL_SECONDS", "1"))
+# Length of the rolling windows reported by /health
+HEALTH_WINDOW_SECONDS = float(os.environ.get("HEALTH_WINDOW_SECONDS", "60"))
+# Samples averaged for the readiness decision
+HEALTH_READY_SAMPLES = int(os.environ.get("HEALTH_READY_SAMPLES", "5"))
+# Readiness thresholds (0 disables a check)
+HEALTH_MAX_CPU_PERCENT = float(os.environ.get("HEALTH_MAX_CPU_PERCENT", "90"))
+HEALTH_MAX_LOOP_LAG_MS = float(os.environ.get("HEALTH_MAX_LOOP_LAG_MS", "250"))
+HEALTH_MAX_THREADPOOL_WAITING = int(os.environ.get("HEALTH_MAX_THREADPOOL_WAITING", "20"))
+HEALTH_MAX_LLM_QUEUE_RATIO = float(os.environ.get("HEALTH_MAX_LLM_QUEUE_RATIO", "0.8"))
+HEALTH_MAX_LLM_P95_SECONDS = float(os.environ.get("HEALTH_MAX_LLM_P95_SECONDS", "30"))
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an unsorted list (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def _mean(values: List[float]) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+class HealthSampler:
+    """Background task sampling process health into rolling windows."""
+
+    def __init__(self, interval: float = HEALTH_SAMPLE_INTERVAL_SECONDS, window_seconds: float = HEALTH_WINDOW_SECONDS,
+                 limiter: Optional[LLMConcurrencyLimiter] = None):
+        self.interval = max(0.05, interval)
+        self.window_seconds = window_seconds
+        self.limiter = limiter or llm_limiter
+        self._samples = deque(maxlen=max(1, int(window_seconds / self.interval)))
+        self._process: Optional[psutil.Process] = None
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot: Dict[str, Any] = {"sampled": False}
+        self._ready: Tuple[bool, List[str]] = (True, [])
+
+    def start(self) -> None:
+        """Start sampling on the running event loop."""
+        if self._task is None:
+            # Created here rather than at import, so a forked worker samples itself and not its parent
+            self._process = psutil.Process()
+            # The first cpu_percent() call only sets the baseline
+            self._process.cpu_percent(None)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The latest precomputed health summary."""
+        return self._snapshot
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        """Whether the process should receive traffic, and why not."""
+        if self._task is not None and self._snapshot.get("sampled"):
+            # A sampler that stopped ticking means the loop is stuck
+            stale_after = max(5 * self.interval, 2.0)
+            if time.monotonic() - self._snapshot["sampled_at_monotonic"] > stale_after:
+                return False, ["health samples are stale"]
+        return self._ready
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            try:
+                self._record(lag_ms)
+            except Exception as e:
+                logger.error("health_sample_error", error=str(e))
+
+    def _record(self, lag_ms: float) -> None:
+        limiter_stats = self.limiter.stats()
+        thread_limiter = to_thread.current_default_thread_limiter().statistics()
+        memory = self._process.memory_info()
+        self._samples.append({
+            "cpu_percent": self._process.cpu_percent(None),
+            "rss_bytes": memory.rss,
+            "loop_lag_ms": lag_ms,
+            "threadpool_busy": thread_limiter.borrowed_tokens,
+            "threadpool_waiting": thread_limiter.tasks_waiting,
+            "llm_in_flight": limiter_stats["in_flight"],
+            "llm_queued": limiter_stats["queued"],
+        })
+        self._snapshot = self._summarize(limiter_stats, thread_limiter.total_tokens)
+        self._ready = self._judge(limiter_stats)
+
+    def _recent_llm_p95(self) -> float:
+        cutoff = time.monotonic() - self.window_seconds
+        return _percentile([seconds for finished_at, seconds in list(RECENT_LLM_LATENCIES) if finished_at >= cutoff], 0.95)
+
+    def _summarize(self, limiter_stats: Dict[str, Any], threadpool_size: int) -> Dict[str, Any]:
+        samples = list(self._samples)
+        latest = samples[-1]
+        cpu = [s["cpu_percent"] for s in samples]
+        lag = [s["loop_lag_ms"] for s in samples]
+        return {
+            "sampled": True,
+            "sampled_at": time.time(),
+            "sampled_at_monotonic": time.monotonic(),
+            "window_seconds": round(len(samples) * self.interval, 1),
+            "cpu_percent": latest["cpu_percent"],
+            "cpu_percent_avg": round(_mean(cpu), 1),
+            "cpu_percent_max": max(cpu),
+            "rss_mb": round(latest["rss_bytes"] / (1024 * 1024), 1),
+            "memory_percent": round(self._process.memory_percent(), 2),
+            "event_loop_lag_ms": round(latest["loop_lag_ms"], 2),
+            "event_loop_lag_p95_ms": round(_percentile(lag, 0.95), 2),
+            "event_loop_lag_max_ms": round(max(lag), 2),
+            "threadpool_size": threadpool_size,
+            "threadpool_busy": latest["threadpool_busy"],
+            "threadpool_waiting": latest["threadpool_waiting"],
+            "llm_in_flight": latest["llm_in_flight"],
+            "llm_queued": latest["llm_queued"],
+            "llm_max_concurrency": limiter_stats["max_concurrency"],
+            "llm_max_queue": limiter_stats["max_queue"],
+            "llm_latency_p95_seconds": round(self._recent_llm_p95(), 3),
+        }
+
+    def _judge(self, limiter_stats: Dict[str, Any]) -> Tuple[bool, List[str]]:
+        recent = list(self._samples)[-max(1, HEALTH_READY_SAMPLES):]
+        reasons = []
+        cpu = _mean([s["cpu_percent"] for s in recent])
+        if HEALTH_MAX_CPU_PERCENT and cpu > HEALTH_MAX_CPU_PERCENT:
+            reasons.append(f"cpu {cpu:.0f}% > {HEALTH_MAX_CPU_PERCENT:g}%")
+        lag = _mean([s["loop_lag_ms"] for s in recent])
+        if HEALTH_MAX_LOOP_LAG_MS and lag > HEALTH_MAX_LOOP_LAG_MS:
+            reasons.append(f"event loop lag {lag:.0f}ms > {HEALTH_MAX_LOOP_LAG_MS:g}ms")
+        waiting = recent[-1]["threadpool_waiting"]
+        if HEALTH_MAX_THREADPOOL_WAITING and waiting > HEALTH_MAX_THREADPOOL_WAITING:
+            reasons.append(f"{waiting} tasks waiting for a worker thread")
+        if HEALTH_MAX_LLM_QUEUE_RATIO and limiter_stats["max_queue"]:
+            ratio = limiter_stats["queued"] / limiter_stats["max_queue"]
+            if ratio >= HEALTH_MAX_LLM_QUEUE_RATIO:
+                reasons.append(f"LLM queue {ratio:.0%} full")
+        p95 = self._snapshot.get("llm_latency_p95_seconds", 0.0)
+        if HEALTH_MAX_LLM_P95_SECONDS and p95 > HEALTH_MAX_LLM_P95_SECONDS:
+            reasons.append(f"LLM p95 latency {p95:.1f}s > {HEALTH_MAX_LLM_P95_SECONDS:g}s")
+
+        ready = not reasons
+        if ready != self._ready[0]:
+            logger.warning("readiness_changed", ready=ready, reasons=reasons)
+        return ready, reasons
+
+
+# One sampler per process, started by the backend lifespan
+health_sampler = HealthSampler()
@@ -0,0 +1,125 @@
+"""
+HTTP Clients Module
+
+One shared, tuned connection pool for all Azure OpenAI clients of the process.
+Without it every service builds its own client with default pool settings and no
+explicit timeout; with it, `QAService` and `UserInfoCollector` reuse the same
+keep-alive connections (HTTP/2, through the `h2` package that requirements.txt
+installs with httpx[http2]) and fail fast on connect problems instead of hanging.
+"""
+
+import importlib.util
+import os
+import threading
+from typing import Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from openai import AzureOpenAI, AsyncAzureOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient
+
+from core.logging_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("http_clients")
+
+# Azure OpenAI Configuration
+AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_KEY")
+AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_API_VERSION")
+
+# Connection pool configuration
+LLM_HTTP_MAX_CONNECTIONS = int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.environ.get("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+# Covers the whole generation of a non-streamed completion, and the gap between streamed chunks
+LLM_HTTP_READ_TIMEOUT = float(os.environ.get("LLM_HTTP_READ_TIMEOUT", "60"))
+# Use HTTP/2 (multiplexes concurrent calls over fewer connections); needs the h2 package of httpx[http2]
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "true").lower() == "true"
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def http2_enabled() -> bool:
+    return LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _pool_created(kind: str) -> None:
+    if LLM_HTTP2 and not http2_enabled():
+        logger.warning("llm_http2_unavailable", kind=kind,
+                       detail="LLM_HTTP2 is on but the h2 package is missing (pip install 'httpx[http2]'); using HTTP/1.1")
+    logger.info("llm_http_pool_created", kind=kind, http2=http2_enabled(), max_connections=LLM_HTTP_MAX_CONNECTIONS)
+
+
+def llm_timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_HTTP_READ_TIMEOUT, connect=LLM_HTTP_CONNECT_TIMEOUT)
+
+
+def _pool_settings() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": llm_timeout(),
+        "http2": http2_enabled(),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide pooled client for sync LLM calls."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = DefaultHttpxClient(**_pool_settings())
+            _pool_created("sync")
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled client for async LLM calls."""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            _async_http_client = DefaultAsyncHttpxClient(**_pool_settings())
+            _pool_created("async")
+        return _async_http_client
+
+
+def create_azure_clients() -> Tuple[AzureOpenAI, AsyncAzureOpenAI]:
+    """Sync and async Azure OpenAI clients on the shared connection pools."""
+    client = AzureOpenAI(
+        api_key=AZURE_OPENAI_API_KEY,
+        api_version=AZURE_OPENAI_API_VERSION,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        timeout=llm_timeout(),
+        # Retries are made by core.resilience, within the request deadline
+        max_retries=0,
+        http_client=get_http_client(),
+    )
+    async_client = AsyncAzureOpenAI(
+        api_key=AZURE_OPENAI_API_KEY,
+        api_version=AZURE_OPENAI_API_VERSION,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        timeout=llm_timeout(),
+        max_retries=0,
+        http_client=get_async_http_client(),
+    )
+    return client, async_client
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared pools (on application shutdown)."""
+    global _http_client, _async_http_client
+    with _lock:
+        client, async_client = _http_client, _async_http_client
+        _http_client = _async_http_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
@@ -0,0 +1,210 @@
+"""
+LLM Concurrency Limiter Module
+
+Bounds the number of concurrent Azure OpenAI calls made by the process. Calls
+beyond `max_concurrency` wait in a FIFO queue; the queue is bounded overall and
+per endpoint, so one busy endpoint (e.g. get_answer) cannot take every queue
+slot. A call that finds the queue full, or waits longer than `queue_timeout`,
+raises `LLMOverloadedError` carrying the HTTP status (429 or 503) and a
+Retry-After estimate for the client.
+
+The same limiter serves async callers (`acquire`) and sync callers
+(`acquire_sync`), so both share one budget.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, Optional
+
+from core.logging_config import get_logger
+from core.monitoring import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_REJECTIONS, LLM_QUEUE_WAIT_SECONDS
+
+logger = get_logger("llm_limiter")
+
+# Maximum concurrent LLM calls per process
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+# Maximum calls waiting for a slot, across all endpoints
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))
+# Seconds a call may wait for a slot before it is rejected (0 waits indefinitely)
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+# Per-endpoint queue budgets, e.g. "get_answer=40,process_input=16,extract_user_info=8"
+LLM_QUEUE_BUDGETS = os.environ.get("LLM_QUEUE_BUDGETS", "get_answer=40,process_input=16,extract_user_info=8")
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """Parse "endpoint=limit,..." into a dict, ignoring malformed entries."""
+    budgets = {}
+    for item in spec.split(','):
+        endpoint, _, limit = item.partition('=')
+        if endpoint.strip() and limit.strip().isdigit():
+            budgets[endpoint.strip()] = int(limit)
+    return budgets
+
+
+class LLMOverloadedError(Exception):
+    """Raised when an LLM call cannot get a slot; maps to an HTTP 429/503 response."""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+        # A full queue is the client's cue to back off; a queue timeout means the provider is slow
+        self.status_code = 429 if reason == "queue_full" else 503
+        super().__init__(f"LLM capacity exceeded for {endpoint} ({reason}), retry after {retry_after}s")
+
+
+class _Waiter:
+    __slots__ = ("endpoint", "wake", "granted")
+
+    def __init__(self, endpoint: str, wake: Callable[[], None]):
+        self.endpoint = endpoint
+        self.wake = wake
+        self.granted = False
+
+
+class LLMConcurrencyLimiter:
+    """FIFO concurrency limiter with a bounded, per-endpoint budgeted wait queue."""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT_SECONDS,
+                 endpoint_budgets: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.endpoint_budgets = parse_budgets(LLM_QUEUE_BUDGETS) if endpoint_budgets is None else endpoint_budgets
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self._queued: Dict[str, int] = {}
+        # Moving average of how long a slot is held, for Retry-After estimates
+        self._avg_hold_seconds = 2.0
+
+    @asynccontextmanager
+    async def acquire(self, endpoint: str):
+        """Hold an LLM slot for the duration of the block (async callers)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        start = time.monotonic()
+        waiter = self._enqueue(endpoint, wake)
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout or None)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if self._abandon(waiter):
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    raise self._reject(endpoint, "queue_timeout")
+                # The slot was handed over while we were giving up
+                if isinstance(e, asyncio.CancelledError):
+                    self._release(0.0)
+                    raise
+        LLM_QUEUE_WAIT_SECONDS.labels(endpoint=endpoint).observe(time.monotonic() - start)
+
+        held_from = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - held_from)
+
+    @contextmanager
+    def acquire_sync(self, endpoint: str):
+        """Hold an LLM slot for the duration of the block (sync callers)."""
+        event = threading.Event()
+        start = time.monotonic()
+        waiter = self._enqueue(endpoint, event.set)
+        if waiter is not None and not event.wait(self.queue_timeout or None):
+            if self._abandon(waiter):
+                raise self._reject(endpoint, "queue_timeout")
+        LLM_QUEUE_WAIT_SECONDS.labels(endpoint=endpoint).observe(time.monotonic() - start)
+
+        held_from = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - held_from)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._active,
+                "max_queue": self.max_queue,
+                "queued": len(self._waiters),
+                "queued_by_endpoint": {endpoint: n for endpoint, n in self._queued.items() if n},
+            }
+
+    def _enqueue(self, endpoint: str, wake: Callable[[], None]) -> Optional[_Waiter]:
+        """Take a free slot (returns None) or join the queue (returns the waiter)."""
+        with self._lock:
+            # Queued callers go first, so a free slot is only taken directly when nobody waits
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                LLM_IN_FLIGHT.set(self._active)
+                return None
+
+            queued = self._queued.get(endpoint, 0)
+            budget = self.endpoint_budgets.get(endpoint, self.max_queue)
+            if len(self._waiters) >= self.max_queue or queued >= budget:
+                full = True
+            else:
+                full = False
+                waiter = _Waiter(endpoint, wake)
+                self._waiters.append(waiter)
+                self._queued[endpoint] = queued + 1
+                LLM_QUEUE_DEPTH.labels(endpoint=endpoint).set(queued + 1)
+        if full:
+            raise self._reject(endpoint, "queue_full")
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Remove a waiter that gave up; False if it was granted a slot in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            self._dequeued(waiter.endpoint)
+            return True
+
+    def _release(self, held_seconds: float) -> None:
+        """Free a slot, handing it directly to the next queued caller if there is one."""
+        with self._lock:
+            if held_seconds > 0:
+                self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held_seconds
+            waiter = None
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self._dequeued(waiter.endpoint)
+            else:
+                self._active -= 1
+                LLM_IN_FLIGHT.set(self._active)
+        if waiter is not None:
+            waiter.wake()
+
+    def _dequeued(self, endpoint: str) -> None:
+        # Called with the lock held
+        self._queued[endpoint] -= 1
+        LLM_QUEUE_DEPTH.labels(endpoint=endpoint).set(self._queued[endpoint])
+
+    def _reject(self, endpoint: str, reason: str) -> LLMOverloadedError:
+        with self._lock:
+            # Time for the current queue to drain through the available slots
+            drain = self._avg_hold_seconds * (len(self._waiters) + 1) / self.max_concurrency
+        retry_after = max(1, math.ceil(drain))
+        LLM_QUEUE_REJECTIONS.labels(endpoint=endpoint, reason=reason).inc()
+        logger.warning("llm_call_rejected", endpoint=endpoint, reason=reason, retry_after=retry_after)
+        return LLMOverloadedError(endpoint, reason, retry_after)
+
+
+# Shared by every service in the process, so the limit applies to all LLM calls together
+llm_limiter = LLMConcurrencyLimiter()
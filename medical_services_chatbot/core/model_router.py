@@ -0,0 +1,144 @@
+"""
+Model Router Module
+
+Chooses the model of every Azure OpenAI call by endpoint and turn type, so
+simple turns run on the faster gpt-4o-mini and the rest stay on gpt-4o.
+
+Routes come from LLM_ROUTES as "endpoint[.turn_type]=model,...". An entry for
+the turn type wins over the one for the endpoint; calls without a route use
+LLM_DEFAULT_MODEL. The turn types are:
+
+- process_input.collect: asking for and checking the details
+- process_input.confirm: every detail is collected; the model shows the
+  summary or handles the user's answer to it
+- extract_user_info.extract: JSON extraction of the confirmed details
+- get_answer.answer: Q&A over the HMO/tier services table
+
+The output of a call routed to another model than LLM_ESCALATION_MODEL is
+checked before it is used. When the check rejects it (invalid JSON, fields
+that don't validate, an empty or truncated reply, a confirmation while
+details are missing), the call is escalated: made again on the escalation
+model. Streamed calls are on screen as they arrive, so they are routed but not
+escalated.
+
+Per-model latency is recorded by the call layer
+(medical_chatbot_llm_call_latency_seconds). Routing decisions and escalations
+are counted here, so a route's escalation rate is its escalations divided by
+its routed calls.
+"""
+
+import os
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from core.logging_config import get_logger
+from core.monitoring import LLM_ESCALATIONS, LLM_ROUTED_CALLS, record_token_usage
+
+logger = get_logger("model_router")
+
+T = TypeVar("T")
+
+# Model of the calls without a route
+LLM_DEFAULT_MODEL = os.environ.get("LLM_DEFAULT_MODEL", "gpt-4o")
+# Model that rejected output is sent to again
+LLM_ESCALATION_MODEL = os.environ.get("LLM_ESCALATION_MODEL", "gpt-4o")
+# "endpoint[.turn_type]=model,..." (empty = every call on the default model)
+LLM_ROUTES = os.environ.get(
+    "LLM_ROUTES", "process_input=gpt-4o-mini,process_input.confirm=gpt-4o,extract_user_info=gpt-4o-mini"
+)
+
+# Checks a call's output: the reason to escalate, or None to use it
+OutputCheck = Callable[[Any], Optional[str]]
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """Parse "endpoint[.turn_type]=model,..." into a dict, ignoring malformed entries."""
+    routes = {}
+    for item in spec.split(','):
+        route, _, model = item.partition('=')
+        if route.strip() and model.strip():
+            routes[route.strip()] = model.strip()
+    return routes
+
+
+class ModelRouter:
+    """Selects the model per endpoint and turn type, and escalates rejected output"""
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None, default_model: str = LLM_DEFAULT_MODEL,
+                 escalation_model: str = LLM_ESCALATION_MODEL):
+        self.routes = parse_routes(LLM_ROUTES) if routes is None else dict(routes)
+        self.default_model = default_model
+        self.escalation_model = escalation_model
+        self._lock = threading.Lock()
+        # "endpoint.turn_type" -> model -> {"calls": n, "escalations": n}
+        self._counts: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def select(self, endpoint: str, turn_type: str) -> str:
+        """The model of a call, without counting it"""
+        return self.routes.get(f"{endpoint}.{turn_type}") or self.routes.get(endpoint) or self.default_model
+
+    def route(self, endpoint: str, turn_type: str) -> str:
+        """The model of a call, counted as a routing decision"""
+        model = self.select(endpoint, turn_type)
+        LLM_ROUTED_CALLS.labels(endpoint=endpoint, turn_type=turn_type, model=model).inc()
+        self._count(endpoint, turn_type, model, "calls")
+        return model
+
+    def call(self, caller, endpoint: str, turn_type: str, create: Callable[[str, float], T],
+             check: Optional[OutputCheck] = None) -> T:
+        """Make a call through `caller` on the routed model; `create(model, timeout)` sends it"""
+        model = self.route(endpoint, turn_type)
+        response = caller.call(endpoint, model, lambda timeout: create(model, timeout))
+        escalation = self._escalation(endpoint, turn_type, model, response, check)
+        if escalation is None:
+            return response
+        return caller.call(endpoint, escalation, lambda timeout: create(escalation, timeout))
+
+    async def acall(self, caller, endpoint: str, turn_type: str, create: Callable[[str, float], Awaitable[T]],
+                    check: Optional[OutputCheck] = None) -> T:
+        """Async version of call"""
+        model = self.route(endpoint, turn_type)
+        response = await caller.acall(endpoint, model, lambda timeout: create(model, timeout))
+        escalation = self._escalation(endpoint, turn_type, model, response, check)
+        if escalation is None:
+            return response
+        return await caller.acall(endpoint, escalation, lambda timeout: create(escalation, timeout))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {route: {model: dict(c) for model, c in models.items()} for route, models in self._counts.items()}
+        for models in counts.values():
+            for c in models.values():
+                c["escalation_rate"] = round(c["escalations"] / c["calls"], 4) if c["calls"] else 0.0
+        return {"routes": dict(self.routes), "default_model": self.default_model,
+                "escalation_model": self.escalation_model, "calls": counts}
+
+    def _escalation(self, endpoint: str, turn_type: str, model: str, response: Any,
+                    check: Optional[OutputCheck]) -> Optional[str]:
+        """The model to repeat the call on, if the output is rejected"""
+        if check is None or model == self.escalation_model:
+            return None
+        try:
+            reason = check(response)
+        except Exception as e:
+            logger.warning("routed_output_check_error", endpoint=endpoint, error=str(e))
+            reason = "check_error"
+        if reason is None:
+            return None
+        LLM_ESCALATIONS.labels(endpoint=endpoint, turn_type=turn_type, model=model, reason=reason).inc()
+        self._count(endpoint, turn_type, model, "escalations")
+        logger.info("llm_call_escalated", endpoint=endpoint, turn_type=turn_type, model=model,
+                    escalation_model=self.escalation_model, reason=reason)
+        # The rejected call's tokens were spent too
+        record_token_usage(endpoint, getattr(response, "usage", None))
+        return self.escalation_model
+
+    def _count(self, endpoint: str, turn_type: str, model: str, name: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(f"{endpoint}.{turn_type}", {}).setdefault(
+                model, {"calls": 0, "escalations": 0})
+            counts[name] += 1
+
+
+# Shared by the services of the process
+model_router = ModelRouter()
@@ -1,12 +1,25 @@
 """
 Monitoring configuration for the Medical Services Chatbot
+
+With several backend workers, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+before the processes start; every worker then writes its samples there and
+`render_metrics` aggregates them, so any worker can serve `/metrics`.
 """
 
-from prometheus_client import Counter, Histogram, start_http_server
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess, start_http_server)
+import os
 import time
-from typing import Dict, Any
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
 import requests
 from functools import wraps
+from starlette.routing import Match
+
+from core.logging_config import get_logger
+
+logger = get_logger("monitoring")
 
 # Define metrics
 REQUEST_COUNT = Counter(
@@ -27,6 +40,281 @@ ERROR_COUNT = Counter(
     ['endpoint', 'error_type']
 )
 
+QA_CACHE_LOOKUPS = Counter(
+    'medical_chatbot_qa_cache_lookups_total',
+    'QA answer cache lookups by result (exact_hit, semantic_hit, miss)',
+    ['result']
+)
+
+QA_CACHE_EVICTIONS = Counter(
+    'medical_chatbot_qa_cache_evictions_total',
+    'QA answer cache evictions by reason (lru, ttl, invalidation)',
+    ['reason']
+)
+
+SESSION_EVICTIONS = Counter(
+    'medical_chatbot_session_evictions_total',
+    'Server-side conversation sessions dropped by reason (lru, ttl)',
+    ['reason']
+)
+
+QA_FAST_PATH = Counter(
+    'medical_chatbot_qa_fast_path_total',
+    'Factual questions answered from parsed benefit facts (answered) or sent to the LLM (fallback)',
+    ['result']
+)
+
+USER_INFO_EXTRACTIONS = Counter(
+    'medical_chatbot_user_info_extractions_total',
+    'User information extractions settled by local rules (local), taken from a structured confirmation turn '
+    '(structured_turn) or needing the LLM for some (llm_partial) or all (llm_full) fields',
+    ['result']
+)
+
+USER_INFO_REPROMPTS = Counter(
+    'medical_chatbot_user_info_reprompts_total',
+    'Clearly invalid collection replies re-asked from a template, each an LLM call avoided, by field and rule',
+    ['field', 'reason']
+)
+
+QA_LLM_CALLS = Counter(
+    'medical_chatbot_qa_llm_calls_total',
+    'QA completions issued to the LLM vs. requests coalesced onto an identical in-flight call',
+    ['result']
+)
+
+LLM_IN_FLIGHT = Gauge(
+    'medical_chatbot_llm_in_flight',
+    'LLM calls currently holding a concurrency slot',
+    multiprocess_mode='livesum'
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    'medical_chatbot_llm_queue_depth',
+    'LLM calls waiting for a concurrency slot',
+    ['endpoint'],
+    multiprocess_mode='livesum'
+)
+
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    'medical_chatbot_llm_queue_wait_seconds',
+    'Time LLM calls waited for a concurrency slot',
+    ['endpoint'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+LLM_QUEUE_REJECTIONS = Counter(
+    'medical_chatbot_llm_queue_rejections_total',
+    'LLM calls rejected by the concurrency limiter by reason (queue_full, queue_timeout)',
+    ['endpoint', 'reason']
+)
+
+LLM_PROMPT_TOKENS = Histogram(
+    'medical_chatbot_llm_prompt_tokens_per_call',
+    'Prompt tokens per LLM call',
+    ['endpoint'],
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+)
+
+LLM_PROMPT_TOKENS_TOTAL = Counter(
+    'medical_chatbot_llm_prompt_tokens_total',
+    'Total prompt tokens sent to the LLM',
+    ['endpoint']
+)
+
+LLM_CACHED_PROMPT_TOKENS_TOTAL = Counter(
+    'medical_chatbot_llm_cached_prompt_tokens_total',
+    'Prompt tokens served from the provider prompt cache',
+    ['endpoint']
+)
+
+LLM_COMPLETION_TOKENS_TOTAL = Counter(
+    'medical_chatbot_llm_completion_tokens_total',
+    'Total completion tokens generated by the LLM',
+    ['endpoint']
+)
+
+LLM_CALL_LATENCY = Histogram(
+    'medical_chatbot_llm_call_latency_seconds',
+    'Azure OpenAI call latency (excluding the limiter queue), until the last chunk for streamed calls',
+    ['endpoint', 'model'],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+
+LLM_CALLS = Counter(
+    'medical_chatbot_llm_calls_total',
+    'Azure OpenAI calls by endpoint, model and status (success, error, cancelled)',
+    ['endpoint', 'model', 'status']
+)
+
+LLM_RETRIES = Counter(
+    'medical_chatbot_llm_retries_total',
+    'LLM call attempts retried by reason (timeout, connection, rate_limit, server_error)',
+    ['endpoint', 'reason']
+)
+
+LLM_HEDGES = Counter(
+    'medical_chatbot_llm_hedges_total',
+    'Hedged duplicate LLM requests by outcome (hedge_won, primary_won, failed)',
+    ['endpoint', 'outcome']
+)
+
+LLM_DEADLINE_EXCEEDED = Counter(
+    'medical_chatbot_llm_deadline_exceeded_total',
+    'LLM calls abandoned because the request deadline ran out',
+    ['endpoint']
+)
+
+LLM_CIRCUIT_STATE = Gauge(
+    'medical_chatbot_llm_circuit_state',
+    'LLM circuit breaker state per model (0 closed, 1 half-open, 2 open)',
+    ['model'],
+    multiprocess_mode='max'
+)
+
+LLM_CIRCUIT_REJECTIONS = Counter(
+    'medical_chatbot_llm_circuit_rejections_total',
+    'LLM calls failed fast by an open circuit breaker',
+    ['endpoint', 'model']
+)
+
+LLM_ROUTED_CALLS = Counter(
+    'medical_chatbot_llm_routed_calls_total',
+    'LLM calls by endpoint, turn type and the model the router chose for them',
+    ['endpoint', 'turn_type', 'model']
+)
+
+LLM_ESCALATIONS = Counter(
+    'medical_chatbot_llm_escalations_total',
+    'Routed LLM calls repeated on the escalation model, by the rejected model and reason',
+    ['endpoint', 'turn_type', 'model', 'reason']
+)
+
+# Backend (server-side) HTTP metrics, recorded by PrometheusMiddleware
+HTTP_REQUESTS = Counter(
+    'medical_chatbot_http_requests_total',
+    'HTTP requests handled by the backend',
+    ['method', 'route', 'status']
+)
+
+HTTP_REQUEST_LATENCY = Histogram(
+    'medical_chatbot_http_request_latency_seconds',
+    'Backend request latency per route, until the last body chunk for streamed responses',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+HTTP_IN_FLIGHT = Gauge(
+    'medical_chatbot_http_requests_in_flight',
+    'Backend requests currently being handled',
+    ['method', 'route'],
+    multiprocess_mode='livesum'
+)
+
+# (finished_at, seconds) of recent LLM calls of this process, for the health sampler's p95
+RECENT_LLM_LATENCIES = deque(maxlen=1024)
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition of this process, or of all workers in multiprocess mode"""
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+def mark_worker_exit() -> None:
+    """Drop the live gauges of this worker from the multiprocess aggregation"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
+
+@contextmanager
+def track_llm_call(endpoint: str, model: str):
+    """Time an LLM call (the block) and count it by endpoint, model and outcome"""
+    start_time = time.perf_counter()
+    status = 'success'
+    try:
+        yield
+    except Exception:
+        status = 'error'
+        raise
+    except BaseException:
+        # Cancelled request or a stream closed by a disconnected client
+        status = 'cancelled'
+        raise
+    finally:
+        elapsed = time.perf_counter() - start_time
+        LLM_CALL_LATENCY.labels(endpoint=endpoint, model=model).observe(elapsed)
+        RECENT_LLM_LATENCIES.append((time.monotonic(), elapsed))
+        LLM_CALLS.labels(endpoint=endpoint, model=model, status=status).inc()
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording per-route request counts, latency and in-flight requests.
+
+    Routes are labelled by their path template (e.g. /sessions/{session_id}), so
+    ids in the URL don't create new series; unmatched paths share one label.
+    """
+
+    def __init__(self, app, routes, excluded_paths=("/metrics",)):
+        self.app = app
+        # The application's live route list, so routes added after the middleware are matched too
+        self.routes = routes
+        self.excluded_paths = set(excluded_paths)
+
+    def _route_template(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", scope["path"])
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method=method, route=route)
+        in_flight.inc()
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_LATENCY.labels(method=method, route=route).observe(time.perf_counter() - start_time)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(status_code)).inc()
+
+def record_token_usage(endpoint: str, usage: Any) -> None:
+    """Record prompt, cached-prompt and completion token counts from an API usage field"""
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = (getattr(details, 'cached_tokens', None) or 0) if details is not None else 0
+
+    LLM_PROMPT_TOKENS.labels(endpoint=endpoint).observe(prompt_tokens)
+    LLM_PROMPT_TOKENS_TOTAL.labels(endpoint=endpoint).inc(prompt_tokens)
+    LLM_CACHED_PROMPT_TOKENS_TOTAL.labels(endpoint=endpoint).inc(cached_tokens)
+    LLM_COMPLETION_TOKENS_TOTAL.labels(endpoint=endpoint).inc(completion_tokens)
+    logger.info("llm_token_usage",
+               endpoint=endpoint,
+               prompt_tokens=prompt_tokens,
+               cached_prompt_tokens=cached_tokens,
+               completion_tokens=completion_tokens)
+
 def track_request(endpoint: str):
     """Decorator to track request metrics"""
     def decorator(func):
@@ -46,10 +334,29 @@ def track_request(endpoint: str):
         return wrapper
     return decorator
 
-def check_backend_health(api_base_url: str) -> Dict[str, Any]:
-    """Check the health of the backend service"""
+def track_stream(endpoint: str):
+    """Decorator to track request metrics of a generator, measured until it is exhausted"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start_time = time.time()
+            try:
+                yield from func(*args, **kwargs)
+                REQUEST_COUNT.labels(endpoint=endpoint, status='success').inc()
+            except Exception as e:
+                REQUEST_COUNT.labels(endpoint=endpoint, status='error').inc()
+                ERROR_COUNT.labels(endpoint=endpoint, error_type=type(e).__name__).inc()
+                raise
+            finally:
+                REQUEST_LATENCY.labels(endpoint=endpoint).observe(time.time() - start_time)
+        return wrapper
+    return decorator
+
+def check_backend_health(api_base_url: str, session: Optional[requests.Session] = None,
+                         timeout: float = 5.0) -> Dict[str, Any]:
+    """Check the health of the backend service, reusing the caller's session if given"""
     try:
-        response = requests.get(f"{api_base_url}/health")
+        response = (session or requests).get(f"{api_base_url}/health", timeout=timeout)
         return {
             "status": "healthy" if response.status_code == 200 else "unhealthy",
             "backend_status": response.status_code,
@@ -1,54 +1,195 @@
+import asyncio
 import json
 import os
 import re
-from typing import Dict, Any, Optional
-from bs4 import BeautifulSoup
-from openai import AzureOpenAI
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+
+from core.answer_cache import SemanticAnswerCache, normalize_question
+from core.benefit_facts import BenefitFacts, FactAnswerer
+from core.constants import HMO_MAPPING, TIER_MAPPING
+from core.http_clients import create_azure_clients
+from core.llm_limiter import LLMConcurrencyLimiter, LLMOverloadedError, llm_limiter
+from core.logging_config import get_logger
+from core.model_router import ModelRouter, model_router
+from core.monitoring import QA_FAST_PATH, QA_LLM_CALLS, record_token_usage
+from core.resilience import LLMUnavailableError, ResilientLLMCaller, llm_caller, request_deadline
+from core.retrieval import ServiceRetriever
+from core.services_catalog import ServicesCatalogLoader, ServicesCatalogWatcher
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("qa_service")
 
-# Azure OpenAI Configuration
-AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_KEY")
-AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_API_VERSION")
 
 # Model names
 GPT_MODEL_NAME = "gpt-4o"
 GPT_MINI_MODEL_NAME = "gpt-4o-mini"
 EMBEDDING_MODEL_NAME = "text-embedding-ada-002"
 
-# Hebrew-English mappings
-HMO_MAPPING = {
-    'Maccabi': 'מכבי',
-    'Clalit': 'כללית',
-    'Meuhedet': 'מאוחדת',
-    'מכבי': 'מכבי',
-    'כללית': 'כללית',
-    'מאוחדת': 'מאוחדת'
-}
-
-TIER_MAPPING = {
-    'Gold': 'זהב',
-    'Silver': 'כסף',
-    'Bronze': 'ארד',
-    'זהב': 'זהב',
-    'כסף': 'כסף',
-    'ארד': 'ארד'
-}
+# Retrieval configuration
+# Number of service rows sent to the model per question (0 sends the whole HMO/tier slice)
+QA_TOP_K = int(os.environ.get("QA_TOP_K", "8"))
+# Optional local sentence-transformers model for the embedding index (empty disables it)
+QA_EMBEDDING_MODEL = os.environ.get("QA_EMBEDDING_MODEL", "")
+
+# Catalog snapshot configuration
+# Pre-parsed services_db snapshot location (defaults to phase2_data/.cache)
+QA_SNAPSHOT_PATH = os.environ.get("QA_SNAPSHOT_PATH") or None
+QA_USE_SNAPSHOT = os.environ.get("QA_USE_SNAPSHOT", "true").lower() == "true"
+# Seconds between checks of phase2_data for changed tables (0 disables hot reload)
+QA_CATALOG_POLL_SECONDS = float(os.environ.get("QA_CATALOG_POLL_SECONDS", "5"))
+
+# Answer cache configuration
+QA_CACHE_ENABLED = os.environ.get("QA_CACHE_ENABLED", "true").lower() == "true"
+QA_CACHE_MAX_ENTRIES = int(os.environ.get("QA_CACHE_MAX_ENTRIES", "2048"))
+QA_CACHE_TTL_SECONDS = float(os.environ.get("QA_CACHE_TTL_SECONDS", "3600"))
+# Minimum similarity for a near-duplicate question to reuse a cached answer
+QA_CACHE_SIMILARITY_THRESHOLD = float(os.environ.get("QA_CACHE_SIMILARITY_THRESHOLD", "0.9"))
+# Optional local sentence-transformers model for near-duplicate matching (default: character n-grams)
+QA_CACHE_EMBEDDING_MODEL = os.environ.get("QA_CACHE_EMBEDDING_MODEL", "")
+
+# Share one in-flight completion between identical concurrent questions (same HMO, tier, gender and question)
+QA_COALESCE_ENABLED = os.environ.get("QA_COALESCE_ENABLED", "true").lower() == "true"
+
+# Maximum questions of one /get-answers batch answered at the same time, so a large batch
+# queues behind its own items instead of filling the shared LLM queue
+QA_BATCH_MAX_CONCURRENCY = int(os.environ.get("QA_BATCH_MAX_CONCURRENCY", "8"))
+
+# Fact fast path configuration
+# Answer simple factual questions (discount, frequency, wait time...) from parsed facts without the LLM
+QA_FAST_PATH_ENABLED = os.environ.get("QA_FAST_PATH_ENABLED", "true").lower() == "true"
+# Required ratio between the best and second-best retrieval scores to trust the matched service
+QA_FAST_PATH_MIN_MARGIN = float(os.environ.get("QA_FAST_PATH_MIN_MARGIN", "1.5"))
+
+@dataclass
+class _AnswerRequest:
+    """State of one question between preparing the prompt and storing the answer."""
+    user_info: Dict[str, Any]
+    catalog: "CatalogVersion"
+    cache_scope: Dict[str, str]
+    messages: List[Dict[str, str]]
+    result: Optional[Dict[str, Any]] = None
+
+
+@dataclass(frozen=True)
+class CatalogVersion:
+    """
+    An immutable version of the services catalog and the indexes built over it.
+
+    Reloads build a new instance and swap it in by reference, so a request always
+    works against one consistent version. The dicts are never mutated after construction.
+    """
+    version: str
+    services_db: Dict[str, Dict[str, Dict[str, str]]]
+    service_categories: Dict[str, str]
+    retriever: ServiceRetriever
+    fragments: Dict[str, Dict[str, Any]]
+    # Byte-identical system prompt per (hmo, tier), so the provider can cache the prompt prefix
+    prompt_prefixes: Dict[tuple, str]
+    # Pre-serialized benefit rows per (hmo, tier), assembled into the per-question part of the prompt
+    benefit_rows: Dict[tuple, Dict[str, str]]
+    # Parsed benefit facts, same layout as services_db
+    facts_db: Dict[str, Dict[str, Dict[str, BenefitFacts]]]
+    # Sorted age limits mentioned in the benefits per (hmo, tier), for the age band of cached answers
+    age_limits: Dict[tuple, tuple]
+
+
+# English names of the Hebrew HMO and tier keys, for the prompt header
+HMO_ENGLISH_NAMES = {hebrew: english for english, hebrew in HMO_MAPPING.items() if english != hebrew}
+TIER_ENGLISH_NAMES = {hebrew: english for english, hebrew in TIER_MAPPING.items() if english != hebrew}
+
+# Static instructions at the start of every Q&A prompt
+QA_SYSTEM_PROMPT = """You are a helpful medical services chatbot that provides accurate information about medical benefits based on the user's HMO and membership tier. You provide just question and answer responses.
+
+Please provide a clear and accurate answer based on the user's specific benefits. If the information is not available in the provided data, please say so. Format your response in a natural, conversational way while maintaining accuracy."""
+
+# Age limits written in the benefit texts ("חינם עד גיל 18", "free until age 18")
+AGE_LIMIT_PATTERN = re.compile(r'גיל\s*(\d{1,3})|\bage\s*(\d{1,3})', re.IGNORECASE)
+
+# Placeholders for user names in cached answers, so one answer can be reused across users
+NAME_PLACEHOLDERS = {"first_name": "\u27e8first_name\u27e9", "last_name": "\u27e8last_name\u27e9"}
+
 
 class QAService:
-    def __init__(self):
-        # Initialize the database
-        self.services_db = {}
-        self._initialize_database()
-        self.client = AzureOpenAI(
-            api_key=AZURE_OPENAI_API_KEY,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+    def __init__(self, top_k: Optional[int] = None, embedding_model: Optional[str] = None,
+                 services_dir: Optional[str] = None, watch_catalog: Optional[bool] = None,
+                 enable_cache: Optional[bool] = None, enable_fast_path: Optional[bool] = None,
+                 coalesce_requests: Optional[bool] = None, limiter: Optional[LLMConcurrencyLimiter] = None,
+                 catalog: Optional[CatalogVersion] = None, router: Optional[ModelRouter] = None):
+        # `catalog` is a version built by load_catalog() with the same top_k and embedding model,
+        # e.g. in the launcher process before the workers fork
+        self.top_k = QA_TOP_K if top_k is None else top_k
+        self.embedding_model = QA_EMBEDDING_MODEL if embedding_model is None else embedding_model
+        self._loader = ServicesCatalogLoader(
+            services_dir=services_dir,
+            snapshot_path=QA_SNAPSHOT_PATH,
+            use_snapshot=QA_USE_SNAPSHOT,
         )
+        self._reload_lock = threading.Lock()
+        self._catalog_listeners: List[Callable[[CatalogVersion], None]] = []
+
+        # Initialize the database
+        if catalog is not None:
+            self._catalog = catalog
+        else:
+            self._initialize_database()
+
+        # Cache answers to repeated questions; entries of replaced catalog versions are dropped
+        self.answer_cache: Optional[SemanticAnswerCache] = None
+        if QA_CACHE_ENABLED if enable_cache is None else enable_cache:
+            self.answer_cache = SemanticAnswerCache(
+                max_entries=QA_CACHE_MAX_ENTRIES,
+                ttl_seconds=QA_CACHE_TTL_SECONDS,
+                similarity_threshold=QA_CACHE_SIMILARITY_THRESHOLD,
+                embedding_model=QA_CACHE_EMBEDDING_MODEL or None,
+            )
+            self.add_catalog_listener(lambda catalog: self.answer_cache.invalidate(keep_version=catalog.version))
+
+        # Bounds concurrent LLM calls together with the other services of the process
+        self.limiter = limiter or llm_limiter
+        # Deadlines, retries, hedging and the circuit breaker around every completion call
+        self.caller = llm_caller if self.limiter is llm_limiter else ResilientLLMCaller(self.limiter)
+        # Picks the model of the answer calls and escalates rejected output
+        self.router = router or model_router
+        # Sync and async (for the FastAPI backend) clients on the process-wide connection pools
+        self.client, self.async_client = create_azure_clients()
+
+        # In-flight async completions by question key; identical requests await the same future
+        self.coalesce_requests = QA_COALESCE_ENABLED if coalesce_requests is None else coalesce_requests
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        # Answer high-confidence factual questions from the parsed facts
+        self.fact_answerer: Optional[FactAnswerer] = None
+        if QA_FAST_PATH_ENABLED if enable_fast_path is None else enable_fast_path:
+            self.fact_answerer = FactAnswerer(min_margin=QA_FAST_PATH_MIN_MARGIN)
+
+        # Watch phase2_data for changed tables
+        self._watcher: Optional[ServicesCatalogWatcher] = None
+        if QA_CATALOG_POLL_SECONDS > 0 if watch_catalog is None else watch_catalog:
+            self.start_catalog_watcher()
+
+    @property
+    def catalog(self) -> CatalogVersion:
+        """The current catalog version."""
+        return self._catalog
+
+    @property
+    def services_db(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        return self._catalog.services_db
+
+    @property
+    def service_categories(self) -> Dict[str, str]:
+        return self._catalog.service_categories
+
+    @property
+    def retriever(self) -> ServiceRetriever:
+        return self._catalog.retriever
     
     def _map_to_hebrew(self, hmo: str, tier: str) -> tuple[str, str]:
         """Map English HMO and tier names to Hebrew."""
@@ -57,135 +198,511 @@ class QAService:
         return hebrew_hmo, hebrew_tier
     
     def _initialize_database(self):
-        """Initialize the database by reading all HTML files and converting tables to dict structure"""
-        services_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../phase2_data")
-        if not os.path.exists(services_dir):
-            raise FileNotFoundError(f"Services directory not found at: {services_dir}")
-            
-        for filename in os.listdir(services_dir):
-            if filename.endswith("_services.html"):
-                service_name = filename.replace("_services.html", "")
-                file_path = os.path.join(services_dir, filename)
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
-                soup = BeautifulSoup(html_content, 'html.parser')
-                table = soup.find('table')
-                if table:
-                    self._parse_table(table, service_name)
-    
-    def _extract_tiers_from_html(self, cell) -> Dict[str, str]:
-        """Extract tier information from a cell using regex."""
-        # Get all the text content
-        text_content = cell.get_text()
-        
-        # Split by newlines to get each tier line
-        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-        
-        # Extract tier and description using regex
-        tiers_dict = {}
-        for line in lines:
-            # Match pattern: <tier name>: <description>
-            match = re.match(r'(\w+):\s*(.*)', line)
-            if match:
-                tier_name = match.group(1)
-                description = match.group(2)
-                tiers_dict[tier_name] = description
-        
-        return tiers_dict
-    
-    def _parse_table(self, table, service_name: str):
-        """Parse HTML table into a nested dictionary structure organized by HMO and tier"""
-        # Get headers (HMOs)
-        headers = [th.text.strip() for th in table.find_all('th')[1:]]
-        
-        # Process each row
-        for row in table.find_all('tr')[1:]:  # Skip header row
-            cells = row.find_all('td')
-            if not cells:
-                continue
-                
-            service = cells[0].text.strip()
-            
-            # Process each HMO column
-            for i, cell in enumerate(cells[1:]):
-                hmo = headers[i]
-                
-                # Initialize HMO if not exists
-                if hmo not in self.services_db:
-                    self.services_db[hmo] = {}
-                
-                # Extract tiers and their descriptions
-                tiers_dict = self._extract_tiers_from_html(cell)
-                
-                # Store benefits for each tier
-                for tier, benefits in tiers_dict.items():
-                    # Initialize tier if not exists
-                    if tier not in self.services_db[hmo]:
-                        self.services_db[hmo][tier] = {}
-                    
-                    # Store benefits under the service
-                    if benefits and benefits != '':  # Only store if there are actual benefits
-                        self.services_db[hmo][tier][service] = benefits
-                    else:
-                        self.services_db[hmo][tier][service] = "לא זמין"  # Mark as unavailable in Hebrew
+        """Initialize the database from the services snapshot, parsing only changed HTML files"""
+        key, fragments = self._loader.load_fragments()
+        self._catalog = self._build_catalog_version(key, fragments)
+
+    @classmethod
+    def load_catalog(cls, services_dir: Optional[str] = None, top_k: Optional[int] = None,
+                     embedding_model: Optional[str] = None) -> CatalogVersion:
+        """Load a catalog version without creating a service (no LLM clients or watcher threads)"""
+        loader = ServicesCatalogLoader(
+            services_dir=services_dir,
+            snapshot_path=QA_SNAPSHOT_PATH,
+            use_snapshot=QA_USE_SNAPSHOT,
+        )
+        key, fragments = loader.load_fragments()
+        return cls.build_catalog_version(
+            key, fragments,
+            QA_TOP_K if top_k is None else top_k,
+            QA_EMBEDDING_MODEL if embedding_model is None else embedding_model,
+        )
+
+    def _build_catalog_version(self, key: str, fragments: Dict[str, Dict[str, Any]]) -> CatalogVersion:
+        return self.build_catalog_version(key, fragments, self.top_k, self.embedding_model)
+
+    @classmethod
+    def build_catalog_version(cls, key: str, fragments: Dict[str, Dict[str, Any]], top_k: int,
+                              embedding_model: str) -> CatalogVersion:
+        """Merge the parsed fragments and build the retrieval index for a new catalog version"""
+        services_db, service_categories = ServicesCatalogLoader.merge_fragments(fragments)
+        retriever = ServiceRetriever(
+            services_db,
+            service_categories,
+            hmo_aliases=HMO_MAPPING,
+            tier_aliases=TIER_MAPPING,
+            embedding_model=embedding_model,
+        )
+
+        # Serialize every row and prompt prefix once per version instead of on every question
+        benefit_rows = {}
+        prompt_prefixes = {}
+        age_limits = {}
+        for hmo, tiers in services_db.items():
+            for tier, services in tiers.items():
+                age_limits[(hmo, tier)] = tuple(sorted({
+                    int(next(age for age in match if age))
+                    for benefits in services.values() for match in AGE_LIMIT_PATTERN.findall(benefits)
+                }))
+                benefit_rows[(hmo, tier)] = {
+                    service: f"{json.dumps(service, ensure_ascii=False)}: {json.dumps(benefits, ensure_ascii=False)}"
+                    for service, benefits in services.items()
+                }
+                prompt_prefixes[(hmo, tier)] = cls._create_prompt_prefix(hmo, tier, benefit_rows[(hmo, tier)], top_k)
+
+        return CatalogVersion(
+            version=key[:12],
+            services_db=services_db,
+            service_categories=service_categories,
+            retriever=retriever,
+            fragments=fragments,
+            prompt_prefixes=prompt_prefixes,
+            benefit_rows=benefit_rows,
+            facts_db=ServicesCatalogLoader.merge_facts(fragments),
+            age_limits=age_limits,
+        )
+
+    def reload_catalog(self) -> bool:
+        """Reparse changed services files and atomically swap in a new catalog version"""
+        # The lock only serializes reloads; readers never take it
+        with self._reload_lock:
+            previous = self._catalog
+            refreshed = self._loader.refresh_fragments(previous.fragments)
+            if refreshed is None:
+                return False
+            catalog = self._build_catalog_version(*refreshed)
+            # Attribute assignment is atomic: in-flight requests finish on the version they took
+            self._catalog = catalog
+
+        logger.info("catalog_reloaded", previous_version=previous.version, version=catalog.version)
+        for listener in list(self._catalog_listeners):
+            listener(catalog)
+        return True
+
+    def add_catalog_listener(self, listener: Callable[[CatalogVersion], None]):
+        """Register a callback invoked with the new version after every catalog swap"""
+        self._catalog_listeners.append(listener)
+
+    def start_catalog_watcher(self):
+        """Start polling phase2_data and hot-reload the catalog when a table changes"""
+        if self._watcher is None:
+            self._watcher = ServicesCatalogWatcher(
+                self._loader.services_dir,
+                self.reload_catalog,
+                interval=QA_CATALOG_POLL_SECONDS or 5.0,
+            )
+            self._watcher.start()
+
+    def stop_catalog_watcher(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
     
-    def _create_prompt(self, user_info: Dict[str, Any], question: str, relevant_data: Dict[str, Any]) -> str:
-        """Create a prompt for GPT-4 with user info and relevant data"""
-        prompt = f"""You are a helpful medical services assistant providing just question and answer responses. You have access to the following information about the user and their benefits:
+    @classmethod
+    def _create_prompt_prefix(cls, hmo: str, tier: str, benefit_rows: Dict[str, str], top_k: int) -> str:
+        """
+        Create the static system prompt of an HMO/tier slice.
+
+        It only depends on the catalog version, so it is identical for every user of the
+        slice. With retrieval disabled (top_k <= 0) it carries the whole tier catalog.
+        """
+        prefix = f"""{QA_SYSTEM_PROMPT}
+
+Membership plan:
+- HMO: {hmo} ({HMO_ENGLISH_NAMES.get(hmo, hmo)})
+- Membership Tier: {tier} ({TIER_ENGLISH_NAMES.get(tier, tier)})
+- Services covered by the plan: {", ".join(benefit_rows)}"""
+        if top_k <= 0:
+            prefix += f"""
+
+Benefits Information:
+{cls._format_benefits(benefit_rows.values())}"""
+        return prefix
+
+    @staticmethod
+    def _format_benefits(rows) -> str:
+        """Join pre-serialized benefit rows into a JSON object"""
+        return "{\n  " + ",\n  ".join(rows) + "\n}"
+
+    def _create_prompt(self, user_info: Dict[str, Any], question: str, relevant_data: Dict[str, Any],
+                       benefit_rows: Optional[Dict[str, str]] = None) -> str:
+        """Create the per-question part of the prompt: relevant benefits, user info and question"""
+        prompt = ""
+        # With retrieval disabled the benefits are already part of the static prefix
+        if self.top_k > 0:
+            benefit_rows = benefit_rows or {}
+            rows = [
+                benefit_rows.get(service) or f"{json.dumps(service, ensure_ascii=False)}: {json.dumps(benefits, ensure_ascii=False)}"
+                for service, benefits in relevant_data.items()
+            ]
+            prompt += f"""Relevant Benefits Information:
+{self._format_benefits(rows)}
 
-User Information:
+"""
+        prompt += f"""User Information:
 - Name: {user_info['first_name']} {user_info['last_name']}
 - Age: {user_info['age']}
 - Gender: {user_info['gender']}
 - HMO: {user_info['hmo_name']}
 - Membership Tier: {user_info['membership_tier']}
 
-Relevant Benefits Information:
-{json.dumps(relevant_data, indent=2, ensure_ascii=False)}
-
 User Question: {question}
 
-Please provide a clear and accurate answer based on the user's specific benefits. If the information is not available in the provided data, please say so. Format your response in a natural, conversational way while maintaining accuracy.
-
 Answer:"""
         return prompt
     
-    def _find_relevant_data(self, user_info: Dict[str, Any], question: str) -> Dict[str, Any]:
-        """Find relevant data from the database based on the user's HMO and tier"""
+    def _find_relevant_data(self, user_info: Dict[str, Any], question: str,
+                            catalog: Optional[CatalogVersion] = None,
+                            ranked: Optional[List[tuple]] = None) -> Dict[str, Any]:
+        """Find the services of the user's HMO and tier that are relevant to the question"""
+        catalog = catalog or self._catalog
         # Map English names to Hebrew if needed
         hmo, tier = self._map_to_hebrew(user_info['hmo_name'], user_info['membership_tier'])
         
-        # Get all services for the user's HMO and tier
-        if hmo in self.services_db and tier in self.services_db[hmo]:
-            return self.services_db[hmo][tier]
-        return {}
+        if hmo not in catalog.services_db or tier not in catalog.services_db[hmo]:
+            return {}
+
+        # Send only the top-k rows for the question, or the whole slice when retrieval is disabled
+        if self.top_k <= 0:
+            return catalog.services_db[hmo][tier]
+        return catalog.retriever.retrieve(hmo, tier, question, self.top_k, ranked=ranked)
+
+    @staticmethod
+    def _age_band(age: Any, age_limits: tuple) -> str:
+        """
+        The band of the user's age between the slice's age limits ("<=14", ">18"), or ""
+        when the slice has none. Answers only depend on the age through these limits.
+        """
+        if not age_limits:
+            return ""
+        try:
+            age = int(str(age).strip())
+        except ValueError:
+            return "unknown"
+        for limit in age_limits:
+            if age <= limit:
+                return f"<={limit}"
+        return f">{age_limits[-1]}"
+
+    @staticmethod
+    def _depersonalize(answer: str, user_info: Dict[str, Any]) -> str:
+        """Replace the user's names in an answer with placeholders before caching it"""
+        for field, placeholder in NAME_PLACEHOLDERS.items():
+            name = str(user_info.get(field) or "").strip()
+            if len(name) > 1:
+                answer = re.sub(rf"\b{re.escape(name)}\b", placeholder, answer)
+        return answer
+
+    @staticmethod
+    def _personalize(answer: str, user_info: Dict[str, Any]) -> str:
+        """Fill the name placeholders of a cached answer with the current user's names"""
+        for field, placeholder in NAME_PLACEHOLDERS.items():
+            answer = answer.replace(placeholder, str(user_info.get(field) or "").strip())
+        return answer
     
     def get_answer(self, user_info: Dict[str, Any], question: str) -> str:
         """Get an answer to the user's question using GPT-4"""
-        # Find relevant data from the database
-        relevant_data = self._find_relevant_data(user_info, question)
-        
-        if not relevant_data:
-            return "I apologize, but I couldn't find specific information about your question in the available data. Please try rephrasing your question or contact your HMO directly for more information."
-        
-        # Create the prompt
-        prompt = self._create_prompt(user_info, question, relevant_data)
-        
+        return self.answer_question(user_info, question)["answer"]
+
+    async def aget_answer(self, user_info: Dict[str, Any], question: str) -> str:
+        """Async version of get_answer"""
+        return (await self.aanswer_question(user_info, question))["answer"]
+
+    def answer_question(self, user_info: Dict[str, Any], question: str) -> Dict[str, Any]:
+        """
+        Answer the user's question and record the catalog version the answer was based on.
+
+        Used by scripts such as the evaluation, so every failure, including an
+        overloaded or unavailable LLM, comes back as an apology answer that is not
+        cached. The async methods raise LLMOverloadedError (and LLMUnavailableError)
+        instead, for the backend to turn into 429/5xx responses.
+        """
+        request = self._prepare_answer(user_info, question)
+        if request.result is not None:
+            return request.result
+
+        QA_LLM_CALLS.labels(result="issued").inc()
         try:
             # Call Azure OpenAI API
-            response = self.client.chat.completions.create(
-                model=GPT_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a helpful medical services chatbot that provides accurate information about medical benefits based on the user's HMO and membership tier."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0,
-                max_tokens=500
-            )
-            
-            return response.choices[0].message.content.strip()
-            
+            response = self.router.call(self.caller, "get_answer", "answer", lambda model, timeout: self.client.chat.completions.create(
+                **self._completion_kwargs(request.messages, model), timeout=timeout
+            ), self._answer_check)
+            record_token_usage("get_answer", response.usage)
+            return self._finish_answer(request, response.choices[0].message.content.strip())
+        except Exception as e:
+            return self._finish_answer(request, f"I apologize, but I encountered an error while processing your request: {str(e)}", cacheable=False)
+
+    async def aanswer_question(self, user_info: Dict[str, Any], question: str,
+                               catalog: Optional[CatalogVersion] = None) -> Dict[str, Any]:
+        """Async version of answer_question, built on the async Azure OpenAI client"""
+        request = await self._aprepare_answer(user_info, question, catalog)
+        if request.result is not None:
+            return request.result
+
+        coalesced = await self._join_flight(request)
+        if coalesced is not None:
+            return coalesced
+
+        flight = self._start_flight(request)
+        result = None
+        try:
+            response = await self.router.acall(self.caller, "get_answer", "answer", lambda model, timeout: self.async_client.chat.completions.create(
+                **self._completion_kwargs(request.messages, model), timeout=timeout
+            ), self._answer_check)
+            record_token_usage("get_answer", response.usage)
+            result = await self._afinish_answer(request, response.choices[0].message.content.strip())
+        except LLMOverloadedError:
+            raise
         except Exception as e:
-            return f"I apologize, but I encountered an error while processing your request: {str(e)}" 
\ No newline at end of file
+            result = self._finish_answer(request, f"I apologize, but I encountered an error while processing your request: {str(e)}", cacheable=False)
+        finally:
+            self._end_flight(request, flight, result)
+        return result
+
+    async def aanswer_questions(self, user_info: Dict[str, Any], questions: List[str],
+                                max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Answer several questions of one user concurrently, in input order.
+
+        All questions are answered against the same catalog version. Each item carries
+        its `index`, `question` and `elapsed_ms`, plus either the fields of
+        answer_question or an `error` with the HTTP `status_code` it maps to.
+        Each item gets its own LLM deadline once it is admitted, so time spent
+        waiting behind the other items doesn't use it up.
+        """
+        # Take a single reference so the whole batch sees one catalog version
+        catalog = self._catalog
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or QA_BATCH_MAX_CONCURRENCY))
+
+        async def answer(index: int, question: str) -> Dict[str, Any]:
+            async with semaphore:
+                start = time.perf_counter()
+                item = {"index": index, "question": question}
+                try:
+                    with request_deadline():
+                        item.update(await self.aanswer_question(user_info, question, catalog))
+                except (LLMUnavailableError, LLMOverloadedError) as e:
+                    item.update(error=str(e), status_code=e.status_code, retry_after=e.retry_after)
+                except Exception as e:
+                    logger.error("batch_answer_error", index=index, error=str(e))
+                    item.update(error=str(e), status_code=500)
+                item["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                return item
+
+        return list(await asyncio.gather(*(answer(i, q) for i, q in enumerate(questions))))
+
+    async def astream_answer(self, user_info: Dict[str, Any], question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the answer as it is generated.
+
+        Yields {"type": "token", "content": ...} events followed by a final
+        {"type": "done", ...} event carrying the same fields as answer_question.
+        """
+        request = await self._aprepare_answer(user_info, question)
+        if request.result is not None:
+            yield {"type": "token", "content": request.result["answer"]}
+            yield {"type": "done", **request.result}
+            return
+
+        # An identical question is already being answered: send its answer in one piece
+        coalesced = await self._join_flight(request)
+        if coalesced is not None:
+            yield {"type": "token", "content": coalesced["answer"]}
+            yield {"type": "done", **coalesced}
+            return
+
+        flight = self._start_flight(request)
+        parts = []
+        result = None
+        try:
+            try:
+                # Routed, but not escalated: the tokens are already on screen
+                model = self.router.route("get_answer", "answer")
+                # The slot is held until the stream is fully consumed
+                async with self.caller.astream("get_answer", model, lambda timeout: self.async_client.chat.completions.create(
+                    **self._completion_kwargs(request.messages, model), stream=True,
+                    stream_options={"include_usage": True}, timeout=timeout
+                )) as stream:
+                    async for chunk in stream:
+                        if getattr(chunk, "usage", None):
+                            record_token_usage("get_answer", chunk.usage)
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            parts.append(delta)
+                            yield {"type": "token", "content": delta}
+                result = await self._afinish_answer(request, "".join(parts).strip())
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                error_message = f"I apologize, but I encountered an error while processing your request: {str(e)}"
+                result = self._finish_answer(request, error_message, cacheable=False)
+                yield {"type": "token", "content": error_message}
+        finally:
+            # Also runs when the client disconnects mid-stream, so waiting requests are released
+            self._end_flight(request, flight, result)
+        yield {"type": "done", **result}
+
+    def _flight_key(self, request: _AnswerRequest) -> tuple:
+        scope = request.cache_scope
+        return (scope["hmo"], scope["tier"], scope["catalog_version"], scope["persona"],
+                normalize_question(scope["question"]))
+
+    async def _join_flight(self, request: _AnswerRequest) -> Optional[Dict[str, Any]]:
+        """Wait for an identical in-flight completion; None if there is none or it was abandoned"""
+        if not self.coalesce_requests:
+            return None
+        future = self._inflight.get(self._flight_key(request))
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            return None
+
+        try:
+            # Shielded so a cancelled waiter doesn't cancel the shared future
+            answer = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            # The leading request was cancelled before finishing; make our own call
+            return None
+
+        QA_LLM_CALLS.labels(result="coalesced").inc()
+        return {
+            "answer": self._personalize(answer, request.user_info),
+            "catalog_version": request.catalog.version,
+            "cache": "miss" if self.answer_cache is not None else "disabled",
+            "source": "coalesced",
+        }
+
+    def _start_flight(self, request: _AnswerRequest) -> Optional[asyncio.Future]:
+        """Register this request as the one making the completion call for its key"""
+        QA_LLM_CALLS.labels(result="issued").inc()
+        if not self.coalesce_requests:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[self._flight_key(request)] = future
+        return future
+
+    def _end_flight(self, request: _AnswerRequest, future: Optional[asyncio.Future],
+                    result: Optional[Dict[str, Any]]):
+        """Hand the answer to the waiting requests (or release them if there is none)"""
+        if future is None:
+            return
+        key = self._flight_key(request)
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if result is not None:
+            future.set_result(self._depersonalize(result["answer"], request.user_info))
+        else:
+            future.cancel()
+
+    def _prepare_answer(self, user_info: Dict[str, Any], question: str,
+                        catalog: Optional[CatalogVersion] = None) -> _AnswerRequest:
+        """Resolve the catalog slice, try the fact fast path and the cache; sets `result` when no LLM call is needed"""
+        # Take a single reference so the whole request sees one catalog version
+        catalog = catalog or self._catalog
+        hmo, tier = self._map_to_hebrew(user_info['hmo_name'], user_info['membership_tier'])
+        ranked = catalog.retriever.rank(hmo, tier, question)
+        cache_scope = {
+            "hmo": hmo,
+            "tier": tier,
+            "catalog_version": catalog.version,
+            "question": question,
+            # Hebrew answers are gendered and some benefits depend on the age, so answers are only
+            # shared between users of the same gender and age band
+            "persona": "|".join(filter(None, [
+                str(user_info.get('gender') or "").strip().lower(),
+                self._age_band(user_info.get('age'), catalog.age_limits.get((hmo, tier), ())),
+            ])),
+            "topic": ranked[0][0] if ranked else "",
+        }
+        request = _AnswerRequest(user_info=user_info, catalog=catalog, cache_scope=cache_scope, messages=[])
+
+        if self.fact_answerer is not None:
+            answer = self.fact_answerer.answer(
+                question, ranked, catalog.facts_db.get(hmo, {}).get(tier, {}), user_info, hmo, tier,
+                HMO_ENGLISH_NAMES.get(hmo, hmo), TIER_ENGLISH_NAMES.get(tier, tier),
+            )
+            QA_FAST_PATH.labels(result="fallback" if answer is None else "answered").inc()
+            if answer is not None:
+                request.result = {
+                    "answer": answer,
+                    "catalog_version": catalog.version,
+                    "cache": "bypass",
+                    "source": "facts",
+                }
+                return request
+
+        if self.answer_cache is not None:
+            hit = self.answer_cache.get(**cache_scope)
+            if hit is not None:
+                request.result = {
+                    "answer": self._personalize(hit.answer, user_info),
+                    "catalog_version": catalog.version,
+                    "cache": hit.kind,
+                    "source": "cache",
+                }
+                return request
+
+        # Find relevant data from the database
+        relevant_data = self._find_relevant_data(user_info, question, catalog, ranked)
+        if not relevant_data:
+            request.result = {
+                "answer": "I apologize, but I couldn't find specific information about your question in the available data. Please try rephrasing your question or contact your HMO directly for more information.",
+                "catalog_version": catalog.version,
+                "cache": "miss" if self.answer_cache is not None else "disabled",
+                "source": "none",
+            }
+            return request
+
+        # Create the prompt
+        # Static per-slice prefix first, per-user and per-question data last
+        request.messages = [
+            {"role": "system", "content": catalog.prompt_prefixes[(hmo, tier)]},
+            {"role": "user", "content": self._create_prompt(user_info, question, relevant_data, catalog.benefit_rows.get((hmo, tier)))}
+        ]
+        return request
+
+    def _embeds_with_model(self) -> bool:
+        """True when preparing or storing an answer runs an embedding model (cache or retrieval)"""
+        return (self.answer_cache is not None and self.answer_cache.uses_model_embeddings) \
+            or self._catalog.retriever.has_embeddings
+
+    async def _aprepare_answer(self, user_info: Dict[str, Any], question: str,
+                               catalog: Optional[CatalogVersion] = None) -> _AnswerRequest:
+        """_prepare_answer for the async paths; model embeddings run in the thread pool, off the event loop"""
+        if self._embeds_with_model():
+            return await run_in_threadpool(self._prepare_answer, user_info, question, catalog)
+        return self._prepare_answer(user_info, question, catalog)
+
+    async def _afinish_answer(self, request: _AnswerRequest, answer: str) -> Dict[str, Any]:
+        """_finish_answer for the async paths; model embeddings run in the thread pool, off the event loop"""
+        if self._embeds_with_model():
+            return await run_in_threadpool(self._finish_answer, request, answer)
+        return self._finish_answer(request, answer)
+
+    @staticmethod
+    def _completion_kwargs(messages: List[Dict[str, str]], model: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "model": model or GPT_MODEL_NAME,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": 500,
+        }
+
+    @staticmethod
+    def _answer_check(response: Any) -> Optional[str]:
+        """Output check of a routed answer: the reason to escalate it, or None"""
+        choice = response.choices[0]
+        if not (choice.message.content or "").strip():
+            return "empty"
+        return "truncated" if choice.finish_reason == "length" else None
+
+    def _finish_answer(self, request: _AnswerRequest, answer: str, cacheable: bool = True) -> Dict[str, Any]:
+        """Store a generated answer in the cache and build the result"""
+        if cacheable and self.answer_cache is not None:
+            self.answer_cache.put(answer=self._depersonalize(answer, request.user_info), **request.cache_scope)
+        return {
+            "answer": answer,
+            "catalog_version": request.catalog.version,
+            "cache": "miss" if self.answer_cache is not None else "disabled",
+            "source": "llm",
+        }
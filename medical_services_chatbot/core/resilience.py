@@ -0,0 +1,435 @@
+"""
+Resilience Module
+
+The call layer every Azure OpenAI request of the backend goes through. Around
+each attempt it takes a slot from the LLM concurrency limiter and records the
+call metrics, and on top of that it adds:
+
+1. Deadlines: each HTTP request gets an end-to-end budget
+   (LLM_REQUEST_DEADLINE_SECONDS) held in a context variable, so all LLM calls
+   of one request share it. Every attempt's timeout is what is left of it,
+   capped by LLM_ATTEMPT_TIMEOUT_SECONDS.
+2. Retries with full-jitter exponential backoff, only for retryable errors
+   (timeouts, connection errors, 429 and 5xx responses). A Retry-After sent by
+   the provider is honoured when it fits in the deadline.
+3. Hedging (optional, async non-streamed calls only): when the first attempt
+   has not answered after the endpoint's recent p95 latency, a duplicate
+   request is sent and the first response wins. Hedges are only sent while the
+   limiter has free slots and within LLM_HEDGE_MAX_RATIO of the calls.
+4. A circuit breaker per model: after LLM_BREAKER_FAILURE_THRESHOLD consecutive
+   retryable failures calls fail fast for LLM_BREAKER_RESET_SECONDS, then a
+   single probe call decides whether the circuit closes again.
+
+When the provider cannot answer, `LLMUnavailableError` is raised. It is an
+`LLMOverloadedError`, so it propagates out of the services the same way and
+becomes a 502/503/504 response with a Retry-After header. Other errors (e.g. a
+400 for a filtered prompt) are raised unchanged and are not retried.
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import openai
+
+from core.llm_limiter import LLMConcurrencyLimiter, LLMOverloadedError, llm_limiter
+from core.logging_config import get_logger
+from core.monitoring import (LLM_CIRCUIT_REJECTIONS, LLM_CIRCUIT_STATE, LLM_DEADLINE_EXCEEDED, LLM_HEDGES,
+                             LLM_RETRIES, track_llm_call)
+
+logger = get_logger("resilience")
+
+T = TypeVar("T")
+
+# End-to-end budget for the LLM calls of one request (0 = no deadline)
+LLM_REQUEST_DEADLINE_SECONDS = float(os.environ.get("LLM_REQUEST_DEADLINE_SECONDS", "30"))
+# Upper bound for a single attempt
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.environ.get("LLM_ATTEMPT_TIMEOUT_SECONDS", "20"))
+# Retries after the first attempt, for retryable errors only
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY_SECONDS = float(os.environ.get("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+LLM_RETRY_MAX_DELAY_SECONDS = float(os.environ.get("LLM_RETRY_MAX_DELAY_SECONDS", "8"))
+# Hedged duplicate requests cost tokens, so they are off unless enabled
+LLM_HEDGE_ENABLED = os.environ.get("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+# Successful calls of an endpoint needed before its p95 is trusted as the hedge delay
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+# At most this share of an endpoint's calls is hedged
+LLM_HEDGE_MAX_RATIO = float(os.environ.get("LLM_HEDGE_MAX_RATIO", "0.1"))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+_request_deadline: ContextVar[Optional[float]] = ContextVar("llm_request_deadline", default=None)
+
+
+class LLMUnavailableError(LLMOverloadedError):
+    """Raised when the provider cannot answer in time; maps to an HTTP 502/503/504 response."""
+
+    STATUS_CODES = {"provider_error": 502, "circuit_open": 503, "deadline_exceeded": 504}
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int, detail: str = ""):
+        super().__init__(endpoint, reason, retry_after)
+        self.status_code = self.STATUS_CODES.get(reason, 503)
+        message = f"LLM unavailable for {endpoint} ({reason})"
+        if detail:
+            message += f": {detail}"
+        self.args = (f"{message}, retry after {retry_after}s",)
+
+
+@contextmanager
+def request_deadline(seconds: float = LLM_REQUEST_DEADLINE_SECONDS):
+    """Give the LLM calls made inside the block a shared deadline (0 = none)."""
+    token = _request_deadline.set(time.monotonic() + seconds if seconds > 0 else math.inf)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+class RequestDeadlineMiddleware:
+    """ASGI middleware starting the LLM deadline of every HTTP request."""
+
+    def __init__(self, app, seconds: float = LLM_REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_deadline(self.seconds):
+            await self.app(scope, receive, send)
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """The retry reason of a retryable error, or None if it must not be retried."""
+    if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return "rate_limit"
+        if error.status_code >= 500 or error.status_code == 408:
+            return "server_error"
+    return None
+
+
+def _retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    for header, divisor in (("retry-after-ms", 1000), ("retry-after", 1)):
+        value = response.headers.get(header)
+        if value is not None:
+            try:
+                return float(value) / divisor
+            except ValueError:
+                continue
+    return None
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, model: str, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.model = model
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at = 0.0
+        LLM_CIRCUIT_STATE.labels(model=model).set(0)
+
+    def before_call(self) -> Optional[float]:
+        """None if a call may proceed, else the seconds until the circuit may close."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.CLOSED:
+                return None
+            if self._state == self.OPEN:
+                remaining = self._opened_at + self.reset_seconds - now
+                if remaining > 0:
+                    return remaining
+                self._set_state(self.HALF_OPEN)
+                self._probe_started_at = now
+                return None
+            # Half-open: one probe at a time; a probe that never reported back is replaced
+            if now - self._probe_started_at < self.reset_seconds:
+                return self.reset_seconds - (now - self._probe_started_at)
+            self._probe_started_at = now
+            return None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("llm_circuit_opened", model=self.model, consecutive_failures=self._failures)
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures}
+
+    def _set_state(self, state: str) -> None:
+        # Called with the lock held
+        if state == self.CLOSED and self._state != self.CLOSED:
+            logger.info("llm_circuit_closed", model=self.model)
+        self._state = state
+        LLM_CIRCUIT_STATE.labels(model=self.model).set(self._STATE_VALUES[state])
+
+
+class ResilientLLMCaller:
+    """Runs LLM calls with deadlines, retries, optional hedging and a circuit breaker per model."""
+
+    def __init__(self, limiter: Optional[LLMConcurrencyLimiter] = None, max_retries: int = LLM_MAX_RETRIES,
+                 hedge_enabled: bool = LLM_HEDGE_ENABLED):
+        self.limiter = limiter or llm_limiter
+        self.max_retries = max(0, max_retries)
+        self.hedge_enabled = hedge_enabled
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # Latencies of recent successful non-streamed attempts per endpoint, for the hedge delay
+        self._latencies: Dict[str, deque] = {}
+        self._calls: Dict[str, int] = {}
+        self._hedges: Dict[str, int] = {}
+
+    async def acall(self, endpoint: str, model: str, call: Callable[[float], Awaitable[T]]) -> T:
+        """
+        Run `call(timeout)` with the resilience policy and return its result.
+
+        `call` makes one attempt with the given timeout in seconds; it is invoked
+        again for retries and hedges, so it must not have side effects.
+        """
+        deadline = self._deadline()
+        self._count_call(endpoint)
+        attempt = 0
+        while True:
+            self._check_breaker(endpoint, model)
+            try:
+                return await self._hedged_attempt(endpoint, model, call, deadline)
+            except Exception as e:
+                delay = self._after_failure(endpoint, model, e, attempt, deadline)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def call(self, endpoint: str, model: str, call: Callable[[float], T]) -> T:
+        """Sync version of acall, without hedging."""
+        deadline = self._deadline()
+        self._count_call(endpoint)
+        attempt = 0
+        while True:
+            self._check_breaker(endpoint, model)
+            try:
+                with self.limiter.acquire_sync(endpoint), track_llm_call(endpoint, model):
+                    start = time.monotonic()
+                    result = call(self._attempt_timeout(endpoint, deadline))
+                self._record_success(endpoint, model, time.monotonic() - start)
+                return result
+            except Exception as e:
+                delay = self._after_failure(endpoint, model, e, attempt, deadline)
+            attempt += 1
+            time.sleep(delay)
+
+    @asynccontextmanager
+    async def astream(self, endpoint: str, model: str, open_stream: Callable[[float], Awaitable[Any]]):
+        """
+        Open a streamed completion with the resilience policy and yield it.
+
+        Only opening the stream is retried: once the block has received the
+        stream its chunks may already have reached the client. The limiter slot
+        and the call metrics cover the whole block.
+        """
+        deadline = self._deadline()
+        self._count_call(endpoint)
+        attempt = 0
+        while True:
+            self._check_breaker(endpoint, model)
+            opened = False
+            try:
+                async with self.limiter.acquire(endpoint):
+                    with track_llm_call(endpoint, model):
+                        stream = await open_stream(self._attempt_timeout(endpoint, deadline))
+                        opened = True
+                        self._breaker(model).record_success()
+                        yield stream
+                return
+            except Exception as e:
+                if opened:
+                    raise
+                delay = self._after_failure(endpoint, model, e, attempt, deadline)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers, endpoints = dict(self._breakers), list(self._latencies)
+            calls, hedges = dict(self._calls), dict(self._hedges)
+        hedge_delays = {endpoint: self._hedge_delay(endpoint) for endpoint in endpoints}
+        return {
+            "request_deadline_seconds": LLM_REQUEST_DEADLINE_SECONDS,
+            "attempt_timeout_seconds": LLM_ATTEMPT_TIMEOUT_SECONDS,
+            "max_retries": self.max_retries,
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_delay_seconds": {endpoint: delay for endpoint, delay in hedge_delays.items() if delay is not None},
+            "calls": calls,
+            "hedges": hedges,
+            "circuits": {model: breaker.stats() for model, breaker in breakers.items()},
+        }
+
+    async def _attempt(self, endpoint: str, model: str, call: Callable[[float], Awaitable[T]], deadline: float) -> T:
+        async with self.limiter.acquire(endpoint):
+            with track_llm_call(endpoint, model):
+                # The timeout is taken after the queue wait, so it is what is really left
+                timeout = self._attempt_timeout(endpoint, deadline)
+                start = time.monotonic()
+                result = await asyncio.wait_for(call(timeout), timeout)
+        self._record_success(endpoint, model, time.monotonic() - start)
+        return result
+
+    async def _hedged_attempt(self, endpoint: str, model: str, call: Callable[[float], Awaitable[T]],
+                              deadline: float) -> T:
+        hedge_delay = self._hedge_delay(endpoint) if self.hedge_enabled else None
+        if hedge_delay is None:
+            return await self._attempt(endpoint, model, call, deadline)
+
+        primary = asyncio.ensure_future(self._attempt(endpoint, model, call, deadline))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+            if done or not self._may_hedge(endpoint, deadline):
+                return await primary
+            hedge = asyncio.ensure_future(self._attempt(endpoint, model, call, deadline))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels(endpoint=endpoint,
+                                          outcome="hedge_won" if task is hedge else "primary_won").inc()
+                        return task.result()
+            LLM_HEDGES.labels(endpoint=endpoint, outcome="failed").inc()
+            raise primary.exception()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _may_hedge(self, endpoint: str, deadline: float) -> bool:
+        """Hedge only within the budget, with time left and without queueing behind other calls."""
+        if deadline - time.monotonic() < LLM_HEDGE_MIN_DELAY_SECONDS:
+            return False
+        limiter_stats = self.limiter.stats()
+        if limiter_stats["queued"] or limiter_stats["in_flight"] >= limiter_stats["max_concurrency"]:
+            return False
+        with self._lock:
+            if self._hedges.get(endpoint, 0) + 1 > LLM_HEDGE_MAX_RATIO * self._calls.get(endpoint, 0):
+                return False
+            self._hedges[endpoint] = self._hedges.get(endpoint, 0) + 1
+        return True
+
+    def _hedge_delay(self, endpoint: str) -> Optional[float]:
+        """The p95 of the endpoint's recent successful attempts, or None with too few samples."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(endpoint, ()))
+        if len(latencies) < max(1, LLM_HEDGE_MIN_SAMPLES):
+            return None
+        p95 = latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)]
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, p95)
+
+    def _after_failure(self, endpoint: str, model: str, error: Exception, attempt: int, deadline: float) -> float:
+        """The backoff before the next attempt; raises when the call must not be retried."""
+        if isinstance(error, LLMOverloadedError):
+            raise error
+        reason = classify_error(error)
+        if reason is None:
+            if isinstance(error, openai.APIStatusError):
+                # The provider answered, so it counts as reachable
+                self._breaker(model).record_success()
+            raise error
+        self._breaker(model).record_failure()
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            LLM_DEADLINE_EXCEEDED.labels(endpoint=endpoint).inc()
+            raise LLMUnavailableError(endpoint, "deadline_exceeded", 1, detail=str(error)) from error
+        if attempt >= self.max_retries:
+            retry_after = max(1, math.ceil(_retry_after_seconds(error) or 1))
+            logger.error("llm_call_failed", endpoint=endpoint, model=model, reason=reason, attempts=attempt + 1,
+                         error=str(error))
+            raise LLMUnavailableError(endpoint, "provider_error", retry_after, detail=str(error)) from error
+
+        # Full jitter spreads the retries of concurrent callers
+        delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY_SECONDS, LLM_RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+        delay = max(delay, _retry_after_seconds(error) or 0.0)
+        if delay >= remaining:
+            LLM_DEADLINE_EXCEEDED.labels(endpoint=endpoint).inc()
+            raise LLMUnavailableError(endpoint, "deadline_exceeded", max(1, math.ceil(delay)),
+                                      detail=str(error)) from error
+        LLM_RETRIES.labels(endpoint=endpoint, reason=reason).inc()
+        logger.warning("llm_call_retry", endpoint=endpoint, model=model, reason=reason, attempt=attempt + 1,
+                       delay_seconds=round(delay, 3), error=str(error))
+        return delay
+
+    def _check_breaker(self, endpoint: str, model: str) -> None:
+        wait = self._breaker(model).before_call()
+        if wait is not None:
+            LLM_CIRCUIT_REJECTIONS.labels(endpoint=endpoint, model=model).inc()
+            raise LLMUnavailableError(endpoint, "circuit_open", max(1, math.ceil(wait)))
+
+    def _record_success(self, endpoint: str, model: str, seconds: float) -> None:
+        self._breaker(model).record_success()
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=200)).append(seconds)
+
+    def _count_call(self, endpoint: str) -> None:
+        with self._lock:
+            self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(model)
+            if breaker is None:
+                breaker = self._breakers[model] = CircuitBreaker(model)
+            return breaker
+
+    @staticmethod
+    def _deadline() -> float:
+        deadline = _request_deadline.get()
+        if deadline is None:
+            # Called outside an HTTP request (scripts, evaluation): each call gets its own budget
+            return time.monotonic() + LLM_REQUEST_DEADLINE_SECONDS if LLM_REQUEST_DEADLINE_SECONDS > 0 else math.inf
+        return deadline
+
+    @staticmethod
+    def _attempt_timeout(endpoint: str, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            LLM_DEADLINE_EXCEEDED.labels(endpoint=endpoint).inc()
+            raise LLMUnavailableError(endpoint, "deadline_exceeded", 1)
+        return min(LLM_ATTEMPT_TIMEOUT_SECONDS, remaining)
+
+
+# Shared by every service in the process, so the breaker sees all calls to a model
+llm_caller = ResilientLLMCaller()
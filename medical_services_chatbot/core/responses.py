@@ -0,0 +1,141 @@
+"""
+Responses Module
+
+Response serialization and compression for the FastAPI backend.
+
+`FastJSONResponse` renders JSON with orjson when it is installed (falling back
+to the standard JSONResponse). FastAPI runs `jsonable_encoder` over a returned
+dict before rendering it, which costs several times more than the encoding
+itself, so the hot endpoints return the response object directly; their
+results only contain JSON-native types.
+
+`CompressionMiddleware` compresses complete (non-streamed) responses above a
+size threshold with the best encoding the client accepts: brotli when the
+`brotli` package is installed, otherwise gzip. Streamed responses such as the
+server-sent events endpoints pass through untouched, so tokens are not delayed
+by compressor buffering.
+"""
+
+import gzip
+import os
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+API_COMPRESSION_MIN_BYTES = int(os.environ.get("API_COMPRESSION_MIN_BYTES", "1024"))
+API_GZIP_LEVEL = int(os.environ.get("API_GZIP_LEVEL", "6"))
+# Brotli quality 4 compresses dynamic JSON better than gzip -6 at a similar speed
+API_BROTLI_QUALITY = int(os.environ.get("API_BROTLI_QUALITY", "4"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (UTF-8, compact) when available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map of accepted content codings to their q-values."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    """The preferred supported coding of an Accept-Encoding header, or None for identity."""
+    accepted = parse_accept_encoding(header)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        # Ties go to the earlier (better-compressing) coding
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=API_BROTLI_QUALITY, mode=brotli.MODE_TEXT)
+    return gzip.compress(body, compresslevel=API_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI middleware negotiating brotli/gzip for complete responses above `minimum_size`."""
+
+    def __init__(self, app, minimum_size: int = API_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether the response is streamed
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body", False) or "content-encoding" in headers
+                    or headers.get("content-type", "").startswith("text/event-stream")
+                    or len(body) < self.minimum_size):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers.add_vary_header("Accept-Encoding")
+            if len(compressed) < len(body):
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                message = {**message, "body": compressed}
+            passthrough = True
+            await send(start_message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
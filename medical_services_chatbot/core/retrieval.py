@@ -0,0 +1,302 @@
+"""
+Service Retrieval Module
+
+This module implements question-aware retrieval over the parsed services catalog.
+Instead of sending every service of the user's HMO and tier to the model, the
+QA service ranks the catalog rows against the question and keeps only the top-k.
+
+Two indexes are combined:
+- A lexical BM25 index (always on) over the Hebrew service names, the benefit
+  descriptions and an English glossary, so English questions match Hebrew rows.
+- An optional local embedding index (sentence-transformers), enabled by passing
+  an embedding model name.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+# English names and synonyms for each service. The first entry is the display name.
+SERVICE_GLOSSARY = {
+    # Alternative medicine
+    'דיקור סיני (אקופונקטורה)': ['acupuncture', 'chinese acupuncture'],
+    'שיאצו': ['shiatsu'],
+    'רפלקסולוגיה': ['reflexology'],
+    'נטורופתיה': ['naturopathy'],
+    'הומאופתיה': ['homeopathy', 'homoeopathy'],
+    'כירופרקטיקה': ['chiropractic', 'chiropractor'],
+    # Communication clinic
+    'אבחון הפרעות שפה ודיבור': ['speech and language disorder diagnosis', 'speech therapy', 'language disorders'],
+    'טיפול בגמגום': ['stuttering treatment', 'stutter', 'stammering'],
+    'טיפול בהפרעות קול': ['voice disorder treatment', 'voice'],
+    'אבחון וטיפול בהפרעות בליעה': ['swallowing disorder diagnosis and treatment', 'swallowing', 'dysphagia'],
+    'טיפול בעיכוב התפתחותי': ['developmental delay treatment', 'developmental delay'],
+    'שיקום שמיעה': ['hearing rehabilitation', 'hearing aids', 'hearing'],
+    # Dental
+    'בדיקות וניקוי שיניים': ['dental check-ups and cleanings', 'dental checkup', 'teeth cleaning', 'hygienist'],
+    'סתימות': ['fillings', 'cavities', 'tooth decay'],
+    'טיפולי שורש': ['root canal treatments', 'root canal'],
+    'כתרים ושתלים': ['crowns and implants', 'crown', 'implant'],
+    'יישור שיניים': ['orthodontic treatment', 'orthodontics', 'braces', 'teeth straightening'],
+    'טיפולים קוסמטיים': ['cosmetic dental treatments', 'cosmetic', 'whitening', 'veneers'],
+    # Optometry
+    'בדיקות ראייה': ['vision tests', 'eye exam', 'eye test', 'eyesight'],
+    'משקפי ראייה': ['glasses', 'eyeglasses', 'spectacles'],
+    'עדשות מגע': ['contact lenses', 'contacts'],
+    'טיפולים לתיקון ראייה': ['laser vision correction surgery', 'laser', 'lasik', 'vision correction'],
+    'אביזרי ראייה מיוחדים': ['special vision aids', 'low vision aids'],
+    'טיפול בילדים': ["children's treatment", 'children', 'kids', 'child', 'lazy eye'],
+    # Pregnancy
+    'מעקב הריון': ['pregnancy follow-up', 'prenatal care', 'pregnancy monitoring'],
+    'בדיקות סקר גנטיות': ['genetic screening tests', 'genetic screening', 'genetic testing'],
+    'סקירות מערכות': ['system scans', 'anatomy scan', 'ultrasound'],
+    'קורס הכנה ללידה': ['childbirth preparation course', 'birth preparation', 'prenatal class'],
+    'ייעוץ תזונתי': ['nutritional counseling', 'dietitian', 'nutrition consultation'],
+    'טיפול בסיבוכי הריון': ['pregnancy complications treatment', 'pregnancy complications', 'high-risk pregnancy'],
+    # Workshops
+    'הפסקת עישון': ['smoking cessation workshop', 'quit smoking', 'smoking'],
+    'תזונה נכונה': ['proper nutrition workshop', 'healthy eating', 'nutrition'],
+    'פעילות גופנית': ['physical activity workshop', 'exercise', 'fitness'],
+    'ניהול מתח': ['stress management workshop', 'stress', 'meditation'],
+    'סוכרת': ['diabetes workshop', 'diabetes', 'diabetic'],
+    'הריון ולידה': ['pregnancy and childbirth workshop', 'childbirth workshop'],
+}
+
+# Hebrew and English terms for each service category, keyed by the HTML file stem.
+CATEGORY_GLOSSARY = {
+    'alternative': ['רפואה משלימה', 'רפואה אלטרנטיבית', 'alternative medicine', 'complementary medicine'],
+    'communication_clinic': ['מרפאת תקשורת', 'קלינאות תקשורת', 'communication clinic', 'speech clinic'],
+    'dentel': ['מרפאת שיניים', 'שיניים', 'רופא שיניים', 'dental', 'dentist', 'teeth', 'tooth'],
+    'optometry': ['אופטומטריה', 'עיניים', 'ראייה', 'optometry', 'eye', 'eyes', 'vision'],
+    'pragrency': ['הריון', 'לידה', 'pregnancy', 'pregnant', 'prenatal'],
+    'workshops': ['סדנה', 'סדנת', 'סדנאות', 'workshop', 'workshops', 'course'],
+}
+
+STOP_WORDS = {
+    # English
+    'a', 'an', 'the', 'and', 'or', 'of', 'on', 'in', 'for', 'to', 'at', 'by', 'with', 'is', 'are', 'am',
+    'be', 'do', 'does', 'i', 'me', 'my', 'you', 'your', 'what', 'how', 'many', 'much', 'long', 'there',
+    'which', 'can', 'get', 'entitled', 'per', 'year', 'benefit', 'benefits', 'member', 'as', 'about',
+    # Hebrew
+    'מה', 'מהו', 'מהי', 'על', 'של', 'את', 'אני', 'האם', 'כמה', 'יש', 'לי', 'זה', 'הוא', 'היא', 'עם',
+    'או', 'גם', 'זכאי', 'זכאית', 'לקבל', 'ההטבות', 'הטבות', 'אחוז', 'כל', 'עד', 'איזה',
+    'הנחה', 'ההנחה', 'כולל', 'כוללים', 'כוללות', 'כוללת',
+}
+
+HEBREW_PREFIXES = 'והבלמשכ'
+HEBREW_SUFFIXES = ('ים', 'ות', 'ה', 'ת', 'י')
+TOKEN_PATTERN = re.compile(r"[\w']+", re.UNICODE)
+HEBREW_PATTERN = re.compile(r'[֐-׿]')
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant used to combine the lexical and embedding rankings
+RRF_K = 60
+
+
+def _term_variants(token: str) -> List[str]:
+    """Generate normalized variants of a token (Hebrew prefix/suffix stripping, English plurals)."""
+    if not HEBREW_PATTERN.search(token):
+        token = token.replace("'s", "").strip("'")
+        if token.endswith('ies') and len(token) > 4:
+            return [token[:-3] + 'y']
+        if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+            return [token[:-1]]
+        return [token]
+
+    # Hebrew attaches one-letter prefixes (ו, ה, ב, ל, מ, ש, כ) to words
+    bases = [token]
+    for i in range(1, 4):
+        if token[i - 1] not in HEBREW_PREFIXES or len(token) - i < 2:
+            break
+        bases.append(token[i:])
+
+    variants = []
+    for base in bases:
+        variants.append(base)
+        for suffix in HEBREW_SUFFIXES:
+            if base.endswith(suffix) and len(base) - len(suffix) >= 3:
+                variants.append(base[:-len(suffix)])
+                break
+    return variants
+
+
+def tokenize(text: str, stop_words: Optional[set] = None) -> List[str]:
+    """Tokenize Hebrew/English text into normalized index terms."""
+    stop_words = STOP_WORDS if stop_words is None else stop_words
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in stop_words or token.isdigit():
+            continue
+        for variant in _term_variants(token):
+            if variant not in stop_words:
+                terms.append(variant)
+    return terms
+
+
+class _BM25Index:
+    """Small in-memory BM25 index over a fixed list of documents."""
+
+    def __init__(self, documents: List[List[str]]):
+        self.doc_terms = [Counter(doc) for doc in documents]
+        self.doc_lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.doc_lengths) / len(documents)) if documents else 0.0
+
+        document_frequency = Counter()
+        for terms in self.doc_terms:
+            document_frequency.update(terms.keys())
+        n_docs = len(documents)
+        self.idf = {
+            term: math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def score(self, query_terms: List[str]) -> List[float]:
+        """Score every document against the query terms."""
+        scores = [0.0] * len(self.doc_terms)
+        for term in set(query_terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, terms in enumerate(self.doc_terms):
+                tf = terms.get(term)
+                if not tf:
+                    continue
+                norm = 1 - BM25_B + BM25_B * self.doc_lengths[i] / self.avg_length
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return scores
+
+
+class ServiceRetriever:
+    """
+    Hybrid retrieval index over the services catalog.
+
+    The index is built once over `services_db` ({hmo: {tier: {service: benefits}}})
+    and answers "which service rows of this HMO/tier slice are relevant to this
+    question" queries.
+    """
+
+    def __init__(
+        self,
+        services_db: Dict[str, Dict[str, Dict[str, str]]],
+        service_categories: Dict[str, str],
+        hmo_aliases: Optional[Dict[str, str]] = None,
+        tier_aliases: Optional[Dict[str, str]] = None,
+        embedding_model: Optional[str] = None,
+        embedding_min_score: float = 0.35,
+    ):
+        self.services_db = services_db
+        self.service_categories = service_categories
+        self.hmo_aliases = hmo_aliases or {}
+        self.tier_aliases = tier_aliases or {}
+        self.embedding_min_score = embedding_min_score
+
+        # HMO and tier names carry no information about the service being asked about
+        self.stop_words = set(STOP_WORDS)
+        for alias in [*self.hmo_aliases.keys(), *self.hmo_aliases.values(),
+                      *self.tier_aliases.keys(), *self.tier_aliases.values()]:
+            self.stop_words.update(TOKEN_PATTERN.findall(alias.lower()))
+
+        # One lexical index per (hmo, tier) slice, since benefit texts differ between slices
+        self._slices: Dict[Tuple[str, str], Tuple[List[str], _BM25Index]] = {}
+        for hmo, tiers in services_db.items():
+            for tier, services in tiers.items():
+                names = list(services.keys())
+                documents = [
+                    tokenize(f"{self._service_text(name)} {services[name]}", self.stop_words)
+                    for name in names
+                ]
+                self._slices[(hmo, tier)] = (names, _BM25Index(documents))
+
+        self._embedder = None
+        self._service_embeddings: Dict[str, Any] = {}
+        if embedding_model:
+            self._build_embedding_index(embedding_model)
+
+    def _service_text(self, service: str) -> str:
+        """Slice-independent text describing a service: name, glossary and category terms."""
+        category = self.service_categories.get(service, '')
+        return " ".join([
+            service,
+            *SERVICE_GLOSSARY.get(service, []),
+            category.replace('_', ' '),
+            *CATEGORY_GLOSSARY.get(category, []),
+        ])
+
+    def _build_embedding_index(self, model_name: str):
+        """Embed every service once with a local sentence-transformers model."""
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            return
+
+        self._embedder = SentenceTransformer(model_name)
+        services = sorted({s for tiers in self.services_db.values() for slice_ in tiers.values() for s in slice_})
+        vectors = self._embedder.encode(
+            [self._service_text(s) for s in services],
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        self._service_embeddings = dict(zip(services, vectors))
+
+    @property
+    def has_embeddings(self) -> bool:
+        return self._embedder is not None
+
+    def _resolve_slice(self, hmo: str, tier: str) -> Optional[Tuple[List[str], _BM25Index]]:
+        """Resolve English or Hebrew HMO/tier names to an index slice."""
+        hmo = self.hmo_aliases.get(hmo, hmo)
+        tier = self.tier_aliases.get(tier, tier)
+        return self._slices.get((hmo, tier))
+
+    def rank(self, hmo: str, tier: str, question: str) -> List[Tuple[str, float]]:
+        """Rank the services of an HMO/tier slice against the question, best first."""
+        slice_ = self._resolve_slice(hmo, tier)
+        if slice_ is None:
+            return []
+        names, index = slice_
+
+        lexical_scores = index.score(tokenize(question, self.stop_words))
+        lexical_ranking = sorted(
+            (i for i, score in enumerate(lexical_scores) if score > 0),
+            key=lambda i: lexical_scores[i],
+            reverse=True,
+        )
+
+        if not self.has_embeddings:
+            return [(names[i], lexical_scores[i]) for i in lexical_ranking]
+
+        question_vector = self._embedder.encode(question, normalize_embeddings=True, convert_to_numpy=True)
+        semantic_scores = [float(self._service_embeddings[name] @ question_vector) for name in names]
+        semantic_ranking = sorted(
+            (i for i, score in enumerate(semantic_scores) if score >= self.embedding_min_score),
+            key=lambda i: semantic_scores[i],
+            reverse=True,
+        )
+
+        # Reciprocal rank fusion of both rankings
+        fused = Counter()
+        for ranking in (lexical_ranking, semantic_ranking):
+            for position, i in enumerate(ranking):
+                fused[i] += 1.0 / (RRF_K + position + 1)
+        return [(names[i], score) for i, score in fused.most_common()]
+
+    def retrieve(self, hmo: str, tier: str, question: str, top_k: int,
+                 ranked: Optional[List[Tuple[str, float]]] = None) -> Dict[str, str]:
+        """
+        Return the top-k service rows of the HMO/tier slice for the question.
+
+        Falls back to the whole slice when nothing in the question matches a service
+        (e.g. "what are my benefits?"), so broad questions still get a full answer.
+        A ranking already computed with `rank` can be passed to avoid scoring twice.
+        """
+        hmo = self.hmo_aliases.get(hmo, hmo)
+        tier = self.tier_aliases.get(tier, tier)
+        services = self.services_db.get(hmo, {}).get(tier, {})
+        if ranked is None:
+            ranked = self.rank(hmo, tier, question)
+        if not ranked:
+            return services
+        return {name: services[name] for name, _ in ranked[:top_k]}
@@ -0,0 +1,163 @@
+"""
+Backend Launcher Module
+
+Pre-fork launcher for running the FastAPI backend with several worker processes:
+
+1. The launcher process loads the services catalog once (snapshot + parse of
+   changed tables, retrieval index, prompt prefixes, parsed facts).
+2. It freezes the garbage collector, so the catalog objects are moved out of the
+   collected generations and the workers' collections don't write to their pages.
+3. It binds the listening socket and forks the workers. Each worker inherits the
+   catalog copy-on-write and runs its own uvicorn server on the shared socket;
+   per-process state (LLM connection pools, limiter, catalog watcher, health
+   sampler) is created in the app lifespan after the fork.
+4. It restarts workers that exit unexpectedly and forwards SIGINT/SIGTERM.
+
+With more than one worker the launcher defaults SESSION_STORE to "sqlite" and
+PROMETHEUS_MULTIPROC_DIR to a fresh temporary directory, so sessions and
+metrics are shared by the workers. Fork is POSIX-only; on other platforms use
+`uvicorn --workers`, which loads the catalog in every worker.
+
+Run from the `medical_services_chatbot` directory:
+
+    python -m core.server --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+# Nothing from the app is imported at module level: the environment defaults below
+# must be in place before core.monitoring and core.session_store read them
+
+
+def _configure_environment(workers: int) -> None:
+    if workers > 1:
+        os.environ.setdefault("SESSION_STORE", "sqlite")
+        if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="medical_chatbot_metrics_")
+        else:
+            # Samples of a previous run would be aggregated with ours
+            directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+
+
+def _bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, log_level: str) -> None:
+    """Serve the app on the inherited socket until uvicorn handles a shutdown signal"""
+    import uvicorn
+
+    # Forked from the launcher: restore default handlers before uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, log_level: str = "info") -> None:
+    _configure_environment(workers)
+
+    import uvicorn
+    from core import fastapi_backend
+    from core.logging_config import get_logger
+    from core.monitoring import multiprocess_enabled
+    from core.qa_service import QAService
+
+    logger = get_logger("server")
+
+    start = time.perf_counter()
+    fastapi_backend.preloaded_catalog = QAService.load_catalog()
+    logger.info("catalog_preloaded", version=fastapi_backend.preloaded_catalog.version,
+                elapsed_ms=round((time.perf_counter() - start) * 1000, 1))
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run(fastapi_backend.app, host=host, port=port, log_level=log_level)
+        return
+
+    sock = _bind_socket(host, port)
+    # Keep the preloaded objects out of the workers' garbage collections
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(fastapi_backend.app, sock, log_level)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+        logger.info("worker_started", pid=pid)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for _ in range(workers):
+        spawn()
+    logger.info("server_started", host=host, port=port, workers=workers, multiprocess_metrics=multiprocess_enabled())
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started_at = children.pop(pid, None)
+        if started_at is None:
+            continue
+        if multiprocess_enabled():
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid)
+        if not stopping:
+            logger.warning("worker_exited", pid=pid, status=status)
+            # Back off when a worker dies right after starting, e.g. on a broken configuration
+            if time.monotonic() - started_at < 1.0:
+                time.sleep(1.0)
+            spawn()
+
+    sock.close()
+    logger.info("server_stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="Worker processes (defaults to WEB_CONCURRENCY or 1)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Services Catalog Module
+
+This module builds the services catalog ({hmo: {tier: {service: benefits}}}) from
+the `*_services.html` tables in `phase2_data`. Every benefit description is also
+parsed into structured facts (discounts, frequency limits, wait times; see
+`core.benefit_facts`) with the same layout.
+
+Parsing with BeautifulSoup is slow, so the parsed catalog is persisted as a compact
+binary snapshot (Python's `marshal` format). The snapshot is keyed by a SHA-256
+content hash of the HTML files: processes whose files match the snapshot key load
+it directly, and when a file changes only that file is parsed again.
+
+`ServicesCatalogWatcher` polls the directory in a background thread so a running
+backend can pick up table changes without a restart.
+"""
+
+import hashlib
+import marshal
+import os
+import re
+import sys
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from core.benefit_facts import BenefitFacts, parse_benefit_facts
+from core.logging_config import get_logger
+
+logger = get_logger("services_catalog")
+
+SERVICES_FILE_SUFFIX = "_services.html"
+DEFAULT_SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../phase2_data")
+
+# Snapshot file layout: MAGIC | key (64 hex chars) | marshal payload
+SNAPSHOT_MAGIC = b"MSCS"
+# Bump when the parsed structure changes so old snapshots are ignored
+SNAPSHOT_FORMAT_VERSION = 2
+# marshal is only stable within one Python version
+SNAPSHOT_RUNTIME_TAG = f"py{sys.version_info[0]}.{sys.version_info[1]}-m{marshal.version}"
+
+
+def hash_services_files(services_dir: str) -> Dict[str, str]:
+    """Return the SHA-256 content hash of every services HTML file, by file name."""
+    file_hashes = {}
+    for filename in sorted(os.listdir(services_dir)):
+        if filename.endswith(SERVICES_FILE_SUFFIX):
+            with open(os.path.join(services_dir, filename), 'rb') as f:
+                file_hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return file_hashes
+
+
+def snapshot_key(file_hashes: Dict[str, str]) -> str:
+    """Combine the per-file hashes into a single snapshot key."""
+    digest = hashlib.sha256(f"{SNAPSHOT_FORMAT_VERSION}:{SNAPSHOT_RUNTIME_TAG}".encode())
+    for filename, file_hash in sorted(file_hashes.items()):
+        digest.update(f"\0{filename}\0{file_hash}".encode())
+    return digest.hexdigest()
+
+
+def read_snapshot(path: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Read a snapshot file, returning (key, payload) or None if missing or unreadable."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    header_length = len(SNAPSHOT_MAGIC) + 64
+    if len(data) < header_length or not data.startswith(SNAPSHOT_MAGIC):
+        return None
+    key = data[len(SNAPSHOT_MAGIC):header_length].decode('ascii', errors='replace')
+    try:
+        payload = marshal.loads(data[header_length:])
+    except (EOFError, ValueError, TypeError):
+        return None
+    return key, payload
+
+
+def write_snapshot(path: str, key: str, payload: Dict[str, Any]) -> None:
+    """Atomically write a snapshot file (write to a temp file, then rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + key.encode('ascii') + marshal.dumps(payload))
+    os.replace(tmp_path, path)
+
+
+class ServicesCatalogLoader:
+    """Parse the services HTML tables, using the snapshot when it is up to date."""
+
+    def __init__(self, services_dir: Optional[str] = None, snapshot_path: Optional[str] = None,
+                 use_snapshot: bool = True):
+        self.services_dir = os.path.abspath(services_dir or DEFAULT_SERVICES_DIR)
+        self.snapshot_path = snapshot_path or os.path.join(self.services_dir, ".cache", "services_db.snapshot")
+        self.use_snapshot = use_snapshot
+
+    def load(self) -> Tuple[Dict[str, Dict[str, Dict[str, str]]], Dict[str, str]]:
+        """Load the catalog, returning (services_db, service_categories)."""
+        _, fragments = self.load_fragments()
+        return self.merge_fragments(fragments)
+
+    def load_fragments(self) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+        """Load the per-file catalog fragments, returning (snapshot key, fragments)."""
+        if not os.path.exists(self.services_dir):
+            raise FileNotFoundError(f"Services directory not found at: {self.services_dir}")
+
+        file_hashes = hash_services_files(self.services_dir)
+        key = snapshot_key(file_hashes)
+
+        snapshot = read_snapshot(self.snapshot_path) if self.use_snapshot else None
+        if snapshot is not None and snapshot[0] == key:
+            return key, snapshot[1]["files"]
+
+        # Fragments of an older snapshot format lack fields, so they are never reused
+        cached_fragments = {}
+        if snapshot is not None and snapshot[1].get("format") == SNAPSHOT_FORMAT_VERSION:
+            cached_fragments = snapshot[1].get("files", {})
+        return key, self._update_fragments(key, file_hashes, cached_fragments)
+
+    def refresh_fragments(self, fragments: Dict[str, Dict[str, Any]]) -> Optional[Tuple[str, Dict[str, Dict[str, Any]]]]:
+        """
+        Bring fragments up to date with the files on disk.
+
+        Only added or modified files are parsed. Returns (snapshot key, new fragments),
+        or None when nothing changed.
+        """
+        file_hashes = hash_services_files(self.services_dir)
+        current_hashes = {filename: fragment["hash"] for filename, fragment in fragments.items()}
+        if file_hashes == current_hashes:
+            return None
+
+        key = snapshot_key(file_hashes)
+        return key, self._update_fragments(key, file_hashes, fragments)
+
+    def _update_fragments(self, key: str, file_hashes: Dict[str, str],
+                          cached_fragments: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Reuse the fragments of unchanged files, parse the rest and persist the snapshot."""
+        fragments = {}
+        for filename, file_hash in file_hashes.items():
+            cached = cached_fragments.get(filename)
+            if cached is not None and cached["hash"] == file_hash:
+                fragments[filename] = cached
+            else:
+                fragments[filename] = self.parse_services_file(filename, file_hash)
+
+        if self.use_snapshot:
+            try:
+                write_snapshot(self.snapshot_path, key, {"format": SNAPSHOT_FORMAT_VERSION, "files": fragments})
+                logger.info("services_snapshot_written", path=self.snapshot_path, files=len(fragments))
+            except OSError as e:
+                logger.error("services_snapshot_write_error", path=self.snapshot_path, error=str(e))
+
+        return fragments
+
+    @staticmethod
+    def merge_fragments(fragments: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Merge per-file fragments (in file name order) into a single catalog."""
+        services_db = {}
+        service_categories = {}
+        for filename in sorted(fragments):
+            fragment = fragments[filename]
+            service_categories.update(fragment["service_categories"])
+            for hmo, tiers in fragment["services_db"].items():
+                hmo_db = services_db.setdefault(hmo, {})
+                for tier, services in tiers.items():
+                    hmo_db.setdefault(tier, {}).update(services)
+        return services_db, service_categories
+
+    @staticmethod
+    def merge_facts(fragments: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, BenefitFacts]]]:
+        """Merge the per-file benefit facts into {hmo: {tier: {service: BenefitFacts}}}."""
+        facts_db = {}
+        for filename in sorted(fragments):
+            for hmo, tiers in fragments[filename]["facts_db"].items():
+                hmo_facts = facts_db.setdefault(hmo, {})
+                for tier, services in tiers.items():
+                    tier_facts = hmo_facts.setdefault(tier, {})
+                    for service, record in services.items():
+                        tier_facts[service] = BenefitFacts.from_record(record)
+        return facts_db
+
+    def parse_services_file(self, filename: str, file_hash: str) -> Dict[str, Any]:
+        """Parse a single services HTML file into a catalog fragment."""
+        service_name = filename.replace(SERVICES_FILE_SUFFIX, "")
+        with open(os.path.join(self.services_dir, filename), 'r', encoding='utf-8') as f:
+            html_content = f.read()
+
+        fragment = {"hash": file_hash, "services_db": {}, "service_categories": {}, "facts_db": {}}
+        soup = BeautifulSoup(html_content, 'html.parser')
+        table = soup.find('table')
+        if table:
+            self._parse_table(table, service_name, fragment["services_db"], fragment["service_categories"],
+                              fragment["facts_db"])
+        return fragment
+
+    def _extract_tiers_from_html(self, cell) -> Dict[str, str]:
+        """Extract tier information from a cell using regex."""
+        # Get all the text content
+        text_content = cell.get_text()
+
+        # Split by newlines to get each tier line
+        lines = [line.strip() for line in text_content.split('\n') if line.strip()]
+
+        # Extract tier and description using regex
+        tiers_dict = {}
+        for line in lines:
+            # Match pattern: <tier name>: <description>
+            match = re.match(r'(\w+):\s*(.*)', line)
+            if match:
+                tier_name = match.group(1)
+                description = match.group(2)
+                tiers_dict[tier_name] = description
+
+        return tiers_dict
+
+    def _extract_tier_facts_from_html(self, cell) -> Dict[str, Tuple[str, BenefitFacts]]:
+        """Extract each tier's description from a cell together with its parsed facts."""
+        return {
+            tier_name: (description, parse_benefit_facts(description))
+            for tier_name, description in self._extract_tiers_from_html(cell).items()
+        }
+
+    def _parse_table(self, table, service_name: str, services_db: Dict[str, Any],
+                     service_categories: Dict[str, str], facts_db: Dict[str, Any]):
+        """Parse HTML table into a nested dictionary structure organized by HMO and tier"""
+        # Get headers (HMOs)
+        headers = [th.text.strip() for th in table.find_all('th')[1:]]
+
+        # Process each row
+        for row in table.find_all('tr')[1:]:  # Skip header row
+            cells = row.find_all('td')
+            if not cells:
+                continue
+
+            service = cells[0].text.strip()
+            service_categories[service] = service_name
+
+            # Process each HMO column
+            for i, cell in enumerate(cells[1:]):
+                hmo = headers[i]
+
+                # Initialize HMO if not exists
+                if hmo not in services_db:
+                    services_db[hmo] = {}
+                    facts_db[hmo] = {}
+
+                # Extract tiers, their descriptions and parsed facts
+                tiers_dict = self._extract_tier_facts_from_html(cell)
+
+                # Store benefits for each tier
+                for tier, (benefits, facts) in tiers_dict.items():
+                    # Initialize tier if not exists
+                    if tier not in services_db[hmo]:
+                        services_db[hmo][tier] = {}
+                        facts_db[hmo][tier] = {}
+
+                    # Store benefits under the service
+                    if benefits and benefits != '':  # Only store if there are actual benefits
+                        services_db[hmo][tier][service] = benefits
+                        # Stored as plain data so fragments stay marshal-serializable
+                        facts_db[hmo][tier][service] = facts.to_record()
+                    else:
+                        services_db[hmo][tier][service] = "לא זמין"  # Mark as unavailable in Hebrew
+
+
+class ServicesCatalogWatcher:
+    """Poll the services directory and call `on_change` when a services file changes."""
+
+    def __init__(self, services_dir: str, on_change: Callable[[], None], interval: float = 5.0):
+        self.services_dir = services_dir
+        self.on_change = on_change
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = self._file_signature()
+
+    def _file_signature(self) -> Dict[str, Tuple[int, int]]:
+        """Cheap change detection: (mtime, size) of every services file."""
+        signature = {}
+        try:
+            with os.scandir(self.services_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(SERVICES_FILE_SUFFIX):
+                        stat = entry.stat()
+                        signature[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.error("services_watch_error", services_dir=self.services_dir, error=str(e))
+        return signature
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="services-catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def poll(self) -> bool:
+        """Check the files once and call `on_change` if they changed; True if the reload succeeded"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        try:
+            self.on_change()
+        except Exception as e:
+            # Keep the old signature, so the reload is retried on the next poll
+            # (e.g. after a half-written file is complete)
+            logger.error("services_reload_error", error=str(e), exc_info=True)
+            return False
+        self._signature = signature
+        return True
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.poll()
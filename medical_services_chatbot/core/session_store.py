@@ -0,0 +1,266 @@
+"""
+Session Store Module
+
+Server-side conversation state for the sessions API: the chat history, the
+language and the extracted user information, keyed by a session id. With it the
+client sends only the session id and the new message each turn instead of the
+whole history.
+
+Two backends share the `SessionStore` interface:
+1. `InMemorySessionStore`: LRU with TTL, for a single process.
+2. `SQLiteSessionStore`: a local SQLite file (WAL mode), so several workers on
+   the same host see the same sessions.
+
+`get` returns a copy that is only stored by `save`. Every save bumps the
+session's revision and is refused with `SessionConflictError` when the stored
+revision moved on since the copy was read, so two turns of one session that
+run concurrently (e.g. in two workers) can't overwrite each other's history.
+
+`create_session_store()` picks the backend from the environment.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from core.logging_config import get_logger
+from core.monitoring import SESSION_EVICTIONS
+
+logger = get_logger("session_store")
+
+# "memory" (single process) or "sqlite" (shared by the workers of one host)
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory").lower()
+SESSION_TTL_SECONDS = float(os.environ.get("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "10000"))
+SESSION_SQLITE_PATH = os.environ.get(
+    "SESSION_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "phase2_data", ".cache", "sessions.sqlite3")
+)
+
+
+@dataclass
+class Session:
+    session_id: str
+    language: str
+    chat_history: List[Dict[str, str]] = field(default_factory=list)
+    user_info: Dict[str, Any] = field(default_factory=dict)
+    is_qa_mode: bool = False
+    # CollectionState record of the information collection, updated after each turn
+    collection_state: Dict[str, Any] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.time)
+    # Number of saves, for the compare-and-set of save()
+    revision: int = 0
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "language": self.language,
+            "chat_history": self.chat_history,
+            "user_info": self.user_info,
+            "is_qa_mode": self.is_qa_mode,
+            "collection_state": self.collection_state,
+        }
+
+
+class SessionConflictError(Exception):
+    """Raised by save() when the session was saved by someone else since it was read; maps to HTTP 409."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        super().__init__(f"Session {session_id} was changed by a concurrent request")
+
+
+class SessionStore(ABC):
+    """Interface of the session backends. Sessions expire `ttl_seconds` after their last save."""
+
+    # Whether the calls block on I/O (callers on an event loop run them in a thread pool)
+    blocking = False
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, language: str) -> Session:
+        session = Session(session_id=uuid.uuid4().hex, language=language)
+        self.save(session)
+        return session
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        """A copy of the session, or None if it doesn't exist or expired"""
+
+    @abstractmethod
+    def save(self, session: Session) -> None:
+        """Store the session and bump its revision; SessionConflictError if the stored revision differs"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove the session; False if there was none"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Backend name and number of stored sessions"""
+
+    def _expired(self, updated_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - updated_at > self.ttl_seconds
+
+
+class InMemorySessionStore(SessionStore):
+    """Thread-safe LRU/TTL session store for a single process."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = SESSION_MAX_ENTRIES, ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self._expired(session.updated_at, time.time()):
+                del self._sessions[session_id]
+                SESSION_EVICTIONS.labels(reason="ttl").inc()
+                return None
+            self._sessions.move_to_end(session_id)
+            # Callers change their copy; the stored session only changes on save
+            return copy.deepcopy(session)
+
+    def save(self, session: Session) -> None:
+        with self._lock:
+            stored = self._sessions.get(session.session_id)
+            # A session that expired or was evicted during the turn is stored again
+            if stored is not None and stored.revision != session.revision:
+                raise SessionConflictError(session.session_id)
+            session.updated_at = time.time()
+            session.revision += 1
+            self._sessions[session.session_id] = copy.deepcopy(session)
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+                SESSION_EVICTIONS.labels(reason="lru").inc()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": self.backend, "sessions": len(self._sessions),
+                    "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a local SQLite file, shared by all processes that open it."""
+
+    backend = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "revision INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Files created before sessions had revisions
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "revision" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._last_purge = 0.0
+        self._purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, language: str) -> Session:
+        # Sessions that are never read again are only removed by a purge
+        if time.time() - self._last_purge > 60:
+            self._purge_expired()
+        return super().create(language)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        row = self._connection().execute(
+            "SELECT data, updated_at, revision FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1], time.time()):
+            self.delete(session_id)
+            SESSION_EVICTIONS.labels(reason="ttl").inc()
+            return None
+        return Session(**json.loads(row[0]), updated_at=row[1], revision=row[2])
+
+    def save(self, session: Session) -> None:
+        updated_at = time.time()
+        data = json.dumps(session.to_record(), ensure_ascii=False)
+        with self._connection() as conn:
+            # Compare-and-set on the revision the session was read with
+            saved = conn.execute(
+                "UPDATE sessions SET data = ?, updated_at = ?, revision = revision + 1 "
+                "WHERE session_id = ? AND revision = ?",
+                (data, updated_at, session.session_id, session.revision)
+            ).rowcount
+            if not saved:
+                # New, or expired and purged during the turn; a row that exists has another revision
+                saved = conn.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, data, updated_at, revision) VALUES (?, ?, ?, ?)",
+                    (session.session_id, data, updated_at, session.revision + 1)
+                ).rowcount
+        if not saved:
+            raise SessionConflictError(session.session_id)
+        session.updated_at = updated_at
+        session.revision += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        count = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {"backend": self.backend, "sessions": count, "path": self.path, "ttl_seconds": self.ttl_seconds}
+
+    def _purge_expired(self) -> None:
+        self._last_purge = time.time()
+        if self.ttl_seconds <= 0:
+            return
+        with self._connection() as conn:
+            removed = conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+        if removed:
+            SESSION_EVICTIONS.labels(reason="ttl").inc(removed)
+            logger.info("expired_sessions_purged", count=removed)
+
+
+def create_session_store() -> SessionStore:
+    """The session store configured by SESSION_STORE."""
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore()
+    if SESSION_STORE != "memory":
+        logger.warning("unknown_session_store", backend=SESSION_STORE, fallback="memory")
+    return InMemorySessionStore()
@@ -0,0 +1,358 @@
+"""
+Slot Extraction Module
+
+Rule-based extraction of the user information fields from an information
+collection conversation, so the extraction LLM call can be skipped when the
+conversation already states every field unambiguously.
+
+Evidence is collected per message:
+1. The confirmation summary: an assistant message listing the fields as
+   "label: value" lines, counted only when the user's reply confirms it.
+2. Labelled values in a user message ("ID 123456789", "I'm 28 years old",
+   "Gold tier", "שמי דנה כהן"), plus HMO and gender names, which are
+   unambiguous on their own.
+3. Answers to the field the assistant asked for in the preceding message
+   ("What's your age?" or "Please enter your age." -> "28").
+
+Values are normalized and validated with `core.validators`. For each field the
+most recent evidence wins, so corrections replace earlier answers; within one
+message a labelled value beats a bare answer. A field with two different values
+in the same message is ambiguous unless a later message settles it.
+
+`CollectionState` applies the same rules one turn at a time, keeping the
+confirmed, pending and invalid fields of a conversation in progress, and the
+replies no rule could read.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.validators import USER_INFO_FIELDS, normalize_field
+
+# Evidence strength within one message
+LABELLED, ANSWER = 2, 1
+# Replies without evidence kept in the collection state
+MAX_UNPARSED_REPLIES = 4
+
+# Field labels in English and Hebrew; longer labels are matched first
+FIELD_LABELS = {
+    "first_name": ["first name", "given name", "שם פרטי", "שמך הפרטי", "השם הפרטי"],
+    "last_name": ["last name", "surname", "family name", "שם משפחה", "שם המשפחה", "שם משפחתך"],
+    "id_number": ["id number", "identity number", "id", "teudat zehut", "מספר זהות", "מספר הזהות",
+                  "מספר תעודת זהות", "מספר תעודת הזהות", "תעודת זהות", "תעודת הזהות", "ת.ז", 'ת"ז', "תז"],
+    "gender": ["gender", "sex", "מין", "מגדר"],
+    "age": ["age", "how old", "גיל", "גילך"],
+    "hmo_name": ["hmo name", "hmo", "health fund", "קופת חולים", "קופת החולים", "שם קופת חולים", "קופה"],
+    "hmo_card_number": ["hmo card number", "card number", "hmo card", "membership card", "card",
+                        "מספר כרטיס קופת חולים", "מספר כרטיס קופת החולים", "מספר כרטיס", "כרטיס קופת חולים",
+                        "כרטיס קופת החולים", "כרטיס"],
+    "membership_tier": ["insurance membership tier", "membership tier", "tier", "membership level", "plan",
+                        "דרגת חברות", "דרגת החברות", "מסלול", "דרגה", "רובד"],
+}
+# Summary lines holding both names
+FULL_NAME_LABELS = {"name", "full name", "שם", "שם מלא"}
+# Fields whose values are names from a closed list
+KEYWORD_FIELDS = ("gender", "hmo_name", "membership_tier")
+
+_LABEL_PATTERNS: List[Tuple[str, "re.Pattern"]] = sorted(
+    ((name, re.compile(r"(?<!\w)[והבלמש]?" + re.escape(label) + r"(?!\w)", re.IGNORECASE))
+     for name, labels in FIELD_LABELS.items() for label in labels),
+    key=lambda item: -len(item[1].pattern),
+)
+
+_NINE_DIGITS_RE = re.compile(r"(?<!\d)\d(?:[\s\-]?\d){8}(?!\d)")
+_NUMBER_RE = re.compile(r"(?<!\d)\d{1,3}(?!\d)")
+_WORD_RE = re.compile(r"[A-Za-zא-ת][A-Za-zא-ת'\-]*")
+_SUMMARY_LINE_RE = re.compile(r"^[\s\-*•\d.]*\**\s*([^:：*]{2,40}?)\s*\**\s*[:：]\s*\**\s*(.+?)\s*\**\s*$")
+_AGE_RE = re.compile(r"(?<!\d)(\d{1,3})\s*(?:years? old|y/?o)\b|(?:\bage|גיל|בן|בת)\s*(?:[:\-]|is|הוא)?\s*(\d{1,3})(?!\d)",
+                     re.IGNORECASE)
+_FULL_NAME_RE = re.compile(r"(?:my (?:full )?name is|שמי|קוראים לי)\s+([A-Za-zא-ת'\-]+)\s+([A-Za-zא-ת'\-]+)",
+                           re.IGNORECASE)
+_NAME_LEAD_INS = re.compile(
+    r"^(?:(?:my )?(?:first |last |family |full )?name is|i am|i'm|it's|it is|this is|call me|"
+    r"שמי|השם שלי(?: הוא| היא)?|קוראים לי|אני)\s+", re.IGNORECASE)
+# Requests phrased as instructions ("Please provide your HMO card number.", "אנא הזן את גילך.")
+_REQUEST_RE = re.compile(r"(?<!\w)(?:please|kindly|אנא|נא|בבקשה)(?!\w)|^(?:enter|provide|share|type|tell me|give me|"
+                         r"הזן|הזיני|הקלד|הקלידי|ספק|ספקי|מסור|מסרי|כתוב|כתבי)(?!\w)", re.IGNORECASE)
+_CONFIRMATION_RE = re.compile(r"^\W*(?:yes|yep|yeah|correct|right|confirmed?|כן|נכון|מאשר|מאשרת)\b",
+                              re.IGNORECASE)
+# Words that never make a name on their own
+_KEYWORD_VALUES = {"male", "female", "man", "woman", "gold", "silver", "bronze", "maccabi", "clalit", "meuhedet",
+                   "זכר", "נקבה", "אישה", "גבר", "זהב", "כסף", "ארד", "מכבי", "כללית", "מאוחדת", "yes", "no",
+                   "כן", "לא"}
+
+
+@dataclass
+class SlotExtraction:
+    values: Dict[str, Any] = field(default_factory=dict)
+    ambiguous: Set[str] = field(default_factory=set)
+
+    @property
+    def missing(self) -> List[str]:
+        """Fields that are unknown or ambiguous, in the canonical order."""
+        return [name for name in USER_INFO_FIELDS if name not in self.values or name in self.ambiguous]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+def find_labels(text: str) -> List[Tuple[int, int, str]]:
+    """(start, end, field) of the field labels in the text, longest labels first, without overlaps."""
+    found = []
+    taken = [False] * len(text)
+    for name, pattern in _LABEL_PATTERNS:
+        for match in pattern.finditer(text):
+            if not any(taken[match.start():match.end()]):
+                found.append((match.start(), match.end(), name))
+                for i in range(match.start(), match.end()):
+                    taken[i] = True
+    return sorted(found)
+
+
+def asked_fields(message: str) -> Set[str]:
+    """The fields the assistant asks for in its last question or request."""
+    segments = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", message) if s.strip()]
+    questions = [s for s in segments if s.endswith("?") or _REQUEST_RE.search(s)]
+    if not questions:
+        return set()
+    fields = {name for _, _, name in find_labels(questions[-1])}
+    # A question listing several fields (e.g. the summary) doesn't say what a reply answers,
+    # except for the common "first and last name"
+    if len(fields) == 1 or fields == {"first_name", "last_name"}:
+        return fields
+    return set()
+
+
+def is_confirmation(message: str) -> bool:
+    """A plain yes, without corrections attached."""
+    return bool(_CONFIRMATION_RE.match(message)) and not re.search(r"\d", message) and len(message.split()) <= 5
+
+
+def _names(text: str) -> List[str]:
+    text = _NAME_LEAD_INS.sub("", text.strip().rstrip(".!"))
+    return [w for w in _WORD_RE.findall(text) if w.lower() not in _KEYWORD_VALUES]
+
+
+def _keyword_values(name: str, text: str, min_length: int = 1) -> Set[Any]:
+    """Distinct valid keyword values (gender, HMO, tier) mentioned in the text."""
+    values = set()
+    for word in _WORD_RE.findall(text):
+        if len(word) < min_length:
+            continue
+        # Hebrew words may carry a one-letter prefix ("במכבי", "ממכבי")
+        for candidate in (word, word[1:] if word[:1] in "והבלמש" and len(word) > 3 else None):
+            value = normalize_field(name, candidate) if candidate else None
+            if value is not None:
+                values.add(value)
+                break
+    return values
+
+
+def _answer_values(name: str, text: str) -> Set[Any]:
+    """Valid values of a field in a reply to a question about it."""
+    if name in ("id_number", "hmo_card_number"):
+        return {normalize_field(name, m.group()) for m in _NINE_DIGITS_RE.finditer(text)}
+    if name == "age":
+        return {normalize_field(name, m.group()) for m in _NUMBER_RE.finditer(text)} - {None}
+    if name in KEYWORD_FIELDS:
+        return _keyword_values(name, text)
+    # A single name field is answered with one word; anything longer is left to the model
+    words = _names(text)
+    return {normalize_field(name, words[0])} - {None} if len(words) == 1 else set()
+
+
+def _labelled_values(text: str) -> Dict[str, Set[Any]]:
+    """Values stated next to their field label in a free-form user message."""
+    values: Dict[str, Set[Any]] = {}
+
+    def add(name: str, found: Set[Any]) -> None:
+        found = {v for v in found if v is not None}
+        if found:
+            values.setdefault(name, set()).update(found)
+
+    labels = find_labels(text)
+    for i, (start, end, name) in enumerate(labels):
+        # The value sits between this label and the next one
+        following = text[end:labels[i + 1][0] if i + 1 < len(labels) else len(text)]
+        following = re.sub(r"^\s*(?:is|are|:|=|-|הוא|היא)?\s*", "", following, flags=re.IGNORECASE)[:40]
+        if name in ("first_name", "last_name"):
+            words = _names(following)[:1]
+            found = {normalize_field(name, words[0])} if words else set()
+        elif name == "age":
+            # Handled by _AGE_RE, which also covers "28 years old"
+            continue
+        else:
+            found = _answer_values(name, following)
+        if not found and name in KEYWORD_FIELDS:
+            # "Gold tier", "Maccabi HMO"
+            preceding = _WORD_RE.findall(text[labels[i - 1][1] if i else 0:start])[-1:]
+            found = _keyword_values(name, " ".join(preceding))
+        add(name, found)
+
+    for match in _AGE_RE.finditer(text):
+        add("age", {normalize_field("age", match.group(1) or match.group(2))})
+    name_match = _FULL_NAME_RE.search(text)
+    if name_match and name_match.group(1).lower() not in _KEYWORD_VALUES \
+            and name_match.group(2).lower() not in _KEYWORD_VALUES:
+        add("first_name", {normalize_field("first_name", name_match.group(1))})
+        add("last_name", {normalize_field("last_name", name_match.group(2))})
+    # HMO and gender names mean the same wherever they appear; tier names don't ("כסף" is also money)
+    for name in ("gender", "hmo_name"):
+        add(name, _keyword_values(name, text, min_length=2))
+    return values
+
+
+def _summary_values(message: str) -> Dict[str, Any]:
+    """Fields listed as "label: value" lines, if the message has at least four of them."""
+    values = {}
+    for line in message.splitlines():
+        match = _SUMMARY_LINE_RE.match(line)
+        if not match:
+            continue
+        label, text = match.group(1).strip(), match.group(2).strip(" .*")
+        if label.lower() in FULL_NAME_LABELS:
+            # Edge hyphens and apostrophes are punctuation around the name ("Levi -")
+            words = [word.strip("'-") for word in _WORD_RE.findall(text)]
+            if len(words) == 2:
+                values["first_name"] = normalize_field("first_name", words[0])
+                values["last_name"] = normalize_field("last_name", words[1])
+            continue
+        labels = find_labels(label)
+        if len(labels) != 1:
+            continue
+        name = labels[0][2]
+        value = normalize_field(name, text)
+        if value is None and name not in ("first_name", "last_name"):
+            # e.g. "Maccabi (מכבי)", "28 years"
+            found = _answer_values(name, text)
+            value = found.pop() if len(found) == 1 else None
+        if value is not None:
+            values[name] = value
+    values = {name: value for name, value in values.items() if value is not None}
+    return values if len(values) >= 4 else {}
+
+
+def turn_evidence(previous: Optional[str], message: str) -> Dict[str, Tuple[int, Set[Any]]]:
+    """Values a user message states, given the assistant message before it: field -> (strength, values)."""
+    evidence: Dict[str, Tuple[int, Set[Any]]] = {}
+
+    def add(name: str, strength: int, values: Set[Any]) -> None:
+        values = {v for v in values if v is not None}
+        if not values:
+            return
+        current = evidence.get(name)
+        if current is None or strength > current[0]:
+            evidence[name] = (strength, set(values))
+        elif strength == current[0]:
+            current[1].update(values)
+
+    # A confirmed summary states every field it lists
+    if previous and is_confirmation(message):
+        for name, value in _summary_values(previous).items():
+            add(name, LABELLED, {value})
+    for name, values in _labelled_values(message).items():
+        add(name, LABELLED, values)
+    asked = asked_fields(previous) if previous else set()
+    if asked == {"first_name", "last_name"}:
+        words = _names(message)
+        if len(words) == 2:
+            add("first_name", ANSWER, {normalize_field("first_name", words[0])})
+            add("last_name", ANSWER, {normalize_field("last_name", words[1])})
+    elif len(asked) == 1:
+        name = next(iter(asked))
+        add(name, ANSWER, _answer_values(name, message))
+    return evidence
+
+
+def extract_slots(chat_history: List[Dict[str, str]]) -> SlotExtraction:
+    """Extract the user information fields from an information collection conversation."""
+    # field -> ((turn, strength), values)
+    evidence: Dict[str, Tuple[Tuple[int, int], Set[Any]]] = {}
+    for turn, message in enumerate(chat_history):
+        if message.get("role") != "user":
+            continue
+        previous = chat_history[turn - 1] if turn > 0 and chat_history[turn - 1].get("role") == "assistant" else None
+        found = turn_evidence(str(previous.get("content") or "") if previous else None, str(message.get("content") or ""))
+        for name, (strength, values) in found.items():
+            # Later messages replace earlier ones
+            evidence[name] = ((turn, strength), values)
+
+    result = SlotExtraction()
+    for name in USER_INFO_FIELDS:
+        if name not in evidence:
+            continue
+        values = evidence[name][1]
+        if len(values) == 1:
+            result.values[name] = next(iter(values))
+        else:
+            result.ambiguous.add(name)
+    return result
+
+
+@dataclass
+class CollectionState:
+    """
+    Compact state of an information collection conversation, updated after each turn.
+
+    `confirmed` holds the valid value the user gave for a field, `invalid` the
+    last reply to a question about a field that didn't validate; every other
+    field is pending. `unparsed` keeps, verbatim, the latest replies that no
+    rule could tie to a field (e.g. answers to a request for several fields),
+    so the model still sees them once the messages are trimmed.
+    """
+    confirmed: Dict[str, Any] = field(default_factory=dict)
+    invalid: Dict[str, str] = field(default_factory=dict)
+    unparsed: List[str] = field(default_factory=list)
+    turns: int = 0
+
+    @property
+    def pending(self) -> List[str]:
+        return [name for name in USER_INFO_FIELDS if name not in self.confirmed and name not in self.invalid]
+
+    def update(self, previous: Optional[str], message: str) -> "CollectionState":
+        """Apply one user message, given the assistant message before it."""
+        self.turns += 1
+        evidence = turn_evidence(previous, message)
+        for name, (_, values) in evidence.items():
+            self.invalid.pop(name, None)
+            if len(values) == 1:
+                self.confirmed[name] = next(iter(values))
+            else:
+                # Two values at once: ask again
+                self.confirmed.pop(name, None)
+        asked = asked_fields(previous) if previous else set()
+        text = message.strip()
+        if evidence or not text or text.endswith("?") or is_confirmation(text):
+            return self
+        if len(asked) == 1:
+            # A reply that states nothing usable about the asked field, nor any other
+            name = next(iter(asked))
+            self.invalid[name] = text[:40]
+            self.confirmed.pop(name, None)
+        else:
+            self.unparsed = [*self.unparsed, text][-MAX_UNPARSED_REPLIES:]
+        return self
+
+    @classmethod
+    def from_history(cls, chat_history: List[Dict[str, str]]) -> "CollectionState":
+        state = cls()
+        previous = None
+        for message in chat_history:
+            content = str(message.get("content") or "")
+            if message.get("role") == "user":
+                state.update(previous, content)
+                previous = None
+            elif message.get("role") == "assistant":
+                previous = content
+        return state
+
+    def to_record(self) -> Dict[str, Any]:
+        return {"confirmed": self.confirmed, "invalid": self.invalid, "unparsed": self.unparsed, "turns": self.turns}
+
+    @classmethod
+    def from_record(cls, record: Optional[Dict[str, Any]]) -> "CollectionState":
+        record = record or {}
+        return cls(confirmed=dict(record.get("confirmed") or {}), invalid=dict(record.get("invalid") or {}),
+                   unparsed=list(record.get("unparsed") or []), turns=int(record.get("turns") or 0))
@@ -5,41 +5,164 @@ This module handles all interactions with Azure OpenAI services, including
 information collection and Q&A functionality.
 """
 
-import os
-from typing import Dict, Any, List
-from openai import AzureOpenAI
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional
 import json
+import os
+import re
 from dotenv import load_dotenv
 
+from core.http_clients import create_azure_clients
+from core.llm_limiter import LLMConcurrencyLimiter, LLMOverloadedError, llm_limiter
+from core.logging_config import get_logger
+from core.model_router import ModelRouter, model_router
+from core.monitoring import USER_INFO_EXTRACTIONS, USER_INFO_REPROMPTS, record_token_usage
+from core.resilience import ResilientLLMCaller, llm_caller
+from core.slot_extraction import CollectionState, SlotExtraction, asked_fields, extract_slots
+from core.validators import USER_INFO_FIELDS, invalid_reply, normalize_field
+
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("user_info_agent")
 
-# Azure OpenAI Configuration
-AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.environ.get("AZURE_OPENAI_KEY")
-AZURE_OPENAI_API_VERSION = os.environ.get("AZURE_API_VERSION")
 
 # Model names
 GPT_MODEL_NAME = "gpt-4o"
 GPT_MINI_MODEL_NAME = "gpt-4o-mini"
 EMBEDDING_MODEL_NAME = "text-embedding-ada-002"
 
+# Extract the user information with local rules and ask the LLM only for the fields they can't settle
+USER_INFO_LOCAL_EXTRACTION = os.environ.get("USER_INFO_LOCAL_EXTRACTION", "true").lower() == "true"
+
+# Messages of the conversation sent verbatim on information collection turns; older ones are
+# replaced by the collection state (confirmed, pending and invalid fields). 0 sends the whole history
+USER_INFO_HISTORY_MESSAGES = int(os.environ.get("USER_INFO_HISTORY_MESSAGES", "6"))
+
+# Check the reply to the asked field locally first; clearly invalid replies are re-asked from a
+# template without calling the LLM
+USER_INFO_PREVALIDATION = os.environ.get("USER_INFO_PREVALIDATION", "true").lower() == "true"
+# Require a valid Israeli ID check digit. Made-up IDs such as 123456789 fail it; demos and benchmarks
+# use 123456782, which passes, or turn the check off
+USER_INFO_ID_CHECK_DIGIT = os.environ.get("USER_INFO_ID_CHECK_DIGIT", "true").lower() == "true"
+
+# Re-prompts for the clearly invalid replies, by rule; each ends with the question about the field
+REPROMPTS = {
+    "english": {
+        "nine_digits": "The {label} must be exactly 9 digits. Could you please enter your {label} again?",
+        "check_digit": "This ID number isn't valid (its check digit doesn't match). Could you please check it and "
+                       "enter your ID number again?",
+        "age_range": "Age must be a number between 0 and 120. How old are you?",
+        "gender": "Please answer Male or Female. What is your gender?",
+        "hmo_name": "We support Maccabi, Meuhedet and Clalit members. Which HMO are you a member of?",
+        "membership_tier": "The membership tier is Gold, Silver or Bronze. What is your membership tier?",
+        "letters_only": "Names may contain letters only. Could you please enter your {label} again?",
+    },
+    "hebrew": {
+        "nine_digits": "{label} חייב להכיל בדיוק 9 ספרות. מה {label} שלך?",
+        "check_digit": "מספר הזהות אינו תקין (ספרת הביקורת אינה מתאימה). מה מספר הזהות שלך?",
+        "age_range": "הגיל צריך להיות מספר בין 0 ל-120. מה גילך?",
+        "gender": "אנא ענה זכר או נקבה. מה המין שלך?",
+        "hmo_name": "אנו תומכים בחברי מכבי, מאוחדת וכללית. באיזו קופת חולים אתה חבר?",
+        "membership_tier": "דרגת החברות היא זהב, כסף או ארד. מה דרגת החברות שלך?",
+        "letters_only": "השם יכול להכיל אותיות בלבד. מה {label}?",
+    },
+}
+REPROMPT_LABELS = {
+    "english": {"id_number": "ID number", "hmo_card_number": "HMO card number", "first_name": "first name",
+                "last_name": "last name"},
+    "hebrew": {"id_number": "מספר הזהות", "hmo_card_number": "מספר כרטיס קופת החולים", "first_name": "שמך הפרטי",
+               "last_name": "שם משפחתך"},
+}
+
+# Value types shown in the JSON format of the extraction prompt
+EXTRACTION_FIELD_TYPES = {field: "number" if field == "age" else "string" for field in USER_INFO_FIELDS}
+
+# Structured collection turns: every turn returns the reply, the fields collected so far and a
+# confirmed flag as one JSON object, so the confirmation needs no separate extraction call
+USER_INFO_STRUCTURED_TURNS = os.environ.get("USER_INFO_STRUCTURED_TURNS", "false").lower() == "true"
+
+STRUCTURED_TURN_INSTRUCTIONS = """
+Respond with a JSON object only, in this format:
+{
+    "reply": "your message to the user, in the language of the conversation",
+    "confirmed": true only when the user has just approved the summary of all the details, otherwise false,
+    "fields": {
+""" + ",\n".join(f'        "{field}": {EXTRACTION_FIELD_TYPES[field]} or null' for field in USER_INFO_FIELDS) + """
+    }
+}
+"fields" holds every detail the user has given so far (null for the ones still missing), with the corrections applied.
+When "confirmed" is true, "reply" is the confirmation sentence above."""
+
 # Confirmation Phases
 CONFIRM_PHASES = {
     "hebrew": "כל הפרטים נרשמו בהצלחה",
     "english": "Thank you for confirming all the details collected successfully"
 }
 
-class UserInfoCollector:
+class ReplyStreamDecoder:
+    """Decodes the "reply" string out of a streamed structured collection turn as it arrives"""
+
+    _REPLY_START = re.compile(r'"reply"\s*:\s*"')
+
     def __init__(self):
+        self.buffer = ""
+        self.position: Optional[int] = None
+        self.finished = False
+
+    def feed(self, delta: str) -> str:
+        """Add a chunk of the JSON output; returns the reply text it completes"""
+        self.buffer += delta
+        if self.finished:
+            return ""
+        if self.position is None:
+            match = self._REPLY_START.search(self.buffer)
+            if not match:
+                return ""
+            self.position = match.end()
+        end = index = self.position
+        while index < len(self.buffer):
+            char = self.buffer[index]
+            if char == '"':
+                self.finished = True
+                break
+            if char == "\\":
+                # Wait for the whole escape sequence
+                length = 6 if self.buffer[index + 1:index + 2] == "u" else 2
+                if index + length > len(self.buffer):
+                    break
+                index += length
+            else:
+                index += 1
+            end = index
+        segment = self.buffer[self.position:end]
+        if not self.finished and re.search(r"\\u[dD][89abAB][0-9a-fA-F]{2}$", segment):
+            # Keep the first half of a surrogate pair until the second one arrives
+            end -= 6
+            segment = segment[:-6]
+        text = json.loads('"' + segment + '"')
+        self.position = end
+        return text
+
+
+class UserInfoCollector:
+    def __init__(self, limiter: Optional[LLMConcurrencyLimiter] = None,
+                 enable_local_extraction: Optional[bool] = None, history_messages: Optional[int] = None,
+                 structured_turns: Optional[bool] = None, prevalidation: Optional[bool] = None,
+                 router: Optional[ModelRouter] = None):
         """Initialize Azure OpenAI client with credentials"""
-        self.client = AzureOpenAI(
-            api_key=AZURE_OPENAI_API_KEY,
-            api_version=AZURE_OPENAI_API_VERSION,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        )
+        # Bounds concurrent LLM calls together with the other services of the process
+        self.limiter = limiter or llm_limiter
+        # Deadlines, retries, hedging and the circuit breaker around every completion call
+        self.caller = llm_caller if self.limiter is llm_limiter else ResilientLLMCaller(self.limiter)
+        # Sync and async (for the FastAPI backend) clients on the process-wide connection pools
+        self.client, self.async_client = create_azure_clients()
         self.deployment_name = GPT_MODEL_NAME
+        # Picks gpt-4o or gpt-4o-mini per turn type and escalates rejected output
+        self.router = router or model_router
+        self.local_extraction = USER_INFO_LOCAL_EXTRACTION if enable_local_extraction is None else enable_local_extraction
+        self.history_messages = USER_INFO_HISTORY_MESSAGES if history_messages is None else history_messages
+        self.structured_turns = USER_INFO_STRUCTURED_TURNS if structured_turns is None else structured_turns
+        self.prevalidation = USER_INFO_PREVALIDATION if prevalidation is None else prevalidation
 
     def get_welcome_message(self, language: str) -> str:
         """Get the welcome message based on language"""
@@ -78,6 +201,14 @@ Let's begin! What's your first name?""",
         }
         return messages.get(language, messages["english"])
 
+    def get_qa_transition_message(self, language: str) -> str:
+        """Get the message shown once the collected details are confirmed"""
+        messages = {
+            "english": "Great! Your information has been confirmed. You can now ask questions about medical services.",
+            "hebrew": "מצוין! המידע שלך אושר. כעת תוכל לשאול שאלות על שירותים רפואיים."
+        }
+        return messages.get(language, messages["english"])
+
     def get_information_collection_prompt(self, language: str) -> str:
         """Get the appropriate prompt for information collection based on language"""
         prompts = {
@@ -114,50 +245,300 @@ Once approved response by: "Thank you for confirming all the details collected s
         }
         return prompts.get(language, prompts["english"])
 
-    def process_user_input(self, user_input: str, chat_history: List[Dict[str, str]], language: str) -> Dict[str, Any]:
+    def process_user_input(self, user_input: str, chat_history: List[Dict[str, str]], language: str,
+                           state: Optional[CollectionState] = None) -> Dict[str, Any]:
         """Process user input and return appropriate response"""
-        messages = [
-            {"role": "system", "content": self.get_information_collection_prompt(language)},
-            *chat_history,
-            {"role": "user", "content": user_input}
-        ]
-
+        reprompt = self._prevalidate(user_input, chat_history, language)
+        if reprompt is not None:
+            return reprompt
+        state = state if state is not None else CollectionState.from_history(chat_history)
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                temperature=0,
-                max_tokens=800
-            )
-            
-            content = response.choices[0].message.content
-
-            # Check if this is a validation response
-            is_valid = CONFIRM_PHASES.get(language).strip() in content.strip()
-            
+            response = self.router.call(self.caller, "process_input", self._turn_type(state), lambda model, timeout: self.client.chat.completions.create(
+                **self._collection_kwargs(user_input, chat_history, language, state, model), timeout=timeout
+            ), self._collection_check(state, language))
+            record_token_usage("process_input", response.usage)
+            return self._collection_response(response.choices[0].message.content, language)
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
             return {
-                "content": content,
-                "role": "assistant",
-                "is_validated": str(is_valid)
+                "content": f"Error processing request: {str(e)}",
+                "role": "assistant"
             }
+
+    async def aprocess_user_input(self, user_input: str, chat_history: List[Dict[str, str]], language: str,
+                                  state: Optional[CollectionState] = None) -> Dict[str, Any]:
+        """Async version of process_user_input, built on the async Azure OpenAI client"""
+        reprompt = self._prevalidate(user_input, chat_history, language)
+        if reprompt is not None:
+            return reprompt
+        state = state if state is not None else CollectionState.from_history(chat_history)
+        try:
+            response = await self.router.acall(self.caller, "process_input", self._turn_type(state), lambda model, timeout: self.async_client.chat.completions.create(
+                **self._collection_kwargs(user_input, chat_history, language, state, model), timeout=timeout
+            ), self._collection_check(state, language))
+            record_token_usage("process_input", response.usage)
+            return self._collection_response(response.choices[0].message.content, language)
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             return {
                 "content": f"Error processing request: {str(e)}",
                 "role": "assistant"
             }
 
+    async def astream_user_input(self, user_input: str, chat_history: List[Dict[str, str]], language: str,
+                                 state: Optional[CollectionState] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an information collection turn as it is generated.
+
+        Yields {"type": "token", "content": ...} events followed by a final
+        {"type": "done", ...} event with the same fields as process_user_input.
+        The confirmation check runs on the assembled reply. With structured
+        turns the tokens are the "reply" string decoded out of the JSON.
+        """
+        reprompt = self._prevalidate(user_input, chat_history, language)
+        if reprompt is not None:
+            yield {"type": "token", "content": reprompt["content"]}
+            yield {"type": "done", **reprompt}
+            return
+        state = state if state is not None else CollectionState.from_history(chat_history)
+        parts = []
+        reply_decoder = ReplyStreamDecoder() if self.structured_turns else None
+        try:
+            # Routed, but not escalated: the tokens are already on screen
+            model = self.router.route("process_input", self._turn_type(state))
+            # The slot is held until the stream is fully consumed
+            async with self.caller.astream("process_input", model, lambda timeout: self.async_client.chat.completions.create(
+                **self._collection_kwargs(user_input, chat_history, language, state, model), stream=True,
+                stream_options={"include_usage": True}, timeout=timeout
+            )) as stream:
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None):
+                        record_token_usage("process_input", chunk.usage)
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        text = reply_decoder.feed(delta) if reply_decoder else delta
+                        if text:
+                            yield {"type": "token", "content": text}
+            result = self._collection_response("".join(parts), language)
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            error_message = f"Error processing request: {str(e)}"
+            yield {"type": "token", "content": error_message}
+            result = {"content": error_message, "role": "assistant"}
+        yield {"type": "done", **result}
+
+    def _prevalidate(self, user_input: str, chat_history: List[Dict[str, str]], language: str) -> Optional[Dict[str, Any]]:
+        """A templated re-prompt when the reply to the asked field is clearly invalid, else None (ask the LLM)"""
+        if not self.prevalidation:
+            return None
+        history = list(chat_history)
+        # The Streamlit client appends the reply to the history before sending it
+        if history and history[-1].get("role") == "user" and \
+                str(history[-1].get("content") or "").strip() == user_input.strip():
+            history.pop()
+        if not history or history[-1].get("role") != "assistant":
+            return None
+        asked = asked_fields(str(history[-1].get("content") or ""))
+        if len(asked) != 1:
+            return None
+        field = next(iter(asked))
+        reason = invalid_reply(field, user_input, check_digit=USER_INFO_ID_CHECK_DIGIT)
+        if reason is None:
+            return None
+        USER_INFO_REPROMPTS.labels(field=field, reason=reason).inc()
+        templates = REPROMPTS.get(language, REPROMPTS["english"])
+        labels = REPROMPT_LABELS.get(language, REPROMPT_LABELS["english"])
+        content = templates[reason].format(label=labels.get(field, field))
+        return {"content": content, "role": "assistant", "is_validated": "False"}
+
+    def get_collection_state_message(self, state: CollectionState, language: str) -> str:
+        """Describe the collection state for the model, in place of the omitted earlier messages"""
+        headers = {
+            "english": ("Earlier messages are omitted. Details collected so far:", "Invalid answers (ask again):",
+                        "Still needed:", "Earlier user replies (may answer details still needed):", "none"),
+            "hebrew": ("ההודעות הקודמות הושמטו. הפרטים שנאספו עד כה:", "תשובות לא תקינות (יש לשאול שוב):",
+                       "פרטים חסרים:", "תשובות קודמות של המשתמש (ייתכן שעונות על פרטים חסרים):", "אין"),
+        }
+        collected, invalid, pending, unparsed, none = headers.get(language, headers["english"])
+        lines = [
+            f"{collected} " + ("; ".join(f"{name}: {value}" for name, value in state.confirmed.items()) or none),
+            f"{invalid} " + ("; ".join(f'{name}: "{text}"' for name, text in state.invalid.items()) or none),
+            f"{pending} " + (", ".join(state.pending) or none),
+        ]
+        if state.unparsed and state.pending:
+            lines.append(f"{unparsed} " + "; ".join(f'"{text}"' for text in state.unparsed))
+        return "\n".join(lines)
+
+    def _collection_kwargs(self, user_input: str, chat_history: List[Dict[str, str]], language: str,
+                           state: Optional[CollectionState] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Completion arguments for an information collection turn.
+
+        Only the last `history_messages` messages are sent; when older ones are
+        dropped, the collection state stands in for them, so the prompt size
+        stays about the same however long the conversation gets.
+        """
+        system_prompt = self.get_information_collection_prompt(language)
+        if self.structured_turns:
+            system_prompt += STRUCTURED_TURN_INSTRUCTIONS
+        messages = [{"role": "system", "content": system_prompt}]
+        recent = chat_history
+        if self.history_messages and len(chat_history) > self.history_messages:
+            recent = chat_history[-self.history_messages:]
+            if state is None:
+                state = CollectionState.from_history(chat_history)
+            messages.append({"role": "system", "content": self.get_collection_state_message(state, language)})
+        messages += [*self._chat_messages(recent), {"role": "user", "content": user_input}]
+        kwargs = {
+            "model": model or self.deployment_name,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": 800
+        }
+        if self.structured_turns:
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    @staticmethod
+    def _chat_messages(chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Chat history as OpenAI messages; clients may send extra fields per message (e.g. is_validated)"""
+        return [{"role": message["role"], "content": message["content"]} for message in chat_history]
+
+    @staticmethod
+    def _turn_type(state: CollectionState) -> str:
+        """Routing turn type: "confirm" once every detail is collected, "collect" before"""
+        return "collect" if state.pending or state.invalid else "confirm"
+
+    def _collection_check(self, state: CollectionState, language: str) -> Callable[[Any], Optional[str]]:
+        """Output check of a routed collection turn: the reason to escalate it, or None"""
+        def check(response: Any) -> Optional[str]:
+            choice = response.choices[0]
+            content = choice.message.content or ""
+            if not content.strip():
+                return "empty"
+            if choice.finish_reason == "length":
+                return "truncated"
+            if self.structured_turns:
+                structured = self._structured_collection_response(content, language)
+                if structured is None:
+                    return "invalid_json"
+                if structured["is_validated"] == "True" and "user_info" not in structured:
+                    return "invalid_fields"
+            elif CONFIRM_PHASES.get(language).strip() in content and (state.pending or state.invalid):
+                # Confirms although details are still missing
+                return "premature_confirmation"
+            return None
+        return check
+
+    def _collection_response(self, content: str, language: str) -> Dict[str, Any]:
+        """Build the response of an information collection turn"""
+        structured = self._structured_collection_response(content, language) if self.structured_turns else None
+        if structured is not None:
+            if "user_info" in structured:
+                USER_INFO_EXTRACTIONS.labels(result="structured_turn").inc()
+            return structured
+        # Check if this is a validation response
+        is_valid = CONFIRM_PHASES.get(language).strip() in content.strip()
+
+        return {
+            "content": content,
+            "role": "assistant",
+            "is_validated": str(is_valid)
+        }
+
+    def _structured_collection_response(self, content: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Build the response of a structured collection turn (None if the output isn't the expected JSON).
+
+        A confirmed turn whose fields all validate carries them as `user_info`,
+        so the caller can switch to Q&A without an extraction call; if some
+        don't, the caller falls back to extract_user_info.
+        """
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict) or not isinstance(data.get("reply"), str):
+            logger.warning("structured_turn_parse_error", content=content[:200])
+            return None
+        reply = data["reply"]
+        confirmed = data.get("confirmed") is True or CONFIRM_PHASES.get(language).strip() in reply
+        response = {"content": reply, "role": "assistant", "is_validated": str(confirmed)}
+        if confirmed:
+            fields = data.get("fields") if isinstance(data.get("fields"), dict) else {}
+            user_info = {field: normalize_field(field, fields.get(field)) for field in USER_INFO_FIELDS}
+            if all(value is not None for value in user_info.values()):
+                response["user_info"] = user_info
+        return response
+
     def extract_user_info(self, chat_history: List[Dict[str, str]], language: str) -> Dict[str, Any]:
         """Extract structured user information from chat history"""
+        local = self._local_extraction(chat_history)
+        if local is not None and local.complete:
+            return local.values
+        fields = local.missing if local is not None else list(USER_INFO_FIELDS)
+        try:
+            response = self.router.call(self.caller, "extract_user_info", "extract", lambda model, timeout: self.client.chat.completions.create(
+                **self._extraction_kwargs(chat_history, fields, model), timeout=timeout
+            ), self._extraction_check(fields))
+            record_token_usage("extract_user_info", response.usage)
+            return self._merge_extraction(local, self._parse_extraction(response.choices[0].message.content, fields))
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            logger.error("extract_user_info_error", error=str(e))
+            return {}
+
+    async def aextract_user_info(self, chat_history: List[Dict[str, str]], language: str) -> Dict[str, Any]:
+        """Async version of extract_user_info, built on the async Azure OpenAI client"""
+        local = self._local_extraction(chat_history)
+        if local is not None and local.complete:
+            return local.values
+        fields = local.missing if local is not None else list(USER_INFO_FIELDS)
+        try:
+            response = await self.router.acall(self.caller, "extract_user_info", "extract", lambda model, timeout: self.async_client.chat.completions.create(
+                **self._extraction_kwargs(chat_history, fields, model), timeout=timeout
+            ), self._extraction_check(fields))
+            record_token_usage("extract_user_info", response.usage)
+            return self._merge_extraction(local, self._parse_extraction(response.choices[0].message.content, fields))
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            logger.error("extract_user_info_error", error=str(e))
+            return {}
+
+    def _local_extraction(self, chat_history: List[Dict[str, str]]) -> Optional[SlotExtraction]:
+        """Rule-based extraction of the fields the conversation states unambiguously (None when disabled)"""
+        if not self.local_extraction:
+            return None
+        try:
+            local = extract_slots(chat_history)
+        except Exception as e:
+            logger.error("local_extraction_error", error=str(e))
+            return None
+        result = "local" if local.complete else "llm_partial" if local.values else "llm_full"
+        USER_INFO_EXTRACTIONS.labels(result=result).inc()
+        logger.debug("local_extraction", result=result, missing=local.missing)
+        return local
+
+    def _merge_extraction(self, local: Optional[SlotExtraction], extracted: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine the locally extracted fields with the ones the LLM returned"""
+        if local is None or not extracted:
+            return extracted
+        values = {field: local.values[field] for field in USER_INFO_FIELDS if field not in local.missing}
+        return {field: values[field] if field in values else extracted[field] for field in USER_INFO_FIELDS}
+
+    def _extraction_kwargs(self, chat_history: List[Dict[str, str]], fields: Optional[List[str]] = None,
+                           model: Optional[str] = None) -> Dict[str, Any]:
+        """Completion arguments for extracting user information (all fields by default) from the conversation"""
+        json_format = ",\n".join(f'    "{field}": "{EXTRACTION_FIELD_TYPES[field]}"' for field in fields or USER_INFO_FIELDS)
         system_prompt = """Extract user information from the conversation and return it in the following strict JSON format:
 {
-    "first_name": "string",
-    "last_name": "string",
-    "id_number": "string",
-    "gender": "string",
-    "age": "number",
-    "hmo_name": "string",
-    "hmo_card_number": "string",
-    "membership_tier": "string"
+""" + json_format + """
 }
 
 IMPORTANT:
@@ -169,31 +550,37 @@ IMPORTANT:
 
         messages = [
             {"role": "system", "content": system_prompt},
-            *chat_history,
+            *self._chat_messages(chat_history),
             {"role": "user", "content": "Extract the information and return only JSON"}
         ]
+        return {
+            "model": model or self.deployment_name,
+            "messages": messages,
+            "temperature": 0,
+            "max_tokens": 800,
+            "response_format": {"type": "json_object"}  # Force JSON response format
+        }
+
+    def _extraction_check(self, fields: List[str]) -> Callable[[Any], Optional[str]]:
+        """Output check of a routed extraction: the reason to escalate it, or None"""
+        def check(response: Any) -> Optional[str]:
+            parsed = self._parse_extraction(response.choices[0].message.content, fields)
+            if not parsed:
+                return "invalid_json"
+            if any(parsed[field] is not None and normalize_field(field, parsed[field]) is None for field in fields):
+                return "invalid_fields"
+            return None
+        return check
 
+    def _parse_extraction(self, content: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Parse the extraction response to get structured data"""
         try:
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                temperature=0,
-                max_tokens=800,
-                response_format={"type": "json_object"}  # Force JSON response format
-            )
-            
-            # Parse the response to get structured data
-            content = response.choices[0].message.content
-            try:
-                parsed_data = json.loads(content)
-                # Validate required fields
-                required_fields = ["first_name", "last_name", "id_number", "gender", 
-                                 "age", "hmo_name", "hmo_card_number", "membership_tier"]
-                if all(field in parsed_data for field in required_fields):
-                    return parsed_data
-                else:
-                    return {}
-            except json.JSONDecodeError:
+            parsed_data = json.loads(content)
+            # Validate required fields
+            required_fields = fields or USER_INFO_FIELDS
+            if all(field in parsed_data for field in required_fields):
+                return parsed_data
+            else:
                 return {}
-        except Exception as e:
-            return {} 
\ No newline at end of file
+        except json.JSONDecodeError:
+            return {}
@@ -0,0 +1,136 @@
+"""
+Validators Module
+
+Local normalization and validation of the user information fields, following
+the rules of `core.models.FormValidation`:
+
+- First and last name: letters only (Hebrew or English)
+- ID number and HMO card number: 9 digits
+- Gender: Male/Female
+- Age: number between 0 and 120
+- HMO name: Maccabi/Meuhedet/Clalit (English or Hebrew, as in HMO_MAPPING)
+- Membership tier: Gold/Silver/Bronze (English or Hebrew, as in TIER_MAPPING)
+
+Each normalizer returns the canonical value (English names for gender, HMO and
+tier, an int for the age, digits only for the numbers) or None when the value
+is not valid. `invalid_reply` tells whether a reply to a question about a field
+clearly breaks its rule, so it can be re-asked without the LLM.
+"""
+
+import re
+from typing import Any, Callable, Dict, Optional
+
+from core.constants import HMO_MAPPING, TIER_MAPPING
+
+USER_INFO_FIELDS = ("first_name", "last_name", "id_number", "gender", "age", "hmo_name", "hmo_card_number",
+                    "membership_tier")
+
+_NAME_RE = re.compile(r"^[A-Za-zא-ת][A-Za-zא-ת'\- ]*$")
+_DIGIT_SEPARATORS_RE = re.compile(r"[\s\-]")
+_DIGITS_ONLY_RE = re.compile(r"[\d\s\-]+")
+_AGE_ONLY_RE = re.compile(r"(-?\d+)\s*(?:years? old|שנים)?", re.IGNORECASE)
+_SINGLE_WORD_RE = re.compile(r"[A-Za-zא-ת]+")
+
+# Hebrew HMO/tier name -> canonical English name
+_HMO_NAMES = {hebrew: english for english, hebrew in HMO_MAPPING.items() if english != hebrew}
+_TIER_NAMES = {hebrew: english for english, hebrew in TIER_MAPPING.items() if english != hebrew}
+# Common spellings besides the canonical ones
+_HMO_ALIASES = {"maccabi": "Maccabi", "makabi": "Maccabi", "clalit": "Clalit", "klalit": "Clalit",
+                "meuhedet": "Meuhedet", "meuchedet": "Meuhedet", "meuhadet": "Meuhedet",
+                **_HMO_NAMES}
+_TIER_ALIASES = {"gold": "Gold", "silver": "Silver", "bronze": "Bronze", **_TIER_NAMES}
+_GENDER_ALIASES = {"male": "Male", "m": "Male", "man": "Male", "זכר": "Male", "גבר": "Male",
+                   "female": "Female", "f": "Female", "woman": "Female", "נקבה": "Female", "אישה": "Female",
+                   "אשה": "Female"}
+
+
+def normalize_name(value: Any) -> Optional[str]:
+    text = " ".join(str(value or "").split())
+    if not text or len(text) > 40 or not _NAME_RE.match(text):
+        return None
+    return text
+
+
+def normalize_nine_digits(value: Any) -> Optional[str]:
+    digits = _DIGIT_SEPARATORS_RE.sub("", str(value or ""))
+    return digits if len(digits) == 9 and digits.isdigit() else None
+
+
+def normalize_gender(value: Any) -> Optional[str]:
+    return _GENDER_ALIASES.get(str(value or "").strip().lower())
+
+
+def normalize_age(value: Any) -> Optional[int]:
+    text = str(value if value is not None else "").strip()
+    if not text.isdigit():
+        return None
+    age = int(text)
+    return age if 0 <= age <= 120 else None
+
+
+def normalize_hmo(value: Any) -> Optional[str]:
+    return _HMO_ALIASES.get(str(value or "").strip().lower())
+
+
+def normalize_tier(value: Any) -> Optional[str]:
+    return _TIER_ALIASES.get(str(value or "").strip().lower())
+
+
+FIELD_NORMALIZERS: Dict[str, Callable[[Any], Optional[Any]]] = {
+    "first_name": normalize_name,
+    "last_name": normalize_name,
+    "id_number": normalize_nine_digits,
+    "gender": normalize_gender,
+    "age": normalize_age,
+    "hmo_name": normalize_hmo,
+    "hmo_card_number": normalize_nine_digits,
+    "membership_tier": normalize_tier,
+}
+
+
+def normalize_field(field: str, value: Any) -> Optional[Any]:
+    """The canonical value of a user information field, or None if it is not valid."""
+    return FIELD_NORMALIZERS[field](value)
+
+
+def israeli_id_check_digit_ok(digits: str) -> bool:
+    """Whether a 9-digit Israeli ID number has a valid check digit (Luhn-style weights 1, 2, 1, 2, ...)."""
+    total = 0
+    for i, digit in enumerate(digits):
+        product = int(digit) * (1 + i % 2)
+        total += product - 9 if product > 9 else product
+    return total % 10 == 0
+
+
+def invalid_reply(field: str, text: str, check_digit: bool = True) -> Optional[str]:
+    """
+    The rule a reply to a question about `field` clearly breaks, or None.
+
+    Only replies that are plainly an attempt at the field count: a bare number
+    for the numeric fields, a single word for gender, HMO and tier, a single
+    token with digits for the names. Anything else may be a question, a
+    correction or a value in other words, and is left to the LLM.
+    """
+    text = text.strip().rstrip(".!")
+    if field in ("id_number", "hmo_card_number"):
+        if not _DIGITS_ONLY_RE.fullmatch(text):
+            return None
+        digits = _DIGIT_SEPARATORS_RE.sub("", text)
+        if len(digits) != 9:
+            return "nine_digits"
+        if field == "id_number" and check_digit and not israeli_id_check_digit_ok(digits):
+            return "check_digit"
+        return None
+    if field == "age":
+        match = _AGE_ONLY_RE.fullmatch(text)
+        return "age_range" if match and normalize_age(match.group(1)) is None else None
+    if field in ("gender", "hmo_name", "membership_tier"):
+        if _SINGLE_WORD_RE.fullmatch(text) and normalize_field(field, text) is None:
+            # A Hebrew answer may carry a one-letter prefix ("במכבי")
+            if len(text) > 3 and text[0] in "והבלמש" and normalize_field(field, text[1:]) is not None:
+                return None
+            return field
+        return None
+    if field in ("first_name", "last_name"):
+        return "letters_only" if len(text.split()) == 1 and any(c.isdigit() for c in text) else None
+    return None
@@ -6,13 +6,14 @@ It communicates with the FastAPI backend microservice to handle the core logic.
 """
 
 import streamlit as st
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterator, List, Optional
 import json
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from dotenv import load_dotenv
 from core.logging_config import configure_logging, get_logger
-from core.monitoring import track_request, check_backend_health, start_metrics_server
+from core.monitoring import track_request, track_stream, check_backend_health, start_metrics_server
 import threading
 
 # Load environment variables
@@ -25,6 +26,21 @@ logger = get_logger("streamlit_app")
 # Configuration
 API_BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:8000")
 METRICS_PORT = int(os.environ.get("METRICS_PORT", "8001"))
+# Render answers token by token using the backend's streaming endpoints
+USE_STREAMING = os.environ.get("USE_STREAMING", "true").lower() == "true"
+# Keep the conversation on the backend (sessions API) and send only the new message each turn
+USE_SESSIONS = os.environ.get("USE_SESSIONS", "true").lower() == "true"
+# Keep-alive connections kept open to the backend per process
+API_HTTP_POOL_SIZE = int(os.environ.get("API_HTTP_POOL_SIZE", "10"))
+# Timeouts of the backend calls, so a slow backend can't freeze the UI. The read timeout is the
+# longest wait for a response (or between two chunks of a streamed one); keep it above the
+# backend's LLM_REQUEST_DEADLINE_SECONDS
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "45"))
+API_TIMEOUT = (API_CONNECT_TIMEOUT, API_READ_TIMEOUT)
+# The health check runs at most once per TTL per process, not on every rerun
+API_HEALTH_TIMEOUT = float(os.environ.get("API_HEALTH_TIMEOUT", "2"))
+API_HEALTH_CACHE_SECONDS = float(os.environ.get("API_HEALTH_CACHE_SECONDS", "15"))
 
 # Start metrics server in a separate thread
 metrics_thread = threading.Thread(target=start_metrics_server, args=(METRICS_PORT,))
@@ -47,6 +63,8 @@ if 'user_info' not in st.session_state:
     st.session_state.user_info = {}
 if 'is_qa_mode' not in st.session_state:
     st.session_state.is_qa_mode = False
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = None
 
 # Define text based on language
 texts = {
@@ -61,9 +79,11 @@ texts = {
         "qa_mode": "Q&A Mode",
         "info_mode": "Information Collection Mode",
         "connection_error": "Could not connect to the backend service. Please try again later.",
+        "timeout_error": "The backend service is taking too long to respond. Please try again.",
         "health_status": "System Health Status",
         "healthy": "System is healthy",
-        "unhealthy": "System is unhealthy"
+        "unhealthy": "System is unhealthy",
+        "session_expired": "Your session has expired. Please start again."
     },
     "hebrew": {
         "title": "צ'אטבוט שירותי רפואה",
@@ -76,35 +96,70 @@ texts = {
         "qa_mode": "מצב שאלות ותשובות",
         "info_mode": "מצב איסוף מידע",
         "connection_error": "לא ניתן להתחבר לשירות האחורי. אנא נסה שוב מאוחר יותר.",
+        "timeout_error": "השירות האחורי מגיב לאט מדי. אנא נסה שוב.",
         "health_status": "סטטוס בריאות המערכת",
         "healthy": "המערכת תקינה",
-        "unhealthy": "המערכת לא תקינה"
+        "unhealthy": "המערכת לא תקינה",
+        "session_expired": "פג תוקף השיחה. אנא התחל מחדש."
     }
 }
 
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One keep-alive session per process, shared by all reruns and browser sessions"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 def get_current_texts():
     """Get the current language texts"""
     return texts[st.session_state.language] if st.session_state.language else texts["english"]
 
+def history_message(response: Dict[str, Any]) -> Dict[str, str]:
+    """
+    The chat history entry of a response: only its role and content. Other fields
+    (is_validated, user_info, ...) would be resent to the backend with every turn and
+    break its validation of the history.
+    """
+    return {"role": response.get("role", "assistant"), "content": response["content"]}
+
+def request_error_text(error: requests.exceptions.RequestException) -> str:
+    """The message shown for a failed backend call"""
+    key = "timeout_error" if isinstance(error, requests.exceptions.Timeout) else "connection_error"
+    return get_current_texts()[key]
+
+@st.cache_data(ttl=API_HEALTH_CACHE_SECONDS, show_spinner=False)
+def get_backend_health() -> Dict[str, Any]:
+    """Backend health, checked at most once per API_HEALTH_CACHE_SECONDS for all reruns and browser sessions"""
+    return check_backend_health(API_BASE_URL, get_http_session(), timeout=API_HEALTH_TIMEOUT)
+
+@st.cache_data(show_spinner=False)
+def fetch_welcome_message(language: str) -> str:
+    """Welcome message of a language, fetched once per process (failures raise and are not cached)"""
+    response = get_http_session().get(f"{API_BASE_URL}/welcome-message/{language}", timeout=API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["message"]
+
 @track_request("welcome_message")
 def api_get_welcome_message(language: str) -> str:
     """Get welcome message from API"""
     try:
-        response = requests.get(f"{API_BASE_URL}/welcome-message/{language}")
-        if response.status_code == 200:
-            data = response.json()
-            logger.info("welcome_message_retrieved", language=language)
-            return data["message"]
-        else:
-            logger.error("welcome_message_error", 
-                        status_code=response.status_code, 
-                        response=response.text)
-            st.error(f"Error: {response.status_code} - {response.text}")
-            return "Sorry, couldn't get welcome message. Please try again."
+        message = fetch_welcome_message(language)
+        logger.info("welcome_message_retrieved", language=language)
+        return message
+    except requests.exceptions.HTTPError as e:
+        response = e.response
+        logger.error("welcome_message_error", 
+                    status_code=response.status_code, 
+                    response=response.text)
+        st.error(f"Error: {response.status_code} - {response.text}")
+        return "Sorry, couldn't get welcome message. Please try again."
     except requests.exceptions.RequestException as e:
         logger.error("welcome_message_connection_error", error=str(e))
         st.error(f"Connection error: {str(e)}")
-        return get_current_texts()["connection_error"]
+        return request_error_text(e)
 
 @track_request("process_input")
 def api_process_user_input(user_input: str, chat_history: List[Dict[str, str]], language: str) -> Dict[str, Any]:
@@ -115,7 +170,7 @@ def api_process_user_input(user_input: str, chat_history: List[Dict[str, str]],
             "chat_history": chat_history,
             "language": language
         }
-        response = requests.post(f"{API_BASE_URL}/process-input", json=payload)
+        response = get_http_session().post(f"{API_BASE_URL}/process-input", json=payload, timeout=API_TIMEOUT)
         if response.status_code == 200:
             logger.info("user_input_processed", language=language)
             return response.json()
@@ -128,7 +183,7 @@ def api_process_user_input(user_input: str, chat_history: List[Dict[str, str]],
     except requests.exceptions.RequestException as e:
         logger.error("process_input_connection_error", error=str(e))
         st.error(f"Connection error: {str(e)}")
-        return {"role": "assistant", "content": get_current_texts()["connection_error"]}
+        return {"role": "assistant", "content": request_error_text(e)}
 
 @track_request("extract_user_info")
 def api_extract_user_info(chat_history: List[Dict[str, str]], language: str) -> Dict[str, Any]:
@@ -138,7 +193,7 @@ def api_extract_user_info(chat_history: List[Dict[str, str]], language: str) ->
             "chat_history": chat_history,
             "language": language
         }
-        response = requests.post(f"{API_BASE_URL}/extract-user-info", json=payload)
+        response = get_http_session().post(f"{API_BASE_URL}/extract-user-info", json=payload, timeout=API_TIMEOUT)
         if response.status_code == 200:
             logger.info("user_info_extracted", language=language)
             return response.json()
@@ -161,7 +216,7 @@ def api_get_answer(user_info: Dict[str, Any], question: str) -> str:
             "user_info": user_info,
             "question": question
         }
-        response = requests.post(f"{API_BASE_URL}/get-answer", json=payload)
+        response = get_http_session().post(f"{API_BASE_URL}/get-answer", json=payload, timeout=API_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             logger.info("answer_retrieved")
@@ -175,12 +230,175 @@ def api_get_answer(user_info: Dict[str, Any], question: str) -> str:
     except requests.exceptions.RequestException as e:
         logger.error("get_answer_connection_error", error=str(e))
         st.error(f"Connection error: {str(e)}")
-        return get_current_texts()["connection_error"]
+        return request_error_text(e)
+
+def _iter_sse_events(response: requests.Response) -> Iterator[tuple]:
+    """Parse a server-sent events response into (event, data) pairs"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def _stream_tokens(path: str, payload: Dict[str, Any], final: Dict[str, Any], log_event: str,
+                   on_http_error: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """
+    POST to a streaming endpoint and yield answer tokens; the done event is stored in `final`.
+    The status of a failed request is passed to `on_http_error`, not stored in `final`. An
+    error event ends the stream with its detail, which becomes the assistant's reply.
+    """
+    try:
+        with get_http_session().post(f"{API_BASE_URL}{path}", json=payload, stream=True,
+                                      timeout=API_TIMEOUT) as response:
+            if response.status_code != 200:
+                status_code = response.status_code
+                logger.error(f"{log_event}_error",
+                            status_code=status_code,
+                            response=response.text)
+                st.error(f"Error: {status_code} - {response.text}")
+                final.update({"role": "assistant", "content": get_current_texts()["error"]})
+                if on_http_error is not None:
+                    on_http_error(status_code)
+                yield final["content"]
+                return
+            streamed = False
+            for event, data in _iter_sse_events(response):
+                if event == "token":
+                    streamed = True
+                    yield data["content"]
+                elif event == "done":
+                    final.update(data)
+                elif event == "error":
+                    # Shown as the assistant's reply, so the chat history keeps its user/assistant pairs
+                    detail = data.get("detail") or get_current_texts()["error"]
+                    logger.error(f"{log_event}_stream_error", detail=detail)
+                    st.error(f"Error: {detail}")
+                    final["role"] = "assistant"
+                    yield f"\n\n{detail}" if streamed else detail
+                    return
+        logger.info(log_event)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"{log_event}_connection_error", error=str(e))
+        st.error(f"Connection error: {str(e)}")
+        final.update({"role": "assistant", "content": request_error_text(e)})
+        yield final["content"]
+
+@track_stream("process_input_stream")
+def api_stream_user_input(user_input: str, chat_history: List[Dict[str, str]], language: str,
+                          final: Dict[str, Any]) -> Iterator[str]:
+    """Stream the response to user input via API; the final response is stored in `final`"""
+    payload = {
+        "user_input": user_input,
+        "chat_history": chat_history,
+        "language": language
+    }
+    yield from _stream_tokens("/process-input/stream", payload, final, "user_input_processed")
+
+@track_stream("get_answer_stream")
+def api_stream_answer(user_info: Dict[str, Any], question: str, final: Dict[str, Any]) -> Iterator[str]:
+    """Stream an answer via API; the final event is stored in `final`"""
+    payload = {
+        "user_info": user_info,
+        "question": question
+    }
+    yield from _stream_tokens("/get-answer/stream", payload, final, "answer_retrieved")
+
+@track_request("create_session")
+def api_create_session(language: str) -> str:
+    """Start a server-side session; stores its id and returns the welcome message"""
+    try:
+        response = get_http_session().post(f"{API_BASE_URL}/sessions", json={"language": language},
+                                           timeout=API_TIMEOUT)
+        if response.status_code == 200:
+            data = response.json()
+            st.session_state.session_id = data["session_id"]
+            logger.info("session_created", language=language)
+            return data["message"]
+        else:
+            logger.error("create_session_error",
+                        status_code=response.status_code,
+                        response=response.text)
+            st.error(f"Error: {response.status_code} - {response.text}")
+            return "Sorry, couldn't get welcome message. Please try again."
+    except requests.exceptions.RequestException as e:
+        logger.error("create_session_connection_error", error=str(e))
+        st.error(f"Connection error: {str(e)}")
+        return request_error_text(e)
+
+@track_request("session_message")
+def api_send_session_message(session_id: str, message: str) -> Dict[str, Any]:
+    """Send the next message of a server-side session via API"""
+    try:
+        response = get_http_session().post(f"{API_BASE_URL}/sessions/{session_id}/messages",
+                                           json={"message": message}, timeout=API_TIMEOUT)
+        if response.status_code == 200:
+            logger.info("session_message_processed")
+            return response.json()
+        else:
+            logger.error("session_message_error",
+                        status_code=response.status_code,
+                        response=response.text)
+            st.error(f"Error: {response.status_code} - {response.text}")
+            return {"role": "assistant", "content": get_current_texts()["error"],
+                    "status_code": response.status_code}
+    except requests.exceptions.RequestException as e:
+        logger.error("session_message_connection_error", error=str(e))
+        st.error(f"Connection error: {str(e)}")
+        return {"role": "assistant", "content": request_error_text(e)}
+
+@track_stream("session_message_stream")
+def api_stream_session_message(session_id: str, message: str, final: Dict[str, Any],
+                                on_http_error: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """Stream the reply to the next message of a server-side session; the done event is stored in `final`"""
+    yield from _stream_tokens(f"/sessions/{session_id}/messages/stream", {"message": message},
+                              final, "session_message_processed", on_http_error)
+
+def handle_session_message(prompt: str):
+    """Send a chat message through the sessions API and render the reply"""
+    was_qa_mode = st.session_state.is_qa_mode
+    if USE_STREAMING:
+        response, failed_status = {}, []
+        with st.chat_message("assistant"):
+            streamed = st.write_stream(api_stream_session_message(st.session_state.session_id, prompt, response,
+                                                                  failed_status.append))
+        response.setdefault("role", "assistant")
+        response.setdefault("content", streamed)
+        status_code = failed_status[0] if failed_status else 200
+    else:
+        response = api_send_session_message(st.session_state.session_id, prompt)
+        status_code = response.pop("status_code", 200)
+
+    if status_code == 404:
+        # The backend dropped the session (TTL or restart); start over with a new one
+        st.warning(get_current_texts()["session_expired"])
+        st.session_state.language = None
+        st.session_state.chat_history = []
+        st.session_state.user_info = {}
+        st.session_state.is_qa_mode = False
+        st.session_state.session_id = None
+        return
+
+    st.session_state.is_qa_mode = response.get("is_qa_mode", was_qa_mode)
+    st.session_state.user_info = response.get("user_info", st.session_state.user_info)
+    if st.session_state.is_qa_mode and not was_qa_mode:
+        logger.info("transitioned_to_qa_mode")
+    st.session_state.chat_history.append(history_message(response))
+    # A streamed reply is already on screen, except for the transition message that replaces the confirmation
+    if not USE_STREAMING or st.session_state.is_qa_mode != was_qa_mode:
+        with st.chat_message("assistant"):
+            st.write(response["content"])
 
 def display_health_status():
     """Display the health status of the system"""
     current_texts = get_current_texts()
-    health_status = check_backend_health(API_BASE_URL)
+    health_status = get_backend_health()
     
     st.sidebar.title(current_texts["health_status"])
     if health_status["status"] == "healthy":
@@ -209,6 +427,7 @@ def display_language_selection():
             if st.button("English", use_container_width=True):
                 st.session_state.language = "english"
                 st.session_state.chat_history = []
+                st.session_state.session_id = None
                 logger.info("language_selected", language="english")
                 st.rerun()
 
@@ -216,6 +435,7 @@ def display_language_selection():
             if st.button("עברית", use_container_width=True):
                 st.session_state.language = "hebrew"
                 st.session_state.chat_history = []
+                st.session_state.session_id = None
                 logger.info("language_selected", language="hebrew")
                 st.rerun()
 
@@ -234,7 +454,10 @@ def display_chat_interface():
     # If chat history is empty, display welcome message
     if not st.session_state.chat_history:
         if not st.session_state.is_qa_mode:
-            welcome_message = api_get_welcome_message(st.session_state.language)
+            if USE_SESSIONS:
+                welcome_message = api_create_session(st.session_state.language)
+            else:
+                welcome_message = api_get_welcome_message(st.session_state.language)
             st.session_state.chat_history.append({"role": "assistant", "content": welcome_message})
             with st.chat_message("assistant"):
                 st.write(welcome_message)
@@ -256,13 +479,23 @@ def display_chat_interface():
         with st.chat_message("user"):
             st.write(prompt)
 
-        if st.session_state.is_qa_mode:
+        if USE_SESSIONS and st.session_state.session_id:
+            # The backend keeps the history and user info; only the new message is sent
+            handle_session_message(prompt)
+        elif st.session_state.is_qa_mode:
             # Get answer from Q&A service
             if st.session_state.user_info:
-                response = api_get_answer(st.session_state.user_info, prompt)
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
-                with st.chat_message("assistant"):
-                    st.write(response)
+                if USE_STREAMING:
+                    with st.chat_message("assistant"):
+                        response = st.write_stream(
+                            api_stream_answer(st.session_state.user_info, prompt, {})
+                        )
+                    st.session_state.chat_history.append({"role": "assistant", "content": response})
+                else:
+                    response = api_get_answer(st.session_state.user_info, prompt)
+                    st.session_state.chat_history.append({"role": "assistant", "content": response})
+                    with st.chat_message("assistant"):
+                        st.write(response)
             else:
                 error_msg = "Please complete the information collection first."
                 st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
@@ -270,16 +503,32 @@ def display_chat_interface():
                     st.write(error_msg)
         else:
             # Get assistant response from API
-            response = api_process_user_input(
-                prompt,
-                st.session_state.chat_history,
-                st.session_state.language
-            )
+            if USE_STREAMING:
+                # Render the reply while it is generated; the validation flag arrives with the done event
+                response = {}
+                with st.chat_message("assistant"):
+                    streamed = st.write_stream(api_stream_user_input(
+                        prompt,
+                        st.session_state.chat_history,
+                        st.session_state.language,
+                        response
+                    ))
+                response.setdefault("role", "assistant")
+                response.setdefault("content", streamed)
+                if response.get("is_validated") != "True":
+                    st.session_state.chat_history.append(history_message(response))
+                    return
+            else:
+                response = api_process_user_input(
+                    prompt,
+                    st.session_state.chat_history,
+                    st.session_state.language
+                )
             
             # Check if this is a validation response
             if "is_validated" in response and response["is_validated"] == "True":
-                # Extract user info and transition to Q&A mode
-                st.session_state.user_info = api_extract_user_info(
+                # Extract user info (unless the structured turn returned it) and transition to Q&A mode
+                st.session_state.user_info = response.get("user_info") or api_extract_user_info(
                     st.session_state.chat_history,
                     st.session_state.language
                 )
@@ -293,7 +542,7 @@ def display_chat_interface():
                 response["content"] = transition_msg.get(st.session_state.language, transition_msg["english"])
 
             # Add response to chat history and display it
-            st.session_state.chat_history.append(response)
+            st.session_state.chat_history.append(history_message(response))
             with st.chat_message("assistant"):
                 st.write(response["content"])
 
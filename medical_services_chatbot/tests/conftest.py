@@ -0,0 +1,28 @@
+"""
+Shared test setup.
+
+The services import `core.*` from the `medical_services_chatbot` directory and
+create Azure OpenAI clients on construction; the clients are never used by the
+tests, so placeholder credentials are enough.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "http://127.0.0.1:9")
+os.environ.setdefault("AZURE_OPENAI_KEY", "test")
+os.environ.setdefault("AZURE_API_VERSION", "2024-02-01")
+# No watcher threads or snapshot files written next to phase2_data
+os.environ.setdefault("QA_CATALOG_POLL_SECONDS", "0")
+os.environ.setdefault("QA_USE_SNAPSHOT", "false")
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """The catalog version of the phase2_data tables, parsed once per test session"""
+    from core.qa_service import QAService
+    return QAService.load_catalog()
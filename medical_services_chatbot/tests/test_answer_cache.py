@@ -0,0 +1,75 @@
+from core.answer_cache import SemanticAnswerCache, ngram_embedding, normalize_question
+
+SCOPE = {"hmo": "מכבי", "tier": "זהב", "catalog_version": "v1", "persona": "female"}
+
+
+def test_normalize_question():
+    assert normalize_question("  What's   the DISCOUNT?! ") == "what s the discount"
+
+
+def test_exact_hit_after_normalization():
+    cache = SemanticAnswerCache()
+    cache.put(question="What is the discount on fillings?", answer="80%", topic="סתימות", **SCOPE)
+    hit = cache.get(question="what is the discount on fillings", topic="סתימות", **SCOPE)
+    assert (hit.answer, hit.kind) == ("80%", "exact")
+
+
+def test_near_duplicate_needs_the_same_topic():
+    cache = SemanticAnswerCache(similarity_threshold=0.7)
+    cache.put(question="What is the discount on fillings?", answer="80%", topic="סתימות", **SCOPE)
+    hit = cache.get(question="What's the discount for fillings?", topic="סתימות", **SCOPE)
+    assert hit is not None and hit.kind == "semantic"
+    assert cache.get(question="What's the discount for fillings?", topic="כתרים ושתלים", **SCOPE) is None
+
+
+def test_scope_separates_entries():
+    cache = SemanticAnswerCache()
+    cache.put(question="q", answer="a", **SCOPE)
+    assert cache.get(question="q", **{**SCOPE, "persona": "male"}) is None
+    assert cache.get(question="q", **{**SCOPE, "catalog_version": "v2"}) is None
+
+
+def test_lru_eviction_and_ttl():
+    cache = SemanticAnswerCache(max_entries=2)
+    for question in ("a", "b", "c"):
+        cache.put(question=question, answer=question, **SCOPE)
+    assert cache.get(question="a", **SCOPE) is None
+    assert cache.get(question="c", **SCOPE).answer == "c"
+
+    expired = SemanticAnswerCache(ttl_seconds=1e-9)
+    expired.put(question="a", answer="a", **SCOPE)
+    assert expired.get(question="a", **SCOPE) is None
+
+
+def test_invalidate_keeps_the_current_version():
+    cache = SemanticAnswerCache()
+    cache.put(question="a", answer="old", **SCOPE)
+    cache.put(question="a", answer="new", **{**SCOPE, "catalog_version": "v2"})
+    assert cache.invalidate(keep_version="v2") == 1
+    assert cache.get(question="a", **{**SCOPE, "catalog_version": "v2"}).answer == "new"
+
+
+def test_lookup_embeds_without_holding_the_lock():
+    cache = SemanticAnswerCache()
+    cache.put(question="What is the discount on fillings?", answer="80%", **SCOPE)
+    held = []
+
+    def embed(text):
+        held.append(cache._lock.locked())
+        return ngram_embedding(text)
+
+    cache._embed = embed
+    cache.get(question="What's the discount for fillings?", **SCOPE)
+    cache.put(question="Do I get glasses?", answer="yes", **SCOPE)
+    assert held == [False, False]
+    assert cache.uses_model_embeddings
+
+
+def test_lookup_of_empty_scope_skips_the_embedding():
+    cache = SemanticAnswerCache()
+
+    def embed(text):
+        raise AssertionError("embedded without candidates")
+
+    cache._embed = embed
+    assert cache.get(question="anything", **SCOPE) is None
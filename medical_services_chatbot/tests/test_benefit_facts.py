@@ -0,0 +1,62 @@
+from core.benefit_facts import FactAnswerer, parse_benefit_facts
+
+USER = {"gender": "female", "age": "30"}
+
+
+def _answer(question, service, description, user=USER):
+    facts = {service: parse_benefit_facts(description)}
+    return FactAnswerer().answer(question, [(service, 5.0)], facts, user, "מכבי", "זהב", "Maccabi", "Gold")
+
+
+def test_parse_discount_with_cap_and_treatments():
+    facts = parse_benefit_facts("70% הנחה עד 1000 ₪, עד 20 טיפולים בשנה")
+    assert (facts.discount_percent, facts.price_cap_ils, facts.treatments_per_year) == (70, 1000, 20)
+    assert facts.includes == ()
+
+
+def test_parse_free_with_frequency_wait_and_includes():
+    facts = parse_benefit_facts("חינם פעמיים בשנה, תור תוך 48 שעות, כולל צילומי רנטגן")
+    assert facts.is_free and facts.times_per_year == 2
+    assert facts.wait_time_hours == 48
+    assert facts.includes == ("צילומי רנטגן",)
+
+
+def test_parse_free_until_age():
+    facts = parse_benefit_facts("חינם עד גיל 18, כולל טיפולי עין עצלה")
+    assert facts.is_free and facts.free_until_age == 18
+
+
+def test_detect_intent():
+    assert FactAnswerer.detect_intent("What is the discount on fillings?") == "discount"
+    assert FactAnswerer.detect_intent("כל כמה זמן אפשר להחליף משקפיים?") == "replacement"
+    assert FactAnswerer.detect_intent("Does it include X-rays?") is None
+
+
+def test_ambiguous_service_falls_back():
+    assert FactAnswerer(min_margin=1.5).confident_service([("a", 3.0), ("b", 2.5)]) is None
+    assert FactAnswerer(min_margin=1.5).confident_service([("a", 3.0), ("b", 1.0)]) == "a"
+
+
+def test_english_answer_without_includes():
+    answer = _answer("What is the discount on acupuncture?", "דיקור סיני (אקופונקטורה)", "70% הנחה, עד 20 טיפולים בשנה")
+    assert answer == "As a Maccabi Gold member, you are entitled to a 70% discount on acupuncture, up to 20 treatments per year."
+
+
+def test_english_answer_with_includes_falls_back():
+    assert _answer("What is the discount on fillings?", "סתימות", "80% הנחה, חומרים מתקדמים") is None
+    assert _answer("What is the discount on hearing aids?", "שיקום שמיעה", "80% הנחה, כולל התאמת מכשירי שמיעה") is None
+
+
+def test_hebrew_answer_keeps_includes():
+    answer = _answer("כמה הנחה על שיקום שמיעה?", "שיקום שמיעה", "80% הנחה, כולל התאמת מכשירי שמיעה")
+    assert answer == "כמבוטחת מכבי במסלול זהב, את זכאית ל-80% הנחה על שיקום שמיעה, כולל התאמת מכשירי שמיעה."
+
+
+def test_free_until_age_depends_on_the_users_age():
+    service, description = "טיפול בילדים", "חינם עד גיל 18"
+    question = "מה ההנחה על טיפול בילדים?"
+    assert "חינם עד גיל 18" in _answer(question, service, description, {**USER, "age": "12"})
+    assert _answer(question, service, description, {**USER, "age": "40"}) is None
+    assert _answer(question, service, description, {**USER, "age": ""}) is None
+    # The age limit itself doesn't depend on the user's age
+    assert _answer("עד איזה גיל טיפול בילדים חינם?", service, description, {**USER, "age": "40"}) is not None
@@ -0,0 +1,170 @@
+import asyncio
+import dataclasses
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from core.fastapi_backend import _event_stream, _sse_message
+from core.llm_limiter import LLMOverloadedError
+
+
+def _collect(events):
+    async def run():
+        response = await _event_stream(events, "test")
+        return response.status_code, [chunk async for chunk in response.body_iterator]
+    return asyncio.run(run())
+
+
+def test_sse_message_framing():
+    assert _sse_message({"type": "token", "content": "שלום"}) == 'event: token\ndata: {"content": "שלום"}\n\n'
+
+
+def test_events_are_forwarded():
+    async def events():
+        yield {"type": "token", "content": "a"}
+        yield {"type": "done", "answer": "a"}
+
+    status, chunks = _collect(events())
+    assert status == 200
+    assert chunks == ['event: token\ndata: {"content": "a"}\n\n', 'event: done\ndata: {"answer": "a"}\n\n']
+
+
+def test_mid_stream_failure_becomes_an_error_event():
+    async def events():
+        yield {"type": "token", "content": "a"}
+        raise RuntimeError("boom")
+
+    _, chunks = _collect(events())
+    assert chunks[-1] == 'event: error\ndata: {"detail": "boom"}\n\n'
+
+
+def test_first_step_failure_becomes_an_error_event():
+    async def events():
+        raise RuntimeError("boom")
+        yield
+
+    status, chunks = _collect(events())
+    assert status == 200
+    assert chunks == ['event: error\ndata: {"detail": "boom"}\n\n']
+
+
+def test_empty_stream_becomes_an_error_event():
+    async def events():
+        return
+        yield
+
+    _, chunks = _collect(events())
+    assert len(chunks) == 1 and chunks[0].startswith("event: error\n")
+
+
+def test_limiter_rejection_is_raised_before_responding():
+    async def events():
+        raise LLMOverloadedError("get_answer", "queue_full", 1)
+        yield
+
+    with pytest.raises(LLMOverloadedError):
+        _collect(events())
+
+
+class _SlowCollector:
+    """Collection turns that take a while, so concurrent turns would interleave without the session lock"""
+
+    async def aprocess_user_input(self, user_input, chat_history, language, state=None):
+        await asyncio.sleep(0.01)
+        return {"role": "assistant", "content": f"got {user_input} after {len(chat_history)} messages"}
+
+    def get_welcome_message(self, language):
+        return "welcome"
+
+
+def test_concurrent_messages_of_a_session_run_one_at_a_time(monkeypatch):
+    from core import fastapi_backend
+    from core.session_store import InMemorySessionStore
+
+    monkeypatch.setattr(fastapi_backend, "session_store", InMemorySessionStore())
+    monkeypatch.setattr(fastapi_backend, "user_info_collector", _SlowCollector())
+
+    async def run():
+        created = await fastapi_backend.create_session(fastapi_backend.CreateSessionRequest(language="english"))
+        session_id = created["session_id"]
+        await asyncio.gather(*(
+            fastapi_backend.post_session_message(session_id, fastapi_backend.SessionMessageRequest(message=m))
+            for m in ("a", "b", "c")
+        ))
+        return fastapi_backend.session_store.get(session_id)
+
+    session = asyncio.run(run())
+    assert [m["content"] for m in session.chat_history] == [
+        "welcome", "a", "got a after 1 messages", "b", "got b after 3 messages", "c", "got c after 5 messages",
+    ]
+
+
+class _BatchRouter:
+    """Answers batch questions after a short delay; "busy" questions find the LLM unavailable"""
+
+    def __init__(self, service, reloaded):
+        self.service, self.reloaded = service, reloaded
+
+    async def acall(self, caller, endpoint, turn_type, create, check=None):
+        # A catalog reload lands while the batch is running
+        self.service._catalog = self.reloaded
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))])
+
+
+@pytest.fixture
+def batch_backend(monkeypatch, catalog):
+    from core import fastapi_backend, qa_service as qa_service_module
+    from core.qa_service import QAService
+    from core.resilience import LLMUnavailableError
+
+    service = QAService(catalog=catalog, watch_catalog=False, enable_cache=False, enable_fast_path=False,
+                        coalesce_requests=False)
+    router = _BatchRouter(service, dataclasses.replace(catalog, version="reloaded"))
+    answer = service.aanswer_question
+
+    async def aanswer_question(user_info, question, catalog=None):
+        if "busy" in question:
+            raise LLMUnavailableError("get_answer", "circuit_open", 5)
+        return await answer(user_info, question, catalog)
+
+    service.router = router
+    monkeypatch.setattr(service, "aanswer_question", aanswer_question)
+    monkeypatch.setattr(qa_service_module, "QA_BATCH_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(fastapi_backend, "qa_service", service)
+    monkeypatch.setattr(fastapi_backend, "QA_BATCH_MAX_QUESTIONS", 5)
+
+    def post(questions):
+        async def run():
+            transport = httpx.ASGITransport(app=fastapi_backend.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                user_info = {"first_name": "Dana", "last_name": "Levi", "id_number": "123456782", "gender": "female",
+                             "age": 30, "hmo_name": "Maccabi", "hmo_card_number": "987654321",
+                             "membership_tier": "Gold"}
+                return await client.post("/get-answers", json={"user_info": user_info, "questions": questions})
+        return asyncio.run(run())
+
+    return post, catalog.version
+
+
+def test_batch_above_the_limit_is_rejected(batch_backend):
+    post, _ = batch_backend
+    assert post([f"question {i}" for i in range(6)]).status_code == 413
+
+
+def test_batch_keeps_order_version_and_per_item_errors(batch_backend):
+    post, version = batch_backend
+    questions = ["Dental checkups?", "Eye exams?", "busy question", "Physiotherapy?", "Workshops?"]
+    response = post(questions)
+    assert response.status_code == 200
+    body = response.json()
+    results = body["results"]
+    assert [item["question"] for item in results] == questions
+    assert [item["index"] for item in results] == list(range(5))
+    assert body["failed"] == 1
+    assert results[2]["status_code"] == 503 and "circuit_open" in results[2]["error"]
+    answered = [item for item in results if "error" not in item]
+    assert len(answered) == 4
+    # Items started after the reload still use the version the batch began with
+    assert {item["catalog_version"] for item in answered} == {version}
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from core import health_sampler as health_sampler_module
+from core.health_sampler import HealthSampler
+
+
+class _Limiter:
+    """LLM limiter stats the test controls"""
+
+    def __init__(self):
+        self.queued = 0
+
+    def stats(self):
+        return {"in_flight": 4, "queued": self.queued, "max_concurrency": 4, "max_queue": 10}
+
+
+@pytest.fixture(autouse=True)
+def queue_threshold_only(monkeypatch):
+    # CPU and loop lag of the test process are not under the test's control
+    monkeypatch.setattr(health_sampler_module, "HEALTH_MAX_CPU_PERCENT", 0)
+    monkeypatch.setattr(health_sampler_module, "HEALTH_MAX_LOOP_LAG_MS", 0)
+    monkeypatch.setattr(health_sampler_module, "HEALTH_MAX_LLM_QUEUE_RATIO", 0.8)
+
+
+def test_sampler_marks_not_ready_while_saturated_and_ready_after_recovery(monkeypatch):
+    from core import fastapi_backend
+
+    limiter = _Limiter()
+    sampler = HealthSampler(interval=0.05, window_seconds=1, limiter=limiter)
+    monkeypatch.setattr(fastapi_backend, "health_sampler", sampler)
+
+    async def ready_status():
+        response = await fastapi_backend.readiness_check()
+        return getattr(response, "status_code", 200)
+
+    async def run():
+        sampler.start()
+        try:
+            await asyncio.sleep(0.12)
+            before = sampler.readiness(), await ready_status()
+            limiter.queued = 9
+            await asyncio.sleep(0.12)
+            saturated = sampler.readiness(), await ready_status()
+            limiter.queued = 1
+            await asyncio.sleep(0.12)
+            recovered = sampler.readiness(), await ready_status()
+        finally:
+            await sampler.stop()
+        return before, saturated, recovered
+
+    before, saturated, recovered = asyncio.run(run())
+    assert before == ((True, []), 200)
+    assert saturated == ((False, ["LLM queue 90% full"]), 503)
+    assert recovered == ((True, []), 200)
+
+
+def test_snapshot_summarizes_the_samples():
+    sampler = HealthSampler(interval=0.05, window_seconds=1, limiter=_Limiter())
+    assert sampler.snapshot() == {"sampled": False}
+
+    async def run():
+        sampler.start()
+        await asyncio.sleep(0.12)
+        await sampler.stop()
+
+    asyncio.run(run())
+    snapshot = sampler.snapshot()
+    assert snapshot["sampled"] and snapshot["llm_in_flight"] == 4 and snapshot["llm_max_queue"] == 10
+    assert snapshot["event_loop_lag_ms"] >= 0
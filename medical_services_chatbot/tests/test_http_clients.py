@@ -0,0 +1,16 @@
+import importlib.util
+
+from core import http_clients
+
+
+def test_pool_has_explicit_timeouts():
+    settings = http_clients._pool_settings()
+    assert settings["timeout"].connect == http_clients.LLM_HTTP_CONNECT_TIMEOUT
+    assert settings["timeout"].read == http_clients.LLM_HTTP_READ_TIMEOUT
+
+
+def test_http2_needs_the_h2_package(monkeypatch):
+    monkeypatch.setattr(http_clients, "LLM_HTTP2", True)
+    assert http_clients.http2_enabled() == (importlib.util.find_spec("h2") is not None)
+    monkeypatch.setattr(http_clients, "LLM_HTTP2", False)
+    assert http_clients.http2_enabled() is False
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from core.llm_limiter import LLMConcurrencyLimiter, LLMOverloadedError, parse_budgets
+
+
+def test_parse_budgets_ignores_malformed_entries():
+    assert parse_budgets("get_answer=40, process_input=16,bad,x=y,=3") == {"get_answer": 40, "process_input": 16}
+
+
+def test_concurrency_is_bounded_and_fifo():
+    limiter = LLMConcurrencyLimiter(max_concurrency=2, max_queue=10, queue_timeout=5, endpoint_budgets={})
+    active, peak, order = 0, 0, []
+
+    async def call(i):
+        nonlocal active, peak
+        async with limiter.acquire("get_answer"):
+            active += 1
+            peak = max(peak, active)
+            order.append(i)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def run():
+        await asyncio.gather(*(call(i) for i in range(6)))
+
+    asyncio.run(run())
+    assert peak == 2
+    assert order == list(range(6))
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_full_queue_is_rejected_with_429():
+    limiter = LLMConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=5, endpoint_budgets={})
+
+    async def hold():
+        async with limiter.acquire("get_answer"):
+            await asyncio.sleep(0.01)
+
+    async def run():
+        # One call holds the slot and one waits in the queue
+        calls = [asyncio.ensure_future(hold()), asyncio.ensure_future(hold())]
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError) as rejected:
+            async with limiter.acquire("get_answer"):
+                pass
+        await asyncio.gather(*calls)
+        return rejected.value
+
+    error = asyncio.run(run())
+    assert (error.reason, error.status_code) == ("queue_full", 429)
+    assert error.retry_after >= 1
+
+
+def test_endpoint_budget_limits_its_queue():
+    limiter = LLMConcurrencyLimiter(max_concurrency=1, max_queue=10, queue_timeout=5,
+                                    endpoint_budgets={"extract_user_info": 0})
+
+    async def run():
+        async with limiter.acquire("get_answer"):
+            with pytest.raises(LLMOverloadedError):
+                async with limiter.acquire("extract_user_info"):
+                    pass
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_is_rejected_with_503():
+    limiter = LLMConcurrencyLimiter(max_concurrency=1, max_queue=10, queue_timeout=0.01, endpoint_budgets={})
+
+    async def run():
+        async with limiter.acquire("get_answer"):
+            with pytest.raises(LLMOverloadedError) as rejected:
+                async with limiter.acquire("get_answer"):
+                    pass
+            return rejected.value
+
+    error = asyncio.run(run())
+    assert (error.reason, error.status_code) == ("queue_timeout", 503)
+    assert limiter.stats()["queued"] == 0
+
+
+def test_sync_and_async_callers_share_the_budget():
+    limiter = LLMConcurrencyLimiter(max_concurrency=1, max_queue=10, queue_timeout=0.01, endpoint_budgets={})
+    with limiter.acquire_sync("process_input"):
+        assert limiter.stats()["in_flight"] == 1
+        with pytest.raises(LLMOverloadedError):
+            with limiter.acquire_sync("process_input"):
+                pass
+    assert limiter.stats()["in_flight"] == 0
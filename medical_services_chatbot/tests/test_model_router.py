@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+from core import model_router as model_router_module
+from core.model_router import ModelRouter, parse_routes
+from core.slot_extraction import CollectionState
+from core.user_info_gathering_agent import CONFIRM_PHASES, UserInfoCollector
+from core.validators import USER_INFO_FIELDS
+
+
+def _response(content, finish_reason="stop"):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+
+class _Caller:
+    """Stands in for the call layer: records the models called and returns their scripted responses"""
+
+    def __init__(self):
+        self.models = []
+
+    def call(self, endpoint, model, call):
+        self.models.append(model)
+        return call(1.0)
+
+    async def acall(self, endpoint, model, call):
+        self.models.append(model)
+        return await call(1.0)
+
+
+def test_parse_routes_ignores_malformed_entries():
+    assert parse_routes("process_input=gpt-4o-mini, bad, =x,extract_user_info=") == {"process_input": "gpt-4o-mini"}
+
+
+def test_default_routes_send_simple_turns_to_the_mini_model():
+    router = ModelRouter()
+    assert router.select("process_input", "collect") == "gpt-4o-mini"
+    # The turn type route wins over the endpoint route
+    assert router.select("process_input", "confirm") == "gpt-4o"
+    assert router.select("extract_user_info", "extract") == "gpt-4o-mini"
+    assert router.select("get_answer", "answer") == "gpt-4o"
+
+
+def test_llm_routes_override_the_defaults(monkeypatch):
+    monkeypatch.setattr(model_router_module, "LLM_ROUTES", "process_input=gpt-4o,get_answer.answer=gpt-4o-mini")
+    router = ModelRouter()
+    assert router.select("process_input", "collect") == "gpt-4o"
+    assert router.select("extract_user_info", "extract") == "gpt-4o"
+    assert router.select("get_answer", "answer") == "gpt-4o-mini"
+    assert ModelRouter(routes={}, default_model="gpt-4o-mini").select("process_input", "confirm") == "gpt-4o-mini"
+
+
+def test_rejected_collection_turn_is_escalated_once():
+    router, caller = ModelRouter(routes={"process_input": "gpt-4o-mini"}), _Caller()
+    collector = UserInfoCollector(structured_turns=False)
+    state = CollectionState(confirmed={"first_name": "Dana"})
+    replies = {"gpt-4o-mini": _response(CONFIRM_PHASES["english"]), "gpt-4o": _response(CONFIRM_PHASES["english"])}
+
+    async def create(model, timeout):
+        return replies[model]
+
+    response = asyncio.run(router.acall(caller, "process_input", "collect", create,
+                                        collector._collection_check(state, "english")))
+    # The escalation model's output is used without checking it again
+    assert response is replies["gpt-4o"]
+    assert caller.models == ["gpt-4o-mini", "gpt-4o"]
+
+
+def test_rejected_extraction_is_escalated():
+    router, caller = ModelRouter(routes={"extract_user_info": "gpt-4o-mini"}), _Caller()
+    check = UserInfoCollector()._extraction_check(["age", "hmo_name"])
+    replies = {"gpt-4o-mini": _response('{"age": 28, "hmo_name": "Leumit"}'),
+               "gpt-4o": _response('{"age": 28, "hmo_name": "Maccabi"}')}
+    response = router.call(caller, "extract_user_info", "extract", lambda model, timeout: replies[model], check)
+    assert response is replies["gpt-4o"]
+
+    accepted = router.call(caller, "extract_user_info", "extract", lambda model, timeout: replies["gpt-4o"], check)
+    assert accepted is replies["gpt-4o"]
+    assert caller.models == ["gpt-4o-mini", "gpt-4o", "gpt-4o-mini"]
+
+
+def test_stats_count_calls_and_escalations():
+    router, caller = ModelRouter(routes={"extract_user_info": "gpt-4o-mini"}), _Caller()
+    fields = list(USER_INFO_FIELDS)
+    check = UserInfoCollector()._extraction_check(fields)
+    valid = '{"first_name": "Dana", "last_name": "Levi", "id_number": "123456782", "gender": "Female", "age": 28, ' \
+            '"hmo_name": "Maccabi", "hmo_card_number": "987654321", "membership_tier": "Gold"}'
+    # One rejected and escalated, one accepted
+    outputs = iter(["not json", valid, valid])
+    for _ in range(2):
+        router.call(caller, "extract_user_info", "extract", lambda model, timeout: _response(next(outputs)), check)
+
+    calls = router.stats()["calls"]["extract_user_info.extract"]
+    # Escalated calls are made but not routed, so only the first choice is counted
+    assert calls["gpt-4o-mini"] == {"calls": 2, "escalations": 1, "escalation_rate": 0.5}
+    assert "gpt-4o" not in calls
@@ -0,0 +1,163 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from core.answer_cache import ngram_embedding
+from core.llm_limiter import LLMConcurrencyLimiter
+from core.qa_service import QAService
+from core.resilience import LLMUnavailableError, request_deadline
+
+
+def _user(**overrides):
+    user = {
+        "first_name": "Dana", "last_name": "Levi", "id_number": "123456789", "gender": "female",
+        "age": "12", "hmo_name": "Maccabi", "hmo_card_number": "987654321", "membership_tier": "Gold",
+    }
+    user.update(overrides)
+    return user
+
+
+@pytest.fixture
+def service(catalog):
+    return QAService(catalog=catalog, watch_catalog=False, enable_cache=True, enable_fast_path=False,
+                     coalesce_requests=True)
+
+
+QUESTION = "Which eye exams do I get?"
+
+
+def test_age_band_follows_the_slice_age_limits():
+    assert QAService._age_band("12", (18,)) == "<=18"
+    assert QAService._age_band("18", (18,)) == "<=18"
+    assert QAService._age_band("40", (18,)) == ">18"
+    assert QAService._age_band("15", (14, 18)) == "<=18"
+    assert QAService._age_band("40", ()) == ""
+
+
+def test_cached_answer_is_not_shared_across_age_bands(service):
+    child = service._prepare_answer(_user(age="12"), QUESTION)
+    assert child.result is None
+    service._finish_answer(child, "Free eye exams until age 18, Dana.")
+
+    adult = service._prepare_answer(_user(age="40"), QUESTION)
+    assert adult.result is None
+
+    other_child = service._prepare_answer(_user(age="13", first_name="Noa"), QUESTION)
+    assert other_child.result["source"] == "cache"
+    assert other_child.result["answer"] == "Free eye exams until age 18, Noa."
+
+
+def test_in_flight_requests_are_not_shared_across_age_bands(service):
+    child = service._prepare_answer(_user(age="12"), QUESTION)
+    adult = service._prepare_answer(_user(age="40"), QUESTION)
+    other_child = service._prepare_answer(_user(age="9"), QUESTION)
+    assert service._flight_key(child) != service._flight_key(adult)
+    assert service._flight_key(child) == service._flight_key(other_child)
+
+
+def test_cached_answer_is_not_shared_across_genders(service):
+    request = service._prepare_answer(_user(), QUESTION)
+    service._finish_answer(request, "answer")
+    assert service._prepare_answer(_user(gender="male"), QUESTION).result is None
+
+
+def test_async_paths_embed_off_the_event_loop(service):
+    threads = []
+
+    def embed(text):
+        threads.append(threading.get_ident())
+        return ngram_embedding(text)
+
+    service.answer_cache._embed = embed
+
+    async def prepare_and_store():
+        request = await service._aprepare_answer(_user(), QUESTION)
+        await service._afinish_answer(request, "answer")
+        await service._aprepare_answer(_user(), "Which eye tests do I get?")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(prepare_and_store())
+    assert threads and loop_thread not in threads
+
+
+class _SlowRouter:
+    """Stands in for the model router: counts completion calls and answers after a short delay"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def acall(self, caller, endpoint, turn_type, call, check=None):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        message = SimpleNamespace(content="Eye exams are covered for Dana.")
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+
+
+def test_identical_concurrent_questions_share_one_completion(catalog):
+    router = _SlowRouter()
+    service = QAService(catalog=catalog, watch_catalog=False, enable_cache=False, enable_fast_path=False,
+                        coalesce_requests=True, router=router)
+
+    async def ask_both():
+        return await asyncio.gather(service.aanswer_question(_user(), QUESTION),
+                                    service.aanswer_question(_user(first_name="Noa"), QUESTION))
+
+    first, second = asyncio.run(ask_both())
+    assert router.calls == 1
+    assert second["source"] == "coalesced"
+    # The shared answer is personalized for each user
+    assert first["answer"] == "Eye exams are covered for Dana."
+    assert second["answer"] == "Eye exams are covered for Noa."
+
+
+class _CallerRouter:
+    """Sends every answer call through the service's call layer to a slow fake completion"""
+
+    async def acall(self, caller, endpoint, turn_type, create, check=None):
+        async def complete(timeout):
+            await asyncio.sleep(0.05)
+            message = SimpleNamespace(content=f"Answered within {timeout:.1f}s.")
+            return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=message)])
+
+        return await caller.acall(endpoint, "test-batch-model", complete)
+
+
+def test_batch_items_get_their_own_deadline(catalog):
+    service = QAService(catalog=catalog, watch_catalog=False, enable_cache=False, enable_fast_path=False,
+                        coalesce_requests=False, router=_CallerRouter(),
+                        limiter=LLMConcurrencyLimiter(max_concurrency=8, endpoint_budgets={}))
+    questions = [f"{QUESTION} ({i})" for i in range(6)]
+
+    async def ask():
+        # Shorter than the three rounds the batch takes at two questions at a time
+        with request_deadline(0.08):
+            return await service.aanswer_questions(_user(), questions, max_concurrency=2)
+
+    items = asyncio.run(ask())
+    assert [item["index"] for item in items] == list(range(6))
+    assert all("error" not in item for item in items), items
+
+
+def test_batch_reports_unavailable_llm_with_its_status(catalog):
+    class Unavailable:
+        async def acall(self, *args, **kwargs):
+            raise LLMUnavailableError("get_answer", "deadline_exceeded", 1)
+
+    service = QAService(catalog=catalog, watch_catalog=False, enable_cache=False, enable_fast_path=False,
+                        coalesce_requests=False, router=Unavailable())
+    item, = asyncio.run(service.aanswer_questions(_user(), [QUESTION]))
+    assert item["status_code"] == 504
+
+
+def test_sync_answers_report_an_unavailable_llm_as_text(catalog):
+    class Unavailable:
+        def call(self, *args, **kwargs):
+            raise LLMUnavailableError("get_answer", "circuit_open", 30)
+
+    service = QAService(catalog=catalog, watch_catalog=False, enable_cache=True, enable_fast_path=False,
+                        router=Unavailable())
+    answer = service.get_answer(_user(), QUESTION)
+    assert answer.startswith("I apologize") and "circuit_open" in answer
+    assert service.answer_cache.stats()["entries"] == 0
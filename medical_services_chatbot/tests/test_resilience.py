@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from core import resilience
+from core.llm_limiter import LLMConcurrencyLimiter
+from core.resilience import CircuitBreaker, LLMUnavailableError, ResilientLLMCaller, request_deadline
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(resilience, "LLM_RETRY_BASE_DELAY_SECONDS", 0.001)
+    monkeypatch.setattr(resilience, "LLM_RETRY_MAX_DELAY_SECONDS", 0.001)
+
+
+def _caller(max_retries=2):
+    return ResilientLLMCaller(LLMConcurrencyLimiter(max_concurrency=4, endpoint_budgets={}), max_retries=max_retries)
+
+
+def _flaky(failures, result="ok", error=TimeoutError):
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise error("attempt failed")
+        return result
+
+    return call, calls
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_after_reset():
+    breaker = CircuitBreaker("test-open", failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.before_call() is None
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+    assert breaker.before_call() > 0
+
+    asyncio.run(asyncio.sleep(0.06))
+    # One half-open probe at a time
+    assert breaker.before_call() is None
+    assert breaker.before_call() > 0
+    breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test-probe", failure_threshold=1, reset_seconds=0.01)
+    breaker.record_failure()
+    asyncio.run(asyncio.sleep(0.02))
+    assert breaker.before_call() is None
+    breaker.record_failure()
+    assert breaker.stats()["state"] == "open"
+
+
+def test_retryable_errors_are_retried():
+    call, calls = _flaky(failures=2)
+    assert _caller().call("get_answer", "test-retry", call) == "ok"
+    assert len(calls) == 3
+
+
+def test_other_errors_are_not_retried():
+    call, calls = _flaky(failures=1, error=ValueError)
+    with pytest.raises(ValueError):
+        _caller().call("get_answer", "test-no-retry", call)
+    assert len(calls) == 1
+
+
+def test_exhausted_retries_are_a_provider_error():
+    call, calls = _flaky(failures=10)
+    with pytest.raises(LLMUnavailableError) as failed:
+        _caller(max_retries=1).call("get_answer", "test-exhausted", call)
+    assert (failed.value.reason, failed.value.status_code) == ("provider_error", 502)
+    assert len(calls) == 2
+
+
+def test_open_circuit_fails_fast():
+    caller = _caller(max_retries=0)
+    for _ in range(resilience.LLM_BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(LLMUnavailableError):
+            caller.call("get_answer", "test-circuit", _flaky(failures=1)[0])
+
+    call, calls = _flaky(failures=0)
+    with pytest.raises(LLMUnavailableError) as rejected:
+        caller.call("get_answer", "test-circuit", call)
+    assert (rejected.value.reason, rejected.value.status_code) == ("circuit_open", 503)
+    assert calls == []
+
+
+def test_attempts_share_the_request_deadline():
+    call, calls = _flaky(failures=0)
+    with request_deadline(5):
+        _caller().call("get_answer", "test-deadline", call)
+    assert 0 < calls[0] <= 5
+
+
+def test_async_calls_are_retried():
+    attempts = []
+
+    async def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            raise TimeoutError("slow")
+        return "ok"
+
+    assert asyncio.run(_caller().acall("get_answer", "test-async", call)) == "ok"
+    assert len(attempts) == 2
@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from core import responses
+from core.responses import CompressionMiddleware, FastJSONResponse, choose_encoding, parse_accept_encoding
+
+BIG = {"answer": "שלום " * 500, "items": list(range(50))}
+
+
+async def _events():
+    for i in range(3):
+        yield f"event: token\ndata: {json.dumps({'content': 'x' * 2000})}\n\n"
+
+
+def _app():
+    routes = [
+        Route("/big", lambda request: FastJSONResponse(BIG)),
+        Route("/small", lambda request: FastJSONResponse({"ok": True})),
+        Route("/stream", lambda request: StreamingResponse(_events(), media_type="text/event-stream")),
+        # A complete SSE body in a single message must not be compressed either
+        Route("/sse-body", lambda request: PlainTextResponse("event: done\ndata: {}\n\n" * 200,
+                                                             media_type="text/event-stream")),
+    ]
+    return CompressionMiddleware(Starlette(routes=routes), minimum_size=1024)
+
+
+def _get(path, accept_encoding="gzip"):
+    async def run():
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get(path, headers={"Accept-Encoding": accept_encoding})
+            return response, response.content
+    return asyncio.run(run())
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, br , *;q=0, bad;q=x") == {"gzip": 0.5, "br": 1.0, "*": 0.0, "bad": 0.0}
+
+
+def test_choose_encoding_prefers_brotli_when_installed(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+    assert choose_encoding("br, gzip") == "gzip"
+    assert choose_encoding("br") is None
+    monkeypatch.setattr(responses, "brotli", object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0.5, gzip") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("") is None
+
+
+def test_orjson_body_is_compact_utf8():
+    body = FastJSONResponse({"answer": "שלום", "n": 1}).body
+    assert body == '{"answer":"שלום","n":1}'.encode("utf-8")
+
+
+def test_large_responses_are_gzipped():
+    response, content = _get("/big")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(json.dumps(BIG, ensure_ascii=False).encode())
+    assert json.loads(content) == BIG
+
+
+def test_small_and_unaccepted_responses_are_not_compressed():
+    for path, accept in (("/small", "gzip"), ("/big", "identity")):
+        response, _ = _get(path, accept)
+        assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("path", ["/stream", "/sse-body"])
+def test_event_streams_pass_through(path):
+    response, content = _get(path)
+    assert "content-encoding" not in response.headers
+    assert content.startswith(b"event: ")
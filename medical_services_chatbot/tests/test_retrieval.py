@@ -0,0 +1,39 @@
+from core.retrieval import ServiceRetriever, tokenize
+
+
+def test_tokenize_strips_hebrew_prefixes_and_stop_words():
+    terms = tokenize("מה ההנחה על הסתימות?")
+    assert "סתימות" in terms
+    assert "מה" not in terms and "ההנחה" not in terms
+
+
+def test_tokenize_folds_english_plurals():
+    assert tokenize("fillings") == ["filling"]
+    assert tokenize("cavities") == ["cavity"]
+
+
+def test_english_question_matches_hebrew_service(catalog):
+    ranked = catalog.retriever.rank("Maccabi", "Gold", "What is the discount on fillings?")
+    assert ranked[0][0] == "סתימות"
+
+
+def test_hebrew_question_matches_service(catalog):
+    ranked = catalog.retriever.rank("מכבי", "זהב", "כמה הנחה על דיקור סיני?")
+    assert ranked[0][0] == "דיקור סיני (אקופונקטורה)"
+
+
+def test_retrieve_keeps_top_k_rows(catalog):
+    rows = catalog.retriever.retrieve("Clalit", "Silver", "Do I get glasses?", top_k=2)
+    assert 0 < len(rows) <= 2
+    assert "משקפי ראייה" in rows
+
+
+def test_broad_question_falls_back_to_whole_slice(catalog):
+    rows = catalog.retriever.retrieve("מכבי", "זהב", "what are my benefits?", top_k=3)
+    assert rows == catalog.services_db["מכבי"]["זהב"]
+
+
+def test_unknown_slice_ranks_nothing():
+    retriever = ServiceRetriever({"מכבי": {"זהב": {"סתימות": "80% הנחה"}}}, {"סתימות": "dentel"})
+    assert retriever.rank("מכבי", "כסף", "fillings") == []
+    assert retriever.retrieve("מכבי", "כסף", "fillings", top_k=3) == {}
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+from core.services_catalog import (
+    DEFAULT_SERVICES_DIR, ServicesCatalogLoader, ServicesCatalogWatcher, read_snapshot, snapshot_key,
+    write_snapshot,
+)
+
+
+def test_parses_every_hmo_and_tier():
+    services_db, service_categories = ServicesCatalogLoader(use_snapshot=False).load()
+    assert set(services_db) == {"מכבי", "מאוחדת", "כללית"}
+    assert set(services_db["מכבי"]) == {"זהב", "כסף", "ארד"}
+    assert service_categories["סתימות"] == "dentel"
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "catalog.snapshot")
+    key = snapshot_key({"dentel_services.html": "0" * 64})
+    write_snapshot(path, key, {"a": [1, 2]})
+    assert read_snapshot(path) == (key, {"a": [1, 2]})
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "catalog.snapshot"
+    path.write_bytes(b"not a snapshot")
+    assert read_snapshot(str(path)) is None
+
+
+def _copy_services(tmp_path) -> str:
+    services_dir = tmp_path / "phase2_data"
+    services_dir.mkdir()
+    shutil.copy(os.path.join(DEFAULT_SERVICES_DIR, "dentel_services.html"), services_dir)
+    return str(services_dir)
+
+
+def _touch(path: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("\n")
+
+
+def test_watcher_reloads_changed_files(tmp_path):
+    services_dir = _copy_services(tmp_path)
+    calls = []
+    watcher = ServicesCatalogWatcher(services_dir, lambda: calls.append(1))
+
+    assert watcher.poll() is False
+    _touch(os.path.join(services_dir, "dentel_services.html"))
+    assert watcher.poll() is True
+    assert watcher.poll() is False
+    assert calls == [1]
+
+
+def test_watcher_retries_failed_reload(tmp_path):
+    services_dir = _copy_services(tmp_path)
+    failures = [RuntimeError("half-written file")]
+    calls = []
+
+    def on_change():
+        calls.append(1)
+        if failures:
+            raise failures.pop()
+
+    watcher = ServicesCatalogWatcher(services_dir, on_change)
+    _touch(os.path.join(services_dir, "dentel_services.html"))
+    assert watcher.poll() is False
+    # Same files, but the previous reload failed: try again
+    assert watcher.poll() is True
+    assert watcher.poll() is False
+    assert len(calls) == 2
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from core.session_store import (
+    InMemorySessionStore, SessionConflictError, SessionStore, SQLiteSessionStore,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"))
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_round_trip(store):
+    session = store.create("hebrew")
+    session.chat_history.append({"role": "assistant", "content": "שלום"})
+    session.collection_state = {"confirmed": {"first_name": "דנה"}}
+    store.save(session)
+
+    loaded = store.get(session.session_id)
+    assert loaded.language == "hebrew"
+    assert loaded.chat_history == [{"role": "assistant", "content": "שלום"}]
+    assert loaded.collection_state == {"confirmed": {"first_name": "דנה"}}
+    assert store.stats()["sessions"] == 1
+
+
+def test_get_returns_a_copy(store):
+    session = store.create("english")
+    loaded = store.get(session.session_id)
+    loaded.chat_history.append({"role": "user", "content": "not saved"})
+    assert store.get(session.session_id).chat_history == []
+
+
+def test_stale_save_is_refused(store):
+    session = store.create("english")
+    first, second = store.get(session.session_id), store.get(session.session_id)
+    first.chat_history.append({"role": "user", "content": "first"})
+    store.save(first)
+
+    second.chat_history.append({"role": "user", "content": "second"})
+    with pytest.raises(SessionConflictError):
+        store.save(second)
+    assert store.get(session.session_id).chat_history == [{"role": "user", "content": "first"}]
+
+
+def test_delete(store):
+    session = store.create("english")
+    assert store.delete(session.session_id) is True
+    assert store.get(session.session_id) is None
+    assert store.delete(session.session_id) is False
+
+
+def test_expired_sessions_are_dropped(tmp_path):
+    for store in (InMemorySessionStore(ttl_seconds=1e-9), SQLiteSessionStore(str(tmp_path / "s.sqlite3"), 1e-9)):
+        session = store.create("english")
+        assert store.get(session.session_id) is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_entries=2)
+    first, second = store.create("english"), store.create("english")
+    store.get(first.session_id)
+    store.create("english")
+    assert store.get(second.session_id) is None
+    assert store.get(first.session_id) is not None
+
+
+def test_sqlite_store_adds_the_revision_column_to_old_files(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+    store = SQLiteSessionStore(path=path)
+    session = store.create("english")
+    assert store.get(session.session_id).revision == 1
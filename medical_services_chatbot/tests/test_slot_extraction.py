@@ -0,0 +1,80 @@
+from core.slot_extraction import ANSWER, LABELLED, CollectionState, asked_fields, extract_slots, turn_evidence
+
+SUMMARY = """Please confirm your details:
+- First name: Dana
+- Last name: Levi
+- ID number: 123456789
+- Gender: Female
+- Age: 34
+- HMO: Maccabi
+- HMO card number: 987654321
+- Membership tier: Gold
+Is everything correct?"""
+
+
+def _history(*turns):
+    roles = ("assistant", "user")
+    return [{"role": roles[i % 2], "content": text} for i, text in enumerate(turns)]
+
+
+def test_asked_fields_reads_the_last_question():
+    assert asked_fields("Thanks, Dana. What's your age?") == {"age"}
+    assert asked_fields("What are your first name and last name?") == {"first_name", "last_name"}
+    # A question listing several fields doesn't tell what the reply answers
+    assert asked_fields("What are your age and gender?") == set()
+    assert asked_fields("Thank you.") == set()
+
+
+def test_answers_bind_to_the_asked_field():
+    assert turn_evidence("How old are you?", "34") == {"age": (ANSWER, {34})}
+    assert turn_evidence("What is your HMO card number?", "9876 54321")["hmo_card_number"][1] == {"987654321"}
+
+
+def test_labelled_values_beat_bare_answers():
+    evidence = turn_evidence("How old are you?", "I'm 34 years old, and my ID is 123456789")
+    assert evidence["age"] == (LABELLED, {34})
+    assert evidence["id_number"] == (LABELLED, {"123456789"})
+
+
+def test_confirmed_summary_states_every_field():
+    slots = extract_slots(_history(SUMMARY, "Yes"))
+    assert slots.complete
+    assert slots.values["hmo_name"] == "Maccabi"
+    assert slots.values["membership_tier"] == "Gold"
+    assert extract_slots(_history(SUMMARY, "No, my age is 35")).values == {"age": 35}
+
+
+def test_later_answers_replace_earlier_ones():
+    slots = extract_slots(_history("How old are you?", "34", "Anything else?", "Sorry, my age is 35"))
+    assert slots.values["age"] == 35
+
+
+def test_two_values_in_one_message_are_ambiguous():
+    slots = extract_slots(_history("How old are you?", "34 or 35"))
+    assert "age" in slots.ambiguous
+    assert "age" in slots.missing
+
+
+def test_requests_phrased_as_instructions_bind_the_reply():
+    assert asked_fields("Thanks, Dana. Please provide your HMO card number.") == {"hmo_card_number"}
+    assert asked_fields("תודה. אנא הזן את גילך.") == {"age"}
+    slots = extract_slots(_history("Please provide your HMO card number.", "987654321"))
+    assert slots.values == {"hmo_card_number": "987654321"}
+
+
+def test_replies_no_rule_reads_are_kept_verbatim():
+    state = CollectionState.from_history(_history("Please send your first name, last name and ID number.",
+                                                  "Dana Levi 123456789", "Thanks! How old are you?", "34"))
+    assert state.unparsed == ["Dana Levi 123456789"]
+    assert state.confirmed == {"age": 34}
+    assert CollectionState.from_record(state.to_record()) == state
+
+
+def test_full_name_summary_line_is_normalized():
+    summary = SUMMARY.replace("- First name: Dana\n- Last name: Levi", "- Name: Dana Levi-")
+    slots = extract_slots(_history(summary, "Yes"))
+    assert (slots.values["first_name"], slots.values["last_name"]) == ("Dana", "Levi")
+    # A last name that doesn't validate is left out, like every other field
+    summary = SUMMARY.replace("- First name: Dana\n- Last name: Levi", "- Name: Dana " + "L" * 41)
+    slots = extract_slots(_history(summary, "Yes"))
+    assert "last_name" not in slots.values
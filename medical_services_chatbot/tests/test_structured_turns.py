@@ -0,0 +1,80 @@
+import json
+import random
+
+import pytest
+
+from core.user_info_gathering_agent import CONFIRM_PHASES, ReplyStreamDecoder, UserInfoCollector
+
+FIELDS = {
+    "first_name": "Dana", "last_name": "Levi", "id_number": "123456782", "gender": "female", "age": 28,
+    "hmo_name": "מכבי", "hmo_card_number": "987654321", "membership_tier": "gold",
+}
+REPLY = 'שלום Dana! "Gold" tier\\path\nnext line, tab\there 😀 — done'
+
+
+def _output(reply=REPLY, confirmed=False, fields=None, ensure_ascii=True):
+    return json.dumps({"reply": reply, "confirmed": confirmed, "fields": fields or {}}, ensure_ascii=ensure_ascii)
+
+
+def _decode(chunks):
+    decoder = ReplyStreamDecoder()
+    return "".join(decoder.feed(chunk) for chunk in chunks)
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_reply_decodes_across_every_split(ensure_ascii):
+    # ASCII output escapes the emoji as a \uXXXX surrogate pair
+    content = _output(ensure_ascii=ensure_ascii)
+    for split in range(len(content) + 1):
+        assert _decode([content[:split], content[split:]]) == REPLY, split
+
+
+def test_reply_decodes_from_random_chunks():
+    content = _output(fields=FIELDS)
+    rng = random.Random(7)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(content)), rng.randint(1, 12)))
+        chunks = [content[i:j] for i, j in zip([0, *cuts], [*cuts, len(content)])]
+        assert _decode(chunks) == REPLY
+
+
+def test_reply_text_is_emitted_before_the_object_ends():
+    decoder = ReplyStreamDecoder()
+    assert decoder.feed('{"reply": "Hel') == "Hel"
+    assert decoder.feed('lo\\u00e9') == "loé"
+    assert decoder.feed('\\ud83d') == ""
+    assert decoder.feed('\\ude00", "confirmed": false') == "😀"
+    assert decoder.feed(', "fields": {"first_name": "reply"}}') == ""
+
+
+def test_a_field_mentioning_the_reply_key_is_not_decoded():
+    content = json.dumps({"fields": {"first_name": '"reply": "not this"'}, "reply": "this"})
+    assert _decode(list(content)) == "this"
+
+
+@pytest.fixture
+def collector():
+    return UserInfoCollector(structured_turns=True)
+
+
+def test_structured_turn_returns_the_reply(collector):
+    response = collector._collection_response(_output("What is your age?", fields={"first_name": "Dana"}), "english")
+    assert response == {"content": "What is your age?", "role": "assistant", "is_validated": "False"}
+
+
+def test_confirmed_turn_hands_over_the_normalized_fields(collector):
+    response = collector._collection_response(_output(CONFIRM_PHASES["english"], True, FIELDS), "english")
+    assert response["is_validated"] == "True"
+    assert response["user_info"] == {**FIELDS, "gender": "Female", "hmo_name": "Maccabi", "membership_tier": "Gold"}
+
+
+def test_confirmed_turn_with_invalid_fields_leaves_extraction_to_the_caller(collector):
+    response = collector._collection_response(_output(CONFIRM_PHASES["english"], True, {**FIELDS, "age": 200}),
+                                              "english")
+    assert response["is_validated"] == "True"
+    assert "user_info" not in response
+
+
+def test_output_that_is_not_json_is_used_as_text(collector):
+    response = collector._collection_response(CONFIRM_PHASES["english"], "english")
+    assert response == {"content": CONFIRM_PHASES["english"], "role": "assistant", "is_validated": "True"}
@@ -0,0 +1,52 @@
+from core.user_info_gathering_agent import UserInfoCollector
+
+
+def test_extra_history_fields_are_not_sent_to_the_model():
+    collector = UserInfoCollector(history_messages=0)
+    history = [
+        {"role": "assistant", "content": "What is your first name?"},
+        {"role": "user", "content": "Dana"},
+        {"role": "assistant", "content": "Thanks!", "is_validated": "False"},
+    ]
+    for kwargs in (collector._collection_kwargs("Levi", history, "english"), collector._extraction_kwargs(history)):
+        assert all(set(message) == {"role", "content"} for message in kwargs["messages"])
+
+
+def test_trimmed_replies_to_an_unparsed_request_stay_in_the_prompt():
+    collector = UserInfoCollector(history_messages=2)
+    history = [
+        {"role": "assistant", "content": "Please send your first name, last name and ID number."},
+        {"role": "user", "content": "Dana Levi 123456789"},
+        {"role": "assistant", "content": "Thanks. Please provide your HMO card number."},
+        {"role": "user", "content": "987654321"},
+        {"role": "assistant", "content": "Got it. How old are you?"},
+    ]
+    messages = collector._collection_kwargs("34", history, "english")["messages"]
+    state_message = messages[1]["content"]
+    assert "hmo_card_number: 987654321" in state_message
+    assert '"Dana Levi 123456789"' in state_message
+    assert all("Dana Levi" not in message["content"] for message in messages[2:])
+
+
+def test_clearly_invalid_replies_are_reasked_without_the_llm():
+    collector = UserInfoCollector(prevalidation=True)
+    history = [{"role": "assistant", "content": "Thanks. Please enter your ID number."}]
+    reprompt = collector._prevalidate("12345", history, "english")
+    assert reprompt["is_validated"] == "False"
+    assert "9 digits" in reprompt["content"]
+    # Check digit on by default: made-up IDs are re-asked, the demo ID passes
+    assert "check digit" in collector._prevalidate("123456789", history, "english")["content"]
+    assert collector._prevalidate("123456782", history, "english") is None
+    assert collector._prevalidate("I'd rather not say", history, "english") is None
+
+
+def test_replies_already_appended_to_the_history_are_prevalidated():
+    collector = UserInfoCollector(prevalidation=True)
+    # As the Streamlit client sends it: the reply is the last history message too
+    history = [
+        {"role": "assistant", "content": "Thanks. Please enter your ID number."},
+        {"role": "user", "content": "12345"},
+    ]
+    assert "9 digits" in collector._prevalidate("12345", history, "english")["content"]
+    # A trailing user message that isn't this reply means no question is pending
+    assert collector._prevalidate("54321", history, "english") is None
@@ -0,0 +1,34 @@
+import pytest
+
+from core.validators import invalid_reply, israeli_id_check_digit_ok, normalize_field
+
+
+def test_check_digit():
+    assert israeli_id_check_digit_ok("000000018")
+    assert not israeli_id_check_digit_ok("123456789")
+
+
+@pytest.mark.parametrize("field, text, reason", [
+    ("id_number", "12345", "nine_digits"),
+    ("hmo_card_number", "1234 5678 9", None),
+    ("age", "130", "age_range"),
+    ("age", "34 years old", None),
+    ("hmo_name", "Leumit", "hmo_name"),
+    ("hmo_name", "במכבי", None),
+    ("first_name", "Dana1", "letters_only"),
+    # Not plainly an attempt at the field: left to the LLM
+    ("age", "why do you need my age?", None),
+    ("id_number", "my ID is 12345", None),
+])
+def test_invalid_reply(field, text, reason):
+    assert invalid_reply(field, text) == reason
+
+
+def test_check_digit_rule_is_optional():
+    assert invalid_reply("id_number", "123456789") == "check_digit"
+    assert invalid_reply("id_number", "123456789", check_digit=False) is None
+
+
+def test_names_normalize_to_english():
+    assert normalize_field("hmo_name", "כללית") == "Clalit"
+    assert normalize_field("membership_tier", "זהב") == "Gold"